@@ -12,10 +12,14 @@ CREATE TABLE IF NOT EXISTS traffic_signals (
     status VARCHAR(20) DEFAULT 'active',
     installation_date DATE,
     last_maintenance DATE,
+    roi_polygon JSONB, -- detection region of interest as [[x, y], ...] frame pixels
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Databases created before ROI support
+ALTER TABLE traffic_signals ADD COLUMN IF NOT EXISTS roi_polygon JSONB;
+
 -- Emergency detections table
 CREATE TABLE IF NOT EXISTS emergency_detections (
     id SERIAL PRIMARY KEY,
@@ -0,0 +1,320 @@
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+from pathlib import Path
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from detection.vehicle_detector import EmergencyVehicleDetector
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Detector methods timed as pipeline stages, in pipeline order
+STAGES = [
+    ('decode', '_decode_frame'),
+    ('roi_crop', '_crop_to_roi'),
+    ('yolo', None),  # the model call itself
+    ('postprocess', '_extract_vehicle_boxes'),
+    ('features_total', '_analyze_emergency_features'),
+    ('hsv_lookup', '_classify_hsv_pixels'),
+    ('colors', '_analyze_colors'),
+    ('patterns', '_analyze_patterns'),
+    ('light_bar', '_detect_light_bar'),
+    ('classification', '_classify_emergency_type')
+]
+
+class StageTimer:
+    """Accumulates the time spent in each stage per frame"""
+
+    def __init__(self):
+        self.current = defaultdict(float)
+        self.samples = defaultdict(list)
+
+    def wrap(self, stage: str, func):
+        """Wrap a callable so every call adds to the current frame's stage time"""
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.current[stage] += time.perf_counter() - start
+        return timed
+
+    def end_frame(self):
+        """Close the current frame; stages that did not run are not sampled"""
+        for stage, seconds in self.current.items():
+            self.samples[stage].append(seconds * 1000)
+        self.current.clear()
+
+class TimedModel:
+    """Times model calls while still exposing attributes such as .names"""
+
+    def __init__(self, model, timer: StageTimer):
+        self.model = model
+        self.call = timer.wrap('yolo', model)
+
+    def __call__(self, *args, **kwargs):
+        return self.call(*args, **kwargs)
+
+    def __getattr__(self, attribute):
+        return getattr(self.model, attribute)
+
+def instrument(detector: EmergencyVehicleDetector, timer: StageTimer):
+    """Replace the detector's stage methods with timed versions on this instance"""
+    for stage, method_name in STAGES:
+        if method_name is None:
+            detector.model = TimedModel(detector.model, timer)
+        else:
+            setattr(detector, method_name, timer.wrap(stage, getattr(detector, method_name)))
+
+def synthetic_frame(rng: random.Random, width: int, height: int) -> tuple:
+    """
+    Draw a road scene with ordinary and emergency-coloured vehicles
+
+    Returns:
+        (JPEG bytes, list of vehicle boxes as [x1, y1, x2, y2])
+    """
+    frame = np.full((height, width, 3), 70, dtype=np.uint8)
+    noise = np.random.default_rng(rng.randint(0, 2 ** 31)).integers(0, 20, frame.shape, dtype=np.uint8)
+    frame = cv2.add(frame, noise)
+
+    # Lane markings
+    for x in range(width // 4, width, width // 4):
+        for y in range(0, height, 80):
+            cv2.line(frame, (x, y), (x, y + 40), (230, 230, 230), 4)
+
+    boxes = []
+    for _ in range(rng.randint(1, 6)):
+        vehicle_width = rng.randint(width // 12, width // 5)
+        vehicle_height = int(vehicle_width * rng.uniform(0.5, 0.9))
+        x1 = rng.randint(0, width - vehicle_width - 1)
+        y1 = rng.randint(0, height - vehicle_height - 1)
+        x2, y2 = x1 + vehicle_width, y1 + vehicle_height
+
+        if rng.random() < 0.3:
+            # White body with red and blue stripes and a bright light bar
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (245, 245, 245), -1)
+            stripe = vehicle_height // 6
+            cv2.rectangle(frame, (x1, y1 + 2 * stripe), (x2, y1 + 3 * stripe), (0, 0, 220), -1)
+            cv2.rectangle(frame, (x1, y1 + 3 * stripe), (x2, y1 + 4 * stripe), (220, 0, 0), -1)
+            cv2.rectangle(frame, (x1 + vehicle_width // 3, y1), (x2 - vehicle_width // 3, y1 + stripe // 2),
+                          (255, 60, 60), -1)
+        else:
+            color = tuple(rng.randint(20, 200) for _ in range(3))
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, -1)
+
+        boxes.append([x1, y1, x2, y2])
+
+    return cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes(), boxes
+
+def load_frame_files(frames_dir: Path, limit: int = None) -> list:
+    """Read encoded frames from a folder as (filename, bytes, None) so decoding is timed too"""
+    frames = []
+    for path in sorted(frames_dir.iterdir()):
+        if path.suffix.lower() in IMAGE_EXTENSIONS:
+            frames.append((path.name, path.read_bytes(), None))
+            if limit and len(frames) >= limit:
+                break
+    return frames
+
+def summarize(samples: list) -> dict:
+    """Latency percentiles of a list of millisecond samples"""
+    values = np.array(samples)
+    return {
+        'count': int(values.size),
+        'mean': float(values.mean()),
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+        'p99': float(np.percentile(values, 99)),
+        'max': float(values.max())
+    }
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_benchmark(detector: EmergencyVehicleDetector, frames: list, iterations: int,
+                  signal_id: str = None) -> dict:
+    """
+    Replay frames through the instrumented detector
+
+    Frames that come with known vehicle boxes (synthetic frames) have those
+    boxes injected after the model runs, since YOLO does not recognise drawn
+    rectangles as vehicles; the feature stages then see real work.
+    """
+    timer = StageTimer()
+    instrument(detector, timer)
+
+    known_boxes = {'boxes': None, 'scale': 1.0}
+
+    decode = detector._decode_frame
+    def decode_and_remember_scale(*args, **kwargs):
+        image, scale = decode(*args, **kwargs)
+        known_boxes['scale'] = scale
+        return image, scale
+    detector._decode_frame = decode_and_remember_scale
+
+    extract = detector._extract_vehicle_boxes
+    def extract_or_inject(*args, **kwargs):
+        vehicles = extract(*args, **kwargs)
+        if known_boxes['boxes'] is None:
+            return vehicles
+        scale = known_boxes['scale']
+        return [([int(value * scale) for value in box], 0.9) for box in known_boxes['boxes']]
+    detector._extract_vehicle_boxes = extract_or_inject
+
+    totals = []
+    emergencies = 0
+    start = time.perf_counter()
+
+    for _ in range(iterations):
+        for _, data, boxes in frames:
+            known_boxes['boxes'] = boxes
+
+            frame_start = time.perf_counter()
+            result = detector.detect_emergency_vehicle(io.BytesIO(data), signal_id=signal_id)
+            totals.append((time.perf_counter() - frame_start) * 1000)
+
+            timer.end_frame()
+            emergencies += int(result.get('is_emergency', False))
+
+    elapsed = time.perf_counter() - start
+
+    stages = {
+        stage: summarize(timer.samples[stage])
+        for stage, _ in STAGES if timer.samples.get(stage)
+    }
+    stages['total'] = summarize(totals)
+
+    return {
+        'frames': len(totals),
+        'throughput_fps': len(totals) / elapsed,
+        'emergencies_detected': emergencies,
+        'stages_ms': stages
+    }
+
+def print_report(report: dict, baseline: dict = None):
+    print("\n" + "=" * 50)
+    print(f"{'stage':<16}{'frames':>8}{'mean ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'vs base p95':>13}")
+
+    baseline_stages = (baseline or {}).get('stages_ms', {})
+    for stage, stats in report['stages_ms'].items():
+        delta = '-'
+        if stage in baseline_stages and baseline_stages[stage]['p95'] > 0:
+            change = stats['p95'] / baseline_stages[stage]['p95'] - 1
+            delta = f"{change * 100:+.1f}%"
+        print(f"{stage:<16}{stats['count']:>8}{stats['mean']:>10.2f}{stats['p50']:>9.2f}"
+              f"{stats['p95']:>9.2f}{stats['p99']:>9.2f}{delta:>13}")
+
+    print(f"\nThroughput: {report['throughput_fps']:.1f} frames/s", end='')
+    if baseline:
+        print(f" (baseline {baseline['throughput_fps']:.1f})", end='')
+    print(f"\nPeak RSS: {report['peak_rss_mb']:.0f} MB (after model load {report['model_rss_mb']:.0f} MB)")
+
+def main():
+    """Main function to benchmark the detection pipeline stage by stage"""
+
+    parser = argparse.ArgumentParser(description="Benchmark emergency vehicle detection per pipeline stage")
+    parser.add_argument('--frames-dir', type=Path, help="Folder of camera frames (default: synthetic frames)")
+    parser.add_argument('--synthetic', type=int, default=50, help="Number of synthetic frames to generate")
+    parser.add_argument('--size', default='1280x720', help="Synthetic frame size as WIDTHxHEIGHT")
+    parser.add_argument('--save-synthetic', type=Path, help="Also write the synthetic frames to this folder")
+    parser.add_argument('--max-frames', type=int, help="Only use the first N frames from --frames-dir")
+    parser.add_argument('--iterations', type=int, default=3, help="Passes over the frame set")
+    parser.add_argument('--warmup', type=int, default=3, help="Untimed warm-up inferences")
+    parser.add_argument(
+        '--keep-gating', action='store_true',
+        help="Keep the result cache, motion gate and tracker on (they skip work on repeated frames)"
+    )
+    parser.add_argument('--signal-id', default='benchmark', help="Signal ID the frames are attributed to")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for synthetic frames")
+    parser.add_argument('--json', type=Path, help="Write the report to a JSON file")
+    parser.add_argument('--baseline', type=Path, help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    print("Traffic Management Platform - Detection Benchmark")
+    print("=" * 50)
+
+    if args.frames_dir:
+        frames = load_frame_files(args.frames_dir, args.max_frames)
+        if not frames:
+            print(f"✗ No frames found in {args.frames_dir}")
+            sys.exit(1)
+        source = str(args.frames_dir)
+    else:
+        width, height = (int(value) for value in args.size.lower().split('x'))
+        rng = random.Random(args.seed)
+        frames = []
+        for index in range(args.synthetic):
+            data, boxes = synthetic_frame(rng, width, height)
+            frames.append((f"synthetic_{index:04d}.jpg", data, boxes))
+        source = f"{args.synthetic} synthetic {width}x{height} frames"
+
+        if args.save_synthetic:
+            args.save_synthetic.mkdir(parents=True, exist_ok=True)
+            for name, data, _ in frames:
+                (args.save_synthetic / name).write_bytes(data)
+            print(f"✓ Saved synthetic frames to {args.save_synthetic}")
+
+    print(f"Frames: {source}")
+
+    load_start = time.perf_counter()
+    detector = EmergencyVehicleDetector()
+    model_load_ms = (time.perf_counter() - load_start) * 1000
+    model_rss = peak_rss_mb()
+    print(f"✓ Detector ready in {model_load_ms:.0f} ms ({detector.backend} backend)")
+
+    if not args.keep_gating:
+        detector.result_cache.enabled = False
+        detector.motion_gate.enabled = False
+        detector.tracker.enabled = False
+
+    detector.warm_up(args.warmup)
+
+    report = run_benchmark(detector, frames, args.iterations, args.signal_id)
+    report.update({
+        'source': source,
+        'iterations': args.iterations,
+        'gating': args.keep_gating,
+        'model_load_ms': model_load_ms,
+        'model_rss_mb': model_rss,
+        'peak_rss_mb': peak_rss_mb(),
+        'detector': {
+            'backend': detector.backend,
+            'batch_size': detector.batch_size,
+            'decoding': detector.frame_decoder.get_stats()
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__
+        }
+    })
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print_report(report, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from routing.road_graph import RoadGraph, haversine_km
+from routing.contraction_hierarchies import ContractionHierarchy
+from routing.route_optimizer import RouteOptimizer, ROUTING_ALGORITHMS
+
+# Synthetic grids are laid out from Clock Tower, Dehradun
+ORIGIN = (30.3165, 78.0322)
+
+def synthetic_city_grid(rows: int, cols: int, seed: int = 0, spacing_km: float = 0.15,
+                        one_way_share: float = 0.1, missing_share: float = 0.05) -> RoadGraph:
+    """
+    Grid road network standing in for a city
+
+    Intersections are spacing_km apart with a little positional jitter.
+    Each street between neighbours is 0-50% longer than the straight line,
+    a share of streets is one-way and another share is missing altogether.
+    """
+    rng = np.random.default_rng(seed)
+
+    km_per_degree_lat = 111.32
+    km_per_degree_lng = km_per_degree_lat * np.cos(np.radians(ORIGIN[0]))
+    row, col = np.divmod(np.arange(rows * cols), cols)
+    latitudes = ORIGIN[0] + (row + rng.uniform(-0.2, 0.2, row.size)) * spacing_km / km_per_degree_lat
+    longitudes = ORIGIN[1] + (col + rng.uniform(-0.2, 0.2, col.size)) * spacing_km / km_per_degree_lng
+
+    node = np.arange(rows * cols).reshape(rows, cols)
+    streets = np.concatenate([
+        np.stack([node[:, :-1].ravel(), node[:, 1:].ravel()], axis=1),  # east-west
+        np.stack([node[:-1, :].ravel(), node[1:, :].ravel()], axis=1)   # north-south
+    ])
+    streets = streets[rng.random(len(streets)) >= missing_share]
+
+    lengths = haversine_km(latitudes[streets[:, 0]], longitudes[streets[:, 0]],
+                           latitudes[streets[:, 1]], longitudes[streets[:, 1]])
+    lengths *= rng.uniform(1.0, 1.5, len(streets))
+
+    # One-way streets keep a single random direction
+    one_way = rng.random(len(streets)) < one_way_share
+    flipped = one_way & (rng.random(len(streets)) < 0.5)
+    forward = np.where(flipped[:, None], streets[:, ::-1], streets)
+    backward = streets[~one_way][:, ::-1]
+
+    sources = np.concatenate([forward[:, 0], backward[:, 0]])
+    targets = np.concatenate([forward[:, 1], backward[:, 1]])
+    weights = np.concatenate([lengths, lengths[~one_way]])
+
+    node_ids = [f"r{r}c{c}" for r, c in zip(row.tolist(), col.tolist())]
+    return RoadGraph.from_arrays(node_ids, sources, targets, weights, latitudes, longitudes)
+
+def summarize(samples: list) -> dict:
+    """Latency percentiles of a list of millisecond samples"""
+    values = np.array(samples)
+    return {
+        'count': int(values.size),
+        'mean': float(values.mean()),
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+        'p99': float(np.percentile(values, 99)),
+        'max': float(values.max())
+    }
+
+def run_benchmark(optimizer: RouteOptimizer, queries: list, algorithms: list) -> dict:
+    """Run every query with every algorithm and check distances against Dijkstra"""
+    results = {}
+    reference = {}
+
+    for algorithm in algorithms:
+        latencies, expanded = [], []
+        mismatches = unreachable = 0
+
+        for source, target in queries:
+            start = time.perf_counter()
+            result = optimizer.find_path(source, target, algorithm)
+            latencies.append((time.perf_counter() - start) * 1000)
+            expanded.append(result.expanded)
+
+            if result.distance == float('inf'):
+                unreachable += 1
+            if algorithm == 'dijkstra':
+                reference[(source, target)] = result.distance
+            elif (source, target) in reference and \
+                    not np.isclose(result.distance, reference[(source, target)], rtol=1e-9):
+                mismatches += 1
+
+        results[algorithm] = {
+            'latency_ms': summarize(latencies),
+            'expanded_mean': float(np.mean(expanded)),
+            'unreachable': unreachable,
+            'distance_mismatches': mismatches
+        }
+
+    return results
+
+def print_report(report: dict):
+    results = report['algorithms']
+    baseline = results.get('dijkstra')
+
+    print("\n" + "=" * 50)
+    print(f"{'algorithm':<15}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'expanded':>10}{'speedup':>9}")
+    for algorithm, stats in results.items():
+        latency = stats['latency_ms']
+        speedup = baseline['latency_ms']['mean'] / latency['mean'] if baseline else float('nan')
+        print(f"{algorithm:<15}{latency['mean']:>9.2f}{latency['p50']:>9.2f}{latency['p95']:>9.2f}"
+              f"{stats['expanded_mean']:>10.0f}{speedup:>8.1f}x")
+
+    if 'contraction_hierarchy' in report:
+        ch = report['contraction_hierarchy']
+        source = "loaded" if ch['loaded'] else "preprocessed"
+        print(f"\nContraction Hierarchy {source} in {ch['preprocess_ms'] / 1000:.1f} s "
+              f"with {ch['shortcuts']} shortcuts")
+
+    for algorithm, stats in results.items():
+        if stats['distance_mismatches']:
+            print(f"✗ {algorithm}: {stats['distance_mismatches']} distances differ from Dijkstra")
+    print(f"\nUnreachable pairs: {next(iter(results.values()))['unreachable']} of {report['queries']}")
+
+def main():
+    """Main benchmark function"""
+
+    parser = argparse.ArgumentParser(description="Benchmark route search algorithms on a synthetic city grid")
+    parser.add_argument('--grid', default='150x150', help="Grid size as ROWSxCOLS intersections")
+    parser.add_argument('--queries', type=int, default=100, help="Random origin-destination pairs")
+    parser.add_argument('--algorithms', nargs='+', default=list(ROUTING_ALGORITHMS),
+                        choices=ROUTING_ALGORITHMS, help="Algorithms to compare (dijkstra is the baseline)")
+    parser.add_argument('--ch-file', type=Path,
+                        help="Contraction Hierarchy file to reuse, written after preprocessing if missing")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the grid and the queries")
+    parser.add_argument('--json', type=Path, help="Write the report to a JSON file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    print("Traffic Management Platform - Routing Benchmark")
+    print("=" * 50)
+
+    rows, cols = (int(value) for value in args.grid.lower().split('x'))
+    build_start = time.perf_counter()
+    graph = synthetic_city_grid(rows, cols, args.seed)
+    build_ms = (time.perf_counter() - build_start) * 1000
+    print(f"✓ Built {graph.node_count} nodes / {graph.edge_count} edges in {build_ms:.0f} ms")
+
+    optimizer = RouteOptimizer()
+    optimizer.road_graph = graph
+
+    rng = np.random.default_rng(args.seed + 1)
+    pairs = rng.integers(0, graph.node_count, size=(args.queries, 2))
+    queries = [(graph.node_ids[source], graph.node_ids[target]) for source, target in pairs.tolist()]
+
+    # Dijkstra first so the others can be checked against it
+    algorithms = sorted(set(args.algorithms) | {'dijkstra'}, key=list(ROUTING_ALGORITHMS).index)
+
+    report = {
+        'grid': {'rows': rows, 'cols': cols, 'nodes': graph.node_count, 'edges': graph.edge_count},
+        'build_ms': build_ms,
+        'queries': args.queries
+    }
+
+    if 'ch' in algorithms:
+        # Preprocessing is a one-off cost, kept out of the query latencies
+        start = time.perf_counter()
+        hierarchy = None
+        if args.ch_file and args.ch_file.exists():
+            try:
+                hierarchy = ContractionHierarchy.load(str(args.ch_file), graph)
+            except ValueError as e:
+                print(f"✗ {e}, preprocessing again")
+        loaded = hierarchy is not None
+        if not loaded:
+            hierarchy = ContractionHierarchy.build(graph)
+            if args.ch_file:
+                hierarchy.save(str(args.ch_file))
+        preprocess_ms = (time.perf_counter() - start) * 1000
+        optimizer.contraction_hierarchy = hierarchy
+
+        report['contraction_hierarchy'] = {
+            'preprocess_ms': preprocess_ms,
+            'shortcuts': hierarchy.shortcut_count,
+            'loaded': loaded
+        }
+        print(f"✓ Contraction Hierarchy ready in {preprocess_ms / 1000:.1f} s")
+
+    report['algorithms'] = run_benchmark(optimizer, queries, algorithms)
+    report['environment'] = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'numpy': np.__version__
+    }
+
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from sample_frames import load_frames
+from detection.inference_backends import resolve_backend, load_exported_backend
+
+VEHICLE_CLASSES = ('car', 'truck', 'bus', 'motorcycle')
+
+def load_model(model_path: str):
+    """Load a .pt model with ultralytics or an exported model with its CPU backend"""
+    backend = resolve_backend(model_path)
+
+    if backend == 'ultralytics':
+        from ultralytics import YOLO
+        model = YOLO(model_path)
+        return lambda image: model(image, verbose=False)
+
+    return load_exported_backend(model_path, backend)
+
+def extract_detections(results, confidence_threshold: float, vehicles_only: bool) -> list:
+    """
+    Flatten model results for one image into (xyxy, class name, confidence)
+
+    Works for both ultralytics and exported backend results.
+    """
+    detections = []
+
+    for result in results:
+        if result.boxes is None:
+            continue
+        for box in result.boxes:
+            class_name = result.names[int(box.cls[0])]
+            confidence = float(box.conf[0])
+
+            if confidence <= confidence_threshold:
+                continue
+            if vehicles_only and class_name not in VEHICLE_CLASSES:
+                continue
+
+            xyxy = box.xyxy[0]
+            if hasattr(xyxy, 'cpu'):
+                xyxy = xyxy.cpu().numpy()
+            detections.append((np.asarray(xyxy, dtype=np.float32), class_name, confidence))
+
+    return detections
+
+def box_iou(box_a: np.ndarray, box_b: np.ndarray) -> float:
+    """IoU of two [x1, y1, x2, y2] boxes"""
+    width = max(0.0, min(box_a[2], box_b[2]) - max(box_a[0], box_b[0]))
+    height = max(0.0, min(box_a[3], box_b[3]) - max(box_a[1], box_b[1]))
+    intersection = width * height
+    union = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1]) + \
+            (box_b[2] - box_b[0]) * (box_b[3] - box_b[1]) - intersection
+
+    return intersection / union if union > 0 else 0.0
+
+def match_detections(detections: list, reference: list, iou_threshold: float) -> int:
+    """
+    Count detections that agree with a reference detection
+
+    Detections are matched greedily, most confident first, to the
+    best-overlapping unmatched reference box of the same class.
+    """
+    matched_reference = set()
+    matches = 0
+
+    for box, class_name, _ in sorted(detections, key=lambda d: -d[2]):
+        best_index = None
+        best_iou = iou_threshold
+
+        for index, (reference_box, reference_class, _) in enumerate(reference):
+            if index in matched_reference or reference_class != class_name:
+                continue
+            iou = box_iou(box, reference_box)
+            if iou >= best_iou:
+                best_index = index
+                best_iou = iou
+
+        if best_index is not None:
+            matched_reference.add(best_index)
+            matches += 1
+
+    return matches
+
+def benchmark_model(model_path: str, frames: list, warmup: int,
+                    confidence_threshold: float, vehicles_only: bool) -> dict:
+    """
+    Run a model over all frames, timing each inference
+
+    Returns:
+        Dict with per-frame detections and latency statistics
+    """
+    model = load_model(model_path)
+
+    # Warm-up runs allocate buffers and pick kernels; keep them out of the timings
+    for _, image in frames[:warmup]:
+        model(image)
+
+    latencies = []
+    detections = []
+    for _, image in frames:
+        start = time.perf_counter()
+        results = model(image)
+        latencies.append((time.perf_counter() - start) * 1000)
+        detections.append(extract_detections(results, confidence_threshold, vehicles_only))
+
+    latencies = np.array(latencies)
+    return {
+        'model': model_path,
+        'frames': len(frames),
+        'latency_ms': {
+            'mean': float(latencies.mean()),
+            'p50': float(np.percentile(latencies, 50)),
+            'p95': float(np.percentile(latencies, 95)),
+            'max': float(latencies.max())
+        },
+        'throughput_fps': float(1000.0 / latencies.mean()),
+        'detections': detections
+    }
+
+def agreement(run: dict, reference_run: dict, iou_threshold: float) -> dict:
+    """Precision/recall/F1 of a model's detections against a reference model"""
+    matches = 0
+    predicted = 0
+    expected = 0
+
+    for detections, reference in zip(run['detections'], reference_run['detections']):
+        matches += match_detections(detections, reference, iou_threshold)
+        predicted += len(detections)
+        expected += len(reference)
+
+    precision = matches / predicted if predicted else 1.0
+    recall = matches / expected if expected else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+    return {
+        'reference': reference_run['model'],
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'detections': predicted,
+        'reference_detections': expected
+    }
+
+def fp32_counterpart(model_path: Path) -> Path:
+    """FP32 model an INT8 model was produced from, if it exists"""
+    if not model_path.stem.endswith('_int8'):
+        return None
+
+    base_name = model_path.stem[:-len('_int8')]
+    for candidate in (model_path.with_name(f"{base_name}.onnx"), model_path.with_name(f"{base_name}.pt")):
+        if candidate.exists():
+            return candidate
+
+    return None
+
+def main():
+    """Main function to compare model variants on sample frames"""
+
+    parser = argparse.ArgumentParser(description="Compare latency and detection agreement of YOLO model variants")
+    parser.add_argument(
+        '--frames-dir', type=Path, required=True,
+        help="Folder of sample camera frames"
+    )
+    parser.add_argument(
+        '--models', nargs='+', type=Path,
+        help="Models to compare (default: every INT8 model in models/ and its FP32 counterpart)"
+    )
+    parser.add_argument(
+        '--models-dir', type=Path, default=Path(__file__).parent.parent / "models",
+        help="Folder searched when --models is not given"
+    )
+    parser.add_argument(
+        '--reference', type=Path,
+        help="Model treated as ground truth for every comparison (e.g. yolov8m.pt)"
+    )
+    parser.add_argument('--max-frames', type=int, help="Only use the first N frames")
+    parser.add_argument('--warmup', type=int, default=3, help="Untimed warm-up inferences per model")
+    parser.add_argument(
+        '--conf', type=float, default=float(os.getenv('DETECTION_CONFIDENCE_THRESHOLD', 0.85)),
+        help="Confidence threshold (default DETECTION_CONFIDENCE_THRESHOLD, as the detector uses)"
+    )
+    parser.add_argument('--iou', type=float, default=0.5, help="IoU needed for two detections to agree")
+    parser.add_argument('--all-classes', action='store_true', help="Compare all COCO classes, not only vehicles")
+    parser.add_argument('--json', type=Path, help="Write the report to a JSON file")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames_dir, args.max_frames)
+    if not frames:
+        print(f"No frames found in {args.frames_dir}")
+        sys.exit(1)
+
+    model_paths = list(args.models or [])
+    if not model_paths:
+        for int8_model in sorted(args.models_dir.glob('*_int8.onnx')):
+            counterpart = fp32_counterpart(int8_model)
+            if counterpart:
+                model_paths.append(counterpart)
+            model_paths.append(int8_model)
+    if not model_paths:
+        print(f"No models to compare in {args.models_dir}, run scripts/quantize_models.py first")
+        sys.exit(1)
+
+    # INT8 models are always compared with the FP32 model they came from
+    for model_path in list(model_paths):
+        counterpart = fp32_counterpart(model_path)
+        if counterpart and counterpart not in model_paths:
+            model_paths.insert(model_paths.index(model_path), counterpart)
+
+    print("Traffic Management Platform - Model Comparison")
+    print("=" * 50)
+    print(f"{len(frames)} frames from {args.frames_dir}, "
+          f"{'all classes' if args.all_classes else 'vehicles only'}, conf > {args.conf}")
+
+    vehicles_only = not args.all_classes
+    runs = {}
+    for model_path in model_paths + ([args.reference] if args.reference else []):
+        if str(model_path) in runs:
+            continue
+        print(f"\nRunning {model_path}...")
+        runs[str(model_path)] = benchmark_model(str(model_path), frames, args.warmup, args.conf, vehicles_only)
+
+    report = []
+    for model_path in model_paths:
+        run = runs[str(model_path)]
+        entry = {key: value for key, value in run.items() if key != 'detections'}
+
+        counterpart = fp32_counterpart(model_path)
+        if counterpart:
+            entry['vs_fp32'] = agreement(run, runs[str(counterpart)], args.iou)
+            entry['speedup_vs_fp32'] = runs[str(counterpart)]['latency_ms']['mean'] / run['latency_ms']['mean']
+        if args.reference and model_path != args.reference:
+            entry['vs_reference'] = agreement(run, runs[str(args.reference)], args.iou)
+
+        report.append(entry)
+
+    print("\n" + "=" * 50)
+    print(f"{'model':<28}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'fps':>8}{'speedup':>9}{'F1 fp32':>9}{'F1 ref':>8}")
+    for entry in report:
+        latency = entry['latency_ms']
+        speedup = f"{entry['speedup_vs_fp32']:.2f}x" if 'speedup_vs_fp32' in entry else '-'
+        f1_fp32 = f"{entry['vs_fp32']['f1']:.3f}" if 'vs_fp32' in entry else '-'
+        f1_reference = f"{entry['vs_reference']['f1']:.3f}" if 'vs_reference' in entry else '-'
+        print(f"{Path(entry['model']).name:<28}{latency['mean']:>9.1f}{latency['p50']:>9.1f}{latency['p95']:>9.1f}"
+              f"{entry['throughput_fps']:>8.1f}{speedup:>9}{f1_fp32:>9}{f1_reference:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'frames': len(frames), 'iou_threshold': args.iou,
+                       'confidence_threshold': args.conf, 'models': report}, f, indent=2)
+        print(f"\nReport saved to: {args.json}")
+
+if __name__ == "__main__":
+    main()
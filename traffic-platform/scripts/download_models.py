@@ -1,5 +1,7 @@
 import os
 import sys
+import argparse
+import shutil
 import requests
 from pathlib import Path
 import hashlib
@@ -75,9 +77,56 @@ def verify_file_hash(file_path: str, expected_hash: str) -> bool:
         print(f"Error verifying hash: {e}")
         return False
 
+def export_model(model_file: Path, export_format: str, image_size: int = 640) -> bool:
+    """
+    Export a downloaded YOLO model for CPU inference without PyTorch
+    
+    Args:
+        model_file: Path to the .pt model
+        export_format: 'onnx' or 'openvino'
+        image_size: Model input size
+        
+    Returns:
+        True if export successful, False otherwise
+    """
+    try:
+        from ultralytics import YOLO
+        
+        print(f"Exporting {model_file.name} to {export_format}...")
+        
+        model = YOLO(str(model_file))
+        if export_format == 'onnx':
+            # Dynamic axes so the detector can batch several frames per call
+            exported_path = model.export(format='onnx', imgsz=image_size, dynamic=True)
+        else:
+            exported_path = model.export(format='openvino', imgsz=image_size)
+        
+        # ultralytics exports next to the weights it was given; keep it in models/
+        destination = model_file.parent / Path(exported_path).name
+        if Path(exported_path).resolve() != destination.resolve():
+            shutil.move(exported_path, destination)
+        
+        print(f"✓ Exported to {destination}")
+        return True
+        
+    except Exception as e:
+        print(f"Error exporting {model_file.name} to {export_format}: {e}")
+        return False
+
 def main():
     """Main function to download YOLO models"""
     
+    parser = argparse.ArgumentParser(description="Download YOLO models for the traffic platform")
+    parser.add_argument(
+        '--export', nargs='+', choices=['onnx', 'openvino'], default=[],
+        help="Also export the models for the ONNX Runtime and/or OpenVINO backends"
+    )
+    parser.add_argument(
+        '--imgsz', type=int, default=640,
+        help="Input size used for exported models"
+    )
+    args = parser.parse_args()
+    
     # Create models directory
     models_dir = Path(__file__).parent.parent / "models"
     models_dir.mkdir(exist_ok=True)
@@ -144,6 +193,13 @@ def main():
     
     print(f"Model information saved to: {info_file}")
     
+    # Export models for the CPU inference backends
+    for export_format in args.export:
+        print(f"\nExporting models to {export_format}")
+        for model in models:
+            if not export_model(models_dir / model['filename'], export_format, args.imgsz):
+                sys.exit(1)
+    
     # Print usage instructions
     print("\nUsage Instructions:")
     print("1. Set MODEL_PATH environment variable to point to desired model:")
@@ -154,6 +210,11 @@ def main():
     print("- yolov8n.pt: Fastest, use for real-time applications")
     print("- yolov8s.pt: Good balance of speed and accuracy")
     print("- yolov8m.pt: Best accuracy, slower inference")
+    if args.export:
+        print("\nExported models run without PyTorch, e.g.:")
+        print(f"   MODEL_PATH={models_dir}/yolov8n.onnx")
+        print(f"   MODEL_PATH={models_dir}/yolov8n_openvino_model")
+        print("DETECTION_BACKEND=auto picks the backend from the model path.")
 
 if __name__ == "__main__":
     main()
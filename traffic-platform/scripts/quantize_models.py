@@ -0,0 +1,177 @@
+import os
+import sys
+import argparse
+import tempfile
+from pathlib import Path
+
+import onnx
+from onnxruntime.quantization import (
+    CalibrationDataReader, QuantFormat, QuantType, quantize_static
+)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from download_models import export_model
+from sample_frames import load_frames
+from detection.inference_backends import ExportedYoloBackend
+
+def detection_head_nodes(model) -> list:
+    """
+    Names of the YOLOv8 box-decoding nodes that must stay in FP32
+
+    The Detect head concatenates pixel box coordinates (0-640) with class
+    probabilities (0-1) into a single output. Quantizing that tensor with one
+    scale rounds every class score to zero, so only the convolution branches
+    (cv2/cv3) of the head are quantized and the DFL/decoding part is excluded.
+    """
+    head_prefix = None
+    for node in model.graph.node:
+        if '/dfl/' in node.name:
+            head_prefix = node.name.split('/dfl/')[0] + '/'
+            break
+
+    if head_prefix is None:
+        return []
+
+    return [
+        node.name for node in model.graph.node
+        if node.name.startswith(head_prefix) and not node.name.startswith(head_prefix + 'cv')
+    ]
+
+class FrameCalibrationReader(CalibrationDataReader):
+    """Feeds letterboxed sample frames to the static quantization calibrator"""
+
+    def __init__(self, frames: list, input_name: str, image_size: int):
+        # Reuse the backend's preprocessing so calibration sees real inputs
+        preprocessor = ExportedYoloBackend('calibration')
+        preprocessor.image_size = image_size
+
+        self.inputs = iter([
+            {input_name: preprocessor._letterbox(image)[0][None]}
+            for _, image in frames
+        ])
+
+    def get_next(self):
+        return next(self.inputs, None)
+
+def quantize_model(onnx_file: Path, frames: list, image_size: int = 640) -> bool:
+    """
+    Quantize an exported ONNX model to INT8
+
+    The model is statically quantized (QDQ format, per-channel INT8 weights,
+    UINT8 activations) so ONNX Runtime can run integer convolutions. Dynamic
+    weight-only quantization is not offered: its ConvInteger kernels are
+    several times slower than FP32 on CPU.
+
+    Args:
+        onnx_file: FP32 ONNX model
+        frames: Calibration frames as (filename, image) tuples
+        image_size: Model input size
+
+    Returns:
+        True if quantization successful, False otherwise
+    """
+    try:
+        output_file = onnx_file.with_name(f"{onnx_file.stem}_int8.onnx")
+        print(f"Quantizing {onnx_file.name} -> {output_file.name}...")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Fold constants and fuse Conv+BN first; the symbolic shape pass
+            # cannot handle the dynamic batch axis and is not needed here
+            prepared_file = os.path.join(temp_dir, 'prepared.onnx')
+            quant_pre_process(str(onnx_file), prepared_file, skip_symbolic_shape=True)
+
+            prepared = onnx.load(prepared_file)
+            excluded_nodes = detection_head_nodes(prepared)
+
+            input_name = prepared.graph.input[0].name
+            reader = FrameCalibrationReader(frames, input_name, image_size)
+
+            quantize_static(
+                prepared_file,
+                str(output_file),
+                reader,
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+                per_channel=True,
+                nodes_to_exclude=excluded_nodes
+            )
+
+        # Keep class names and input size so the onnxruntime backend can read them
+        source_metadata = {prop.key: prop.value for prop in onnx.load(str(onnx_file)).metadata_props}
+        quantized = onnx.load(str(output_file))
+        onnx.helper.set_model_props(quantized, {**source_metadata, 'quantization': 'int8'})
+        onnx.save(quantized, str(output_file))
+
+        original_size = onnx_file.stat().st_size / 1e6
+        quantized_size = output_file.stat().st_size / 1e6
+        print(f"✓ Saved {output_file} ({original_size:.1f} MB -> {quantized_size:.1f} MB)")
+        return True
+
+    except Exception as e:
+        print(f"Error quantizing {onnx_file.name}: {e}")
+        return False
+
+def main():
+    """Main function to produce INT8 versions of the YOLO models"""
+
+    parser = argparse.ArgumentParser(description="Quantize YOLO models to INT8 for CPU inference")
+    parser.add_argument(
+        '--models', nargs='+', default=['yolov8n', 'yolov8s', 'yolov8m'],
+        help="Model names in models/ to quantize"
+    )
+    parser.add_argument(
+        '--models-dir', type=Path, default=Path(__file__).parent.parent / "models",
+        help="Folder containing the downloaded models"
+    )
+    parser.add_argument(
+        '--calibration-dir', type=Path, required=True,
+        help="Folder of sample camera frames used to calibrate activation ranges"
+    )
+    parser.add_argument(
+        '--calibration-frames', type=int, default=100,
+        help="Maximum number of calibration frames"
+    )
+    parser.add_argument(
+        '--imgsz', type=int, default=640,
+        help="Model input size"
+    )
+    args = parser.parse_args()
+
+    models_dir = args.models_dir
+
+    print("Traffic Management Platform - Model Quantizer")
+    print("=" * 50)
+
+    frames = load_frames(args.calibration_dir, args.calibration_frames)
+    if not frames:
+        print(f"No calibration frames found in {args.calibration_dir}")
+        sys.exit(1)
+    print(f"Loaded {len(frames)} calibration frames from {args.calibration_dir}")
+
+    for i, name in enumerate(args.models, 1):
+        print(f"\n[{i}/{len(args.models)}] {name}")
+
+        onnx_file = models_dir / f"{name}.onnx"
+        if not onnx_file.exists():
+            model_file = models_dir / f"{name}.pt"
+            if not model_file.exists():
+                print(f"✗ {model_file} not found, run scripts/download_models.py first")
+                sys.exit(1)
+            if not export_model(model_file, 'onnx', args.imgsz):
+                sys.exit(1)
+
+        if not quantize_model(onnx_file, frames, args.imgsz):
+            sys.exit(1)
+
+    print("\n" + "=" * 50)
+    print("✓ Quantization finished")
+    print("\nCompare the INT8 models against FP32 on your own frames:")
+    print(f"   python scripts/compare_models.py --frames-dir <frames> --models-dir {models_dir}")
+    print("Then point a detector at the chosen model:")
+    print(f"   MODEL_PATH={models_dir}/yolov8s_int8.onnx")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+from pathlib import Path
+
+import cv2
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+def load_frames(frames_dir: Path, limit: int = None) -> list:
+    """
+    Load sample camera frames from a folder
+
+    Args:
+        frames_dir: Folder containing JPEG/PNG frames
+        limit: Optional maximum number of frames
+
+    Returns:
+        List of (filename, BGR image) tuples, sorted by filename
+    """
+    frames = []
+
+    for path in sorted(frames_dir.iterdir()):
+        if path.suffix.lower() not in IMAGE_EXTENSIONS:
+            continue
+
+        image = cv2.imread(str(path))
+        if image is None:
+            print(f"Skipping unreadable frame {path.name}")
+            continue
+
+        frames.append((path.name, image))
+        if limit and len(frames) >= limit:
+            break
+
+    return frames
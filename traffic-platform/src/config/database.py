@@ -87,11 +87,17 @@ class DatabaseManager:
                 status VARCHAR(20) DEFAULT 'active',
                 installation_date DATE,
                 last_maintenance DATE,
+                roi_polygon JSONB,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
         
+        # Camera region of interest, added after the initial schema
+        cursor.execute("""
+            ALTER TABLE traffic_signals ADD COLUMN IF NOT EXISTS roi_polygon JSONB
+        """)
+        
         # Emergency detections table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS emergency_detections (
@@ -383,7 +389,7 @@ class DatabaseManager:
             
             cursor.execute("""
                 SELECT id, name, latitude, longitude, location_description, 
-                       signal_type, status, installation_date, last_maintenance
+                       signal_type, status, installation_date, last_maintenance, roi_polygon
                 FROM traffic_signals 
                 WHERE status = 'active'
                 ORDER BY name
@@ -410,7 +416,7 @@ class DatabaseManager:
             
             cursor.execute("""
                 SELECT id, name, latitude, longitude, location_description, 
-                       signal_type, status, installation_date, last_maintenance
+                       signal_type, status, installation_date, last_maintenance, roi_polygon
                 FROM traffic_signals 
                 WHERE id = %s
             """, (signal_id,))
@@ -428,6 +434,58 @@ class DatabaseManager:
                 self.return_connection(conn)
             return None
     
+    def get_signal_rois(self) -> Dict[str, List[List[int]]]:
+        """Get the configured detection ROI polygon of every signal that has one"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cursor.execute("""
+                SELECT id, roi_polygon
+                FROM traffic_signals 
+                WHERE roi_polygon IS NOT NULL
+            """)
+            
+            rows = cursor.fetchall()
+            cursor.close()
+            self.return_connection(conn)
+            
+            return {row['id']: row['roi_polygon'] for row in rows}
+            
+        except Exception as e:
+            self.logger.error(f"Failed to get signal ROIs: {e}")
+            if conn:
+                cursor.close()
+                self.return_connection(conn)
+            return {}
+    
+    def update_signal_roi(self, signal_id: str, polygon: Optional[List[List[int]]]) -> bool:
+        """Store (or clear, with None) the detection ROI polygon of a signal"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE traffic_signals 
+                SET roi_polygon = %s, updated_at = %s
+                WHERE id = %s
+            """, (json.dumps(polygon) if polygon is not None else None, datetime.utcnow(), signal_id))
+            
+            updated = cursor.rowcount > 0
+            conn.commit()
+            cursor.close()
+            self.return_connection(conn)
+            
+            return updated
+            
+        except Exception as e:
+            self.logger.error(f"Failed to update ROI for signal {signal_id}: {e}")
+            if conn:
+                conn.rollback()
+                cursor.close()
+                self.return_connection(conn)
+            raise
+    
     def get_traffic_analytics(self, start_date: str = None, end_date: str = None) -> Dict:
         """Get traffic analytics data"""
         try:
@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+import os
+import logging
+from typing import List, Tuple
+
+FEATURE_EXTRACTORS = ('contour', 'projection')
+
+class ProjectionFeatureExtractor:
+    """
+    Contour-free pattern and light bar features on downscaled vehicle crops
+
+    Crops are shrunk so their long side is at most FEATURE_CROP_SIZE pixels
+    before any analysis, and the polygon approximation of the contour
+    extractor is replaced by connected-component statistics and row/column
+    projections. Pixel thresholds of the contour extractor are scaled with
+    the crop so both extractors make the same decisions.
+    """
+
+    def __init__(self, light_bar_bit: int, crop_size: int = None):
+        self.logger = logging.getLogger(__name__)
+
+        # Bit set in the HSV pixel codes of bright, saturated (light bar) pixels
+        self.light_bar_bit = light_bar_bit
+        self.crop_size = crop_size or int(os.getenv('FEATURE_CROP_SIZE', 128))
+
+        # Projection coverage a component needs on all four bounding box sides
+        self.side_coverage = float(os.getenv('FEATURE_RECTANGLE_COVERAGE', 0.7))
+
+    def resize(self, vehicle_crop: np.ndarray) -> Tuple[np.ndarray, float]:
+        """
+        Shrink a crop so its long side is at most crop_size
+
+        Returns:
+            (resized crop, scale relative to the original crop)
+        """
+        height, width = vehicle_crop.shape[:2]
+        long_side = max(height, width)
+        if long_side <= self.crop_size:
+            return vehicle_crop, 1.0
+
+        scale = self.crop_size / float(long_side)
+        resized = cv2.resize(
+            vehicle_crop,
+            (max(1, int(round(width * scale))), max(1, int(round(height * scale)))),
+            interpolation=cv2.INTER_AREA
+        )
+        return resized, scale
+
+    def analyze_patterns(self, image: np.ndarray, scale: float = 1.0) -> Tuple[float, List[str]]:
+        """
+        Count closed rectangular outlines (light bars, signs) in the crop
+
+        Edge components count as rectangles when the row and column
+        projections of their pixels cover all four sides of their bounding
+        box. Like the external-contour search they replace, components that
+        lie inside another component's bounding box are ignored.
+        """
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        edges = cv2.Canny(gray, 50, 150)
+
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(edges, connectivity=8)
+        if count <= 1:
+            return 0.0, []
+
+        boxes = stats[1:, :4]
+        x, y, width, height = boxes.T
+        right, bottom = x + width, y + height
+
+        # Components enclosed by another component are not external outlines
+        enclosed = (
+            (x[:, None] >= x[None, :]) & (y[:, None] >= y[None, :]) &
+            (right[:, None] <= right[None, :]) & (bottom[:, None] <= bottom[None, :])
+        )
+        np.fill_diagonal(enclosed, False)
+        external = ~enclosed.any(axis=1)
+
+        # Area threshold of the full-size crop, in downscaled pixels
+        min_area = 100 * scale * scale
+        candidates = np.flatnonzero(external & (width >= 3) & (height >= 3) & (width * height > min_area))
+
+        rectangular_patterns = 0
+        for index in candidates:
+            bx, by, bw, bh = boxes[index]
+            outline = labels[by:by + bh, bx:bx + bw] == index + 1
+
+            rows = outline.sum(axis=1)
+            columns = outline.sum(axis=0)
+            if min(rows[0], rows[-1]) >= self.side_coverage * bw and \
+               min(columns[0], columns[-1]) >= self.side_coverage * bh:
+                rectangular_patterns += 1
+
+        if rectangular_patterns > 2:
+            return 0.3, ["rectangular_patterns"]
+
+        return 0.0, []
+
+    def detect_light_bar(self, image: np.ndarray, pixel_codes: np.ndarray,
+                         scale: float = 1.0) -> Tuple[float, bool]:
+        """Count wide bright components in the top third of the crop"""
+        top_codes = pixel_codes[:image.shape[0] // 3, :]
+        bright_mask = cv2.compare(cv2.bitwise_and(top_codes, self.light_bar_bit), 0, cv2.CMP_NE)
+
+        _, _, stats, _ = cv2.connectedComponentsWithStats(bright_mask, connectivity=8)
+        width = stats[1:, cv2.CC_STAT_WIDTH]
+        height = stats[1:, cv2.CC_STAT_HEIGHT]
+
+        # Wider than twice their height and wider than 20 full-size pixels
+        horizontal_patterns = int(np.count_nonzero((width > 2 * height) & (width > 20 * scale)))
+
+        return min(horizontal_patterns * 0.3, 1.0), horizontal_patterns > 0
@@ -0,0 +1,255 @@
+import cv2
+import numpy as np
+import os
+import struct
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+# Raw frame header: magic, width, height, pixel format code, 3 padding bytes
+RAW_FRAME_MAGIC = b'RAWF'
+RAW_HEADER = struct.Struct('<4sHHB3x')
+
+# Pixel format code -> (name, bytes per frame as a function of width and height)
+RAW_PIXEL_FORMATS = {
+    0: ('bgr', lambda width, height: width * height * 3),
+    1: ('i420', lambda width, height: width * height * 3 // 2),
+    2: ('nv12', lambda width, height: width * height * 3 // 2),
+    3: ('yuyv', lambda width, height: width * height * 2)
+}
+RAW_FORMAT_CODES = {name: code for code, (name, _) in RAW_PIXEL_FORMATS.items()}
+
+# JPEG start-of-frame markers that carry the image dimensions
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+REDUCED_DECODE_FLAGS = {
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    2: cv2.IMREAD_REDUCED_COLOR_2
+}
+
+def raw_frame_header(width: int, height: int, pixel_format: str = 'bgr') -> bytes:
+    """
+    Header to prepend to raw pixels sent by a trusted local camera
+
+    Args:
+        width: Frame width in pixels
+        height: Frame height in pixels
+        pixel_format: 'bgr', 'i420', 'nv12' or 'yuyv'
+
+    Returns:
+        Packed header bytes
+    """
+    return RAW_HEADER.pack(RAW_FRAME_MAGIC, width, height, RAW_FORMAT_CODES[pixel_format])
+
+def jpeg_dimensions(data) -> Optional[Tuple[int, int]]:
+    """Read (width, height) from a JPEG's SOF marker without decoding it"""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+
+    position = 2
+    while position + 9 < len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+
+        if marker == 0xFF:
+            # Fill byte before a marker
+            position += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            # Markers without a length field
+            position += 2
+            continue
+
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack_from('>HH', data, position + 5)
+            return width, height
+
+        segment_length = struct.unpack_from('>H', data, position + 2)[0]
+        position += 2 + segment_length
+
+    return None
+
+class FrameDecoder:
+    """
+    Decodes uploaded frames with as few copies and as little work as possible
+
+    Uploads are read into a per-thread buffer that is reused across frames
+    instead of allocating a new bytes object each time. Large JPEGs are
+    decoded straight to a reduced resolution (libjpeg DCT scaling) that is
+    still at least the model input size, and trusted local cameras can send
+    raw BGR/YUV frames with a small shape header to skip JPEG altogether.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+        self.initial_buffer_bytes = int(os.getenv('DECODE_BUFFER_BYTES', 1024 * 1024))
+        self.reduced_resolution = os.getenv('DECODE_REDUCED_RESOLUTION', 'true').lower() == 'true'
+        self.target_size = int(os.getenv('DECODE_TARGET_SIZE', 640))  # model input size
+        self.raw_frames_enabled = os.getenv('RAW_FRAMES_ENABLED', 'false').lower() == 'true'
+
+        # Each request thread gets its own reusable read buffer
+        self.local = threading.local()
+
+        self.stats = {
+            'full': 0,
+            'reduced': 0,
+            'raw': 0,
+            'failed': 0
+        }
+
+    def decode(self, image_input, reduce: bool = True,
+               detach: bool = False) -> Tuple[Optional[np.ndarray], float]:
+        """
+        Decode an image input into a BGR frame
+
+        Unless detach is set, raw BGR frames are returned as a view of the
+        thread's read buffer and stay valid until the next decode on the
+        same thread.
+
+        Args:
+            image_input: Numpy array, file-like object, bytes or file path
+            reduce: Allow decoding JPEGs at a reduced resolution
+            detach: Copy raw frames out of the reusable read buffer
+
+        Returns:
+            (BGR image or None, scale of the image relative to the original frame)
+        """
+        data = self.read(image_input)
+        if data is None or isinstance(data, np.ndarray):
+            return data, 1.0
+
+        image, scale = self._decode_bytes(data, reduce)
+        if image is None:
+            self.stats['failed'] += 1
+        elif detach and image.base is not None:
+            image = image.copy()
+
+        return image, scale
+
+    def read(self, image_input):
+        """
+        Get the encoded bytes of an image input without decoding them
+
+        File-like objects and paths are read into the thread's reusable
+        buffer, so the returned view stays valid until the next read on the
+        same thread. Numpy arrays are returned as they are.
+
+        Returns:
+            Numpy array, memoryview of the encoded frame, or None
+        """
+        if isinstance(image_input, np.ndarray):
+            return image_input
+
+        if isinstance(image_input, (bytes, bytearray, memoryview)):
+            return memoryview(image_input)
+        if hasattr(image_input, 'read'):
+            return self._read_into_buffer(image_input)
+        if isinstance(image_input, str):
+            with open(image_input, 'rb') as f:
+                return self._read_into_buffer(f)
+
+        return None
+
+    def _read_into_buffer(self, stream) -> memoryview:
+        """Read a stream into the thread's reusable buffer, growing it when needed"""
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is None:
+            buffer = self.local.buffer = bytearray(self.initial_buffer_bytes)
+
+        # Werkzeug uploads wrap the underlying stream
+        stream = getattr(stream, 'stream', stream)
+
+        length = 0
+        while True:
+            if length == len(buffer):
+                grown = bytearray(len(buffer) * 2)
+                grown[:length] = buffer
+                buffer = self.local.buffer = grown
+
+            view = memoryview(buffer)[length:]
+            if hasattr(stream, 'readinto'):
+                count = stream.readinto(view)
+            else:
+                chunk = stream.read(len(view))
+                count = len(chunk)
+                view[:count] = chunk
+
+            if not count:
+                break
+            length += count
+
+        return memoryview(buffer)[:length]
+
+    def _decode_bytes(self, data: memoryview, reduce: bool) -> Tuple[Optional[np.ndarray], float]:
+        if len(data) >= RAW_HEADER.size and bytes(data[:4]) == RAW_FRAME_MAGIC:
+            return self._decode_raw(data), 1.0
+
+        encoded = np.frombuffer(data, dtype=np.uint8)
+        if encoded.size == 0:
+            return None, 1.0
+
+        dimensions = jpeg_dimensions(data) if reduce and self.reduced_resolution else None
+        factor = self._reduction_factor(dimensions)
+        if factor > 1:
+            image = cv2.imdecode(encoded, REDUCED_DECODE_FLAGS[factor])
+            if image is not None:
+                self.stats['reduced'] += 1
+                return image, image.shape[1] / float(dimensions[0])
+
+        image = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+        if image is not None:
+            self.stats['full'] += 1
+
+        return image, 1.0
+
+    def _reduction_factor(self, dimensions: Optional[Tuple[int, int]]) -> int:
+        """Largest JPEG scale-down that keeps the long side at or above the model input"""
+        if dimensions is None:
+            return 1
+
+        long_side = max(dimensions)
+        for factor in (8, 4, 2):
+            if long_side // factor >= self.target_size:
+                return factor
+
+        return 1
+
+    def _decode_raw(self, data: memoryview) -> Optional[np.ndarray]:
+        """Interpret a raw BGR/YUV frame behind a shape header"""
+        if not self.raw_frames_enabled:
+            self.logger.warning("Rejected raw frame: RAW_FRAMES_ENABLED is off")
+            return None
+
+        _, width, height, format_code = RAW_HEADER.unpack_from(data)
+        if format_code not in RAW_PIXEL_FORMATS or width == 0 or height == 0:
+            self.logger.error(f"Unsupported raw frame format {format_code} ({width}x{height})")
+            return None
+
+        pixel_format, frame_bytes = RAW_PIXEL_FORMATS[format_code]
+        expected = frame_bytes(width, height)
+        if len(data) - RAW_HEADER.size < expected:
+            self.logger.error(f"Raw {pixel_format} frame truncated: expected {expected} bytes")
+            return None
+
+        pixels = np.frombuffer(data, dtype=np.uint8, count=expected, offset=RAW_HEADER.size)
+        self.stats['raw'] += 1
+
+        if pixel_format == 'bgr':
+            return pixels.reshape(height, width, 3)
+        if pixel_format == 'i420':
+            return cv2.cvtColor(pixels.reshape(height * 3 // 2, width), cv2.COLOR_YUV2BGR_I420)
+        if pixel_format == 'nv12':
+            return cv2.cvtColor(pixels.reshape(height * 3 // 2, width), cv2.COLOR_YUV2BGR_NV12)
+        return cv2.cvtColor(pixels.reshape(height, width, 2), cv2.COLOR_YUV2BGR_YUYV)
+
+    def get_stats(self) -> Dict:
+        """Get decode counters per path"""
+        return {
+            'reduced_resolution': self.reduced_resolution,
+            'target_size': self.target_size,
+            'raw_frames_enabled': self.raw_frames_enabled,
+            'decoded': dict(self.stats)
+        }
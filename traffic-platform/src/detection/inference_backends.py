@@ -0,0 +1,324 @@
+"""
+Inference backends for exported YOLOv8 models
+
+Exported ONNX and OpenVINO IR models run without PyTorch. Their results
+mimic the parts of the ultralytics Results interface the detector uses
+(result.boxes iterating boxes with cls, conf and xyxy), so the detector
+does not need to know which backend produced them.
+"""
+
+import ast
+import cv2
+import numpy as np
+import os
+import re
+import logging
+from typing import Dict, List, Tuple
+
+SUPPORTED_BACKENDS = ('ultralytics', 'onnxruntime', 'openvino')
+
+def resolve_backend(model_path: str, backend: str = 'auto') -> str:
+    """
+    Pick the inference backend for a model
+
+    Args:
+        model_path: Path to a .pt, .onnx, OpenVINO .xml file or *_openvino_model directory
+        backend: Requested backend or 'auto' to choose from the model path
+
+    Returns:
+        Backend name
+    """
+    backend = (backend or 'auto').lower()
+
+    if backend != 'auto':
+        if backend not in SUPPORTED_BACKENDS:
+            raise ValueError(f"Unsupported detection backend: {backend}")
+        return backend
+
+    normalized_path = model_path.rstrip('/\\')
+    if normalized_path.endswith('.onnx'):
+        return 'onnxruntime'
+    if normalized_path.endswith('.xml') or normalized_path.endswith('_openvino_model'):
+        return 'openvino'
+
+    return 'ultralytics'
+
+def load_exported_backend(model_path: str, backend: str):
+    """Load an exported model with the given non-PyTorch backend"""
+    if backend == 'onnxruntime':
+        return OnnxRuntimeBackend(model_path)
+    if backend == 'openvino':
+        return OpenVinoBackend(model_path)
+
+    raise ValueError(f"Backend {backend} does not load exported models")
+
+class BackendBox:
+    """Single detection in the ultralytics box layout (one-element arrays)"""
+
+    __slots__ = ('cls', 'conf', 'xyxy')
+
+    def __init__(self, cls: np.ndarray, conf: np.ndarray, xyxy: np.ndarray):
+        self.cls = cls
+        self.conf = conf
+        self.xyxy = xyxy
+
+class BackendBoxes:
+    """All detections of one image, iterable box by box"""
+
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __iter__(self):
+        for i in range(len(self.conf)):
+            yield BackendBox(self.cls[i:i + 1], self.conf[i:i + 1], self.xyxy[i:i + 1])
+
+class BackendResult:
+    """Detections for one image"""
+
+    def __init__(self, boxes: BackendBoxes, names: Dict[int, str], orig_shape: Tuple[int, int]):
+        self.boxes = boxes
+        self.names = names
+        self.orig_shape = orig_shape
+
+class ExportedYoloBackend:
+    """
+    Shared pre- and post-processing for exported YOLOv8 detection graphs
+
+    Subclasses only implement _infer(), which maps an NCHW float32 batch to
+    the raw model output.
+    """
+
+    def __init__(self, model_path: str):
+        self.logger = logging.getLogger(__name__)
+
+        self.model_path = model_path
+        self.conf_threshold = float(os.getenv('BACKEND_CONF_THRESHOLD', 0.25))
+        self.iou_threshold = float(os.getenv('BACKEND_IOU_THRESHOLD', 0.45))
+        self.max_detections = int(os.getenv('BACKEND_MAX_DETECTIONS', 300))
+
+        # Filled in by subclasses from the exported model
+        self.names: Dict[int, str] = {}
+        self.image_size = int(os.getenv('BACKEND_IMAGE_SIZE', 640))
+        self.dynamic_batch = False
+        self.end_to_end = False
+
+    def __call__(self, source) -> List[BackendResult]:
+        """Run detection on one image or a list of images"""
+        images = source if isinstance(source, list) else [source]
+        if not images:
+            return []
+
+        tensors = []
+        letterbox_params = []
+        for image in images:
+            tensor, params = self._letterbox(image)
+            tensors.append(tensor)
+            letterbox_params.append(params)
+
+        if self.dynamic_batch:
+            outputs = self._infer(np.stack(tensors))
+        else:
+            outputs = np.concatenate([self._infer(tensor[None]) for tensor in tensors])
+
+        return [
+            self._postprocess(output, params, image.shape[:2])
+            for output, params, image in zip(outputs, letterbox_params, images)
+        ]
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _letterbox(self, image: np.ndarray) -> Tuple[np.ndarray, Tuple[float, float, float]]:
+        """Resize keeping aspect ratio and pad to a square model input"""
+        height, width = image.shape[:2]
+        ratio = min(self.image_size / height, self.image_size / width)
+        new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+
+        if (new_width, new_height) != (width, height):
+            image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+        pad_x = (self.image_size - new_width) / 2
+        pad_y = (self.image_size - new_height) / 2
+        top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+        left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+        padded = cv2.copyMakeBorder(image, top, bottom, left, right,
+                                    cv2.BORDER_CONSTANT, value=(114, 114, 114))
+
+        # BGR HWC uint8 -> RGB CHW float32 in [0, 1]
+        tensor = cv2.dnn.blobFromImage(padded, scalefactor=1 / 255.0, swapRB=True)[0]
+
+        return tensor, (ratio, left, top)
+
+    def _postprocess(self, output: np.ndarray, params: Tuple[float, float, float],
+                     orig_shape: Tuple[int, int]) -> BackendResult:
+        """Decode raw output, apply NMS and map boxes back to the original image"""
+        ratio, pad_x, pad_y = params
+
+        if self.end_to_end:
+            # NMS-free export: rows of [x1, y1, x2, y2, conf, cls]
+            detections = output[output[:, 4] > self.conf_threshold]
+            xyxy = detections[:, :4].astype(np.float32)
+            conf = detections[:, 4].astype(np.float32)
+            cls = detections[:, 5].astype(np.float32)
+        else:
+            # Raw head: (4 + classes, anchors) with boxes as centre x/y, width, height
+            predictions = output.T
+            class_scores = predictions[:, 4:]
+            cls = class_scores.argmax(axis=1)
+            conf = class_scores[np.arange(len(cls)), cls]
+
+            keep = conf > self.conf_threshold
+            predictions, conf, cls = predictions[keep], conf[keep], cls[keep]
+
+            xywh = predictions[:, :4].copy()
+            xywh[:, 0] -= xywh[:, 2] / 2
+            xywh[:, 1] -= xywh[:, 3] / 2
+
+            kept = cv2.dnn.NMSBoxesBatched(
+                xywh.tolist(), conf.tolist(), cls.tolist(),
+                self.conf_threshold, self.iou_threshold
+            )
+            kept = np.array(kept, dtype=np.int64).reshape(-1)[:self.max_detections]
+
+            xywh, conf, cls = xywh[kept], conf[kept].astype(np.float32), cls[kept].astype(np.float32)
+            xyxy = np.concatenate([xywh[:, :2], xywh[:, :2] + xywh[:, 2:4]], axis=1).astype(np.float32)
+
+        # Undo letterbox padding and scaling
+        xyxy[:, [0, 2]] = (xyxy[:, [0, 2]] - pad_x) / ratio
+        xyxy[:, [1, 3]] = (xyxy[:, [1, 3]] - pad_y) / ratio
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, orig_shape[1])
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, orig_shape[0])
+
+        return BackendResult(BackendBoxes(xyxy, conf, cls), self.names, orig_shape)
+
+def _parse_ir_labels(labels: str) -> Dict[int, str]:
+    """
+    Parse the model_info/labels runtime info of an OpenVINO IR
+
+    The label list is serialised as one space-separated string, and the
+    exporter replaces the spaces inside names with underscores, so they
+    are turned back into spaces ('traffic_light' -> 'traffic light').
+    """
+    return {i: label.replace('_', ' ') for i, label in enumerate(labels.split())}
+
+def _parse_names(names_value) -> Dict[int, str]:
+    """Parse class names stored as a dict literal or a list"""
+    if isinstance(names_value, dict):
+        return {int(k): str(v) for k, v in names_value.items()}
+    if isinstance(names_value, (list, tuple)):
+        return {i: str(name) for i, name in enumerate(names_value)}
+
+    return _parse_names(ast.literal_eval(names_value))
+
+class OnnxRuntimeBackend(ExportedYoloBackend):
+    """Exported ONNX model executed with ONNX Runtime on the CPU"""
+
+    def __init__(self, model_path: str):
+        super().__init__(model_path)
+
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("onnxruntime is required for the onnxruntime detection backend")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        num_threads = int(os.getenv('BACKEND_NUM_THREADS', 0))
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+        input_shape = self.session.get_inputs()[0].shape
+        self.dynamic_batch = not isinstance(input_shape[0], int)
+        if isinstance(input_shape[2], int):
+            self.image_size = input_shape[2]
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        if 'names' in metadata:
+            self.names = _parse_names(metadata['names'])
+        if 'imgsz' in metadata and isinstance(input_shape[2], str):
+            self.image_size = int(ast.literal_eval(metadata['imgsz'])[0])
+        self.end_to_end = metadata.get('end2end', 'False') == 'True'
+
+        self.logger.info(f"Loaded ONNX model {model_path} ({len(self.names)} classes)")
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: batch})[0]
+
+class OpenVinoBackend(ExportedYoloBackend):
+    """Exported OpenVINO IR model compiled for the CPU"""
+
+    def __init__(self, model_path: str):
+        super().__init__(model_path)
+
+        try:
+            import openvino as ov
+        except ImportError:
+            raise ImportError("openvino is required for the openvino detection backend")
+
+        xml_path = self._find_model_xml(model_path)
+
+        core = ov.Core()
+        model = core.read_model(xml_path)
+
+        input_shape = model.input(0).get_partial_shape()
+        self.dynamic_batch = input_shape[0].is_dynamic
+        if input_shape[2].is_static:
+            self.image_size = input_shape[2].get_length()
+
+        self.names = self._read_names(model, os.path.dirname(xml_path))
+
+        hint = os.getenv('OPENVINO_PERFORMANCE_HINT', 'LATENCY')
+        self.compiled_model = core.compile_model(model, 'CPU', {'PERFORMANCE_HINT': hint})
+        self.output = self.compiled_model.output(0)
+
+        self.logger.info(f"Loaded OpenVINO model {xml_path} ({len(self.names)} classes)")
+
+    def _find_model_xml(self, model_path: str) -> str:
+        if os.path.isdir(model_path):
+            for filename in sorted(os.listdir(model_path)):
+                if filename.endswith('.xml'):
+                    return os.path.join(model_path, filename)
+            raise FileNotFoundError(f"No OpenVINO .xml model found in {model_path}")
+
+        return model_path
+
+    def _read_names(self, model, model_dir: str) -> Dict[int, str]:
+        """Read class names from the exported metadata.yaml, or else the IR runtime info"""
+        names = self._read_metadata_names(model_dir)
+        if names:
+            return names
+
+        try:
+            return _parse_ir_labels(model.get_rt_info(['model_info', 'labels']).astype(str))
+        except Exception:
+            return {}
+
+    def _read_metadata_names(self, model_dir: str) -> Dict[int, str]:
+        """Class names from the names: block of metadata.yaml, which keeps multi-word names intact"""
+        metadata_path = os.path.join(model_dir, 'metadata.yaml')
+        names = {}
+        if os.path.exists(metadata_path):
+            in_names = False
+            with open(metadata_path) as f:
+                for line in f:
+                    if line.startswith('names:'):
+                        in_names = True
+                        continue
+                    match = re.match(r'^\s+(\d+):\s*(.+?)\s*$', line)
+                    if in_names and match:
+                        names[int(match.group(1))] = match.group(2).strip('\'"')
+                    elif in_names and not line.startswith(' '):
+                        break
+
+        return names
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        return self.compiled_model([batch])[self.output]
@@ -0,0 +1,329 @@
+import os
+import uuid
+import time
+import socket
+import logging
+import ipaddress
+import threading
+import requests
+from collections import OrderedDict
+from urllib.parse import urlparse
+from typing import Any, Callable, Dict, Optional
+from datetime import datetime
+from dataclasses import dataclass, field
+
+DROP_POLICIES = ('drop_oldest_per_camera', 'drop_oldest', 'reject')
+
+@dataclass
+class DetectionJob:
+    job_id: str
+    signal_id: str
+    frame: Any  # Encoded image bytes or numpy array, released once processed
+    callback_url: Optional[str] = None
+    status: str = 'queued'  # queued, running, completed, failed, dropped
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        """Job state as returned by the API (without the frame)"""
+        job = {
+            'job_id': self.job_id,
+            'signal_id': self.signal_id,
+            'status': self.status,
+            'submitted_at': datetime.utcfromtimestamp(self.submitted_at).isoformat()
+        }
+        if self.started_at is not None:
+            job['queue_wait_ms'] = (self.started_at - self.submitted_at) * 1000
+        if self.finished_at is not None:
+            job['finished_at'] = datetime.utcfromtimestamp(self.finished_at).isoformat()
+        if self.result is not None:
+            job['result'] = self.result
+        if self.error is not None:
+            job['error'] = self.error
+        return job
+
+class DetectionJobQueue:
+    """
+    Bounded queue of detection jobs drained by a pool of worker threads
+
+    The HTTP endpoint only enqueues a frame and returns its job ID; workers
+    run detection and the follow-up actions, and the outcome is fetched by
+    job ID or POSTed to a callback URL. When the queue is full, frames are
+    dropped according to the drop policy instead of piling up latency.
+    Stale frames are worthless for signal control, so by default each
+    camera keeps only its newest few frames in the queue.
+
+    Jobs live in the memory of the process that accepted them: with several
+    server processes (gunicorn workers), a job can only be looked up through
+    the process that queued it, so run a single worker or route a client's
+    requests to the same worker when polling jobs. Callback URLs don't have
+    this limitation.
+    """
+
+    def __init__(self, process: Callable[[str, Any], Dict], num_workers: int = None,
+                 max_size: int = None, drop_policy: str = None):
+        self.logger = logging.getLogger(__name__)
+
+        # Called as process(signal_id, frame) by the workers
+        self.process = process
+
+        self.num_workers = num_workers or max(1, int(os.getenv('JOB_QUEUE_WORKERS', 2)))
+        self.max_size = max_size or max(1, int(os.getenv('JOB_QUEUE_MAX_SIZE', 64)))
+        self.max_per_camera = max(1, int(os.getenv('JOB_QUEUE_MAX_PER_CAMERA', 2)))
+        self.result_ttl = float(os.getenv('JOB_RESULT_TTL', 300))  # seconds
+        self.callback_timeout = float(os.getenv('JOB_CALLBACK_TIMEOUT', 5))  # seconds
+        # Hosts callbacks may go to; when empty, any host with only public addresses
+        self.callback_allowed_hosts = {
+            host.strip().lower() for host in os.getenv('JOB_CALLBACK_ALLOWED_HOSTS', '').split(',') if host.strip()
+        }
+
+        self.drop_policy = drop_policy or os.getenv('JOB_QUEUE_DROP_POLICY', 'drop_oldest_per_camera')
+        if self.drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unsupported job queue drop policy: {self.drop_policy}")
+
+        # Jobs waiting for a worker in arrival order, plus every job still within its TTL
+        self.pending: 'OrderedDict[str, DetectionJob]' = OrderedDict()
+        self.jobs: Dict[str, DetectionJob] = {}
+        self.condition = threading.Condition()
+
+        self.active = False
+        self.threads = []
+
+        self.stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'dropped': 0,
+            'rejected': 0
+        }
+        self.jobs_started = 0
+        self.total_queue_wait = 0.0
+
+    def submit(self, signal_id: str, frame, callback_url: str = None) -> Dict:
+        """
+        Queue a frame for detection
+
+        Args:
+            signal_id: Camera/signal the frame came from
+            frame: Encoded image bytes or numpy array
+            callback_url: Optional URL the finished job is POSTed to
+
+        Returns:
+            Job state dict; status 'rejected' if the queue is full under the reject policy
+            or the callback URL is not allowed
+        """
+        if callback_url:
+            error = self.check_callback_url(callback_url)
+            if error is not None:
+                with self.condition:
+                    self.stats['rejected'] += 1
+                return {'job_id': None, 'signal_id': signal_id, 'status': 'rejected', 'error': error}
+
+        job = DetectionJob(
+            job_id=uuid.uuid4().hex,
+            signal_id=signal_id,
+            frame=frame,
+            callback_url=callback_url
+        )
+
+        with self.condition:
+            self._expire_jobs()
+
+            if not self._make_room(signal_id):
+                self.stats['rejected'] += 1
+                return {'job_id': None, 'signal_id': signal_id, 'status': 'rejected',
+                        'error': 'Detection queue is full'}
+
+            self.pending[job.job_id] = job
+            self.jobs[job.job_id] = job
+            self.stats['submitted'] += 1
+            self.condition.notify()
+
+        return job.to_dict()
+
+    def _make_room(self, signal_id: str) -> bool:
+        """Drop queued frames as the policy allows; False if the new frame must be rejected"""
+        if self.drop_policy == 'drop_oldest_per_camera':
+            # Newer frames from the same camera supersede older ones
+            camera_jobs = [job for job in self.pending.values() if job.signal_id == signal_id]
+            while len(camera_jobs) >= self.max_per_camera:
+                self._drop(camera_jobs.pop(0))
+
+        if len(self.pending) < self.max_size:
+            return True
+
+        if self.drop_policy == 'reject':
+            return False
+
+        if self.drop_policy == 'drop_oldest_per_camera':
+            # Take the oldest frame of the camera with the most frames waiting
+            counts: Dict[str, int] = {}
+            for job in self.pending.values():
+                counts[job.signal_id] = counts.get(job.signal_id, 0) + 1
+            busiest = max(counts, key=counts.get)
+            victim = next(job for job in self.pending.values() if job.signal_id == busiest)
+        else:
+            victim = next(iter(self.pending.values()))
+
+        self._drop(victim)
+        return True
+
+    def _drop(self, job: DetectionJob):
+        del self.pending[job.job_id]
+        job.status = 'dropped'
+        job.frame = None
+        job.finished_at = time.time()
+        self.stats['dropped'] += 1
+
+    def _expire_jobs(self):
+        """Forget finished jobs older than the result TTL"""
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Get the state and, once finished, the result of a job"""
+        with self.condition:
+            job = self.jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def start(self):
+        """Start the worker threads"""
+        with self.condition:
+            if self.active:
+                return
+            self.active = True
+
+        self.threads = [
+            threading.Thread(target=self._worker_loop, name=f"detection-worker-{i}", daemon=True)
+            for i in range(self.num_workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+        self.logger.info(f"Started {self.num_workers} detection workers (queue size {self.max_size}, "
+                         f"policy {self.drop_policy})")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the workers; queued jobs stay queued"""
+        with self.condition:
+            self.active = False
+            self.condition.notify_all()
+
+        for thread in self.threads:
+            thread.join(timeout=timeout)
+
+        self.threads = []
+        self.logger.info("Detection workers stopped")
+
+    def _next_job(self, block: bool = True) -> Optional[DetectionJob]:
+        """Take the oldest queued job, waiting for one if block; None once stopped or empty"""
+        with self.condition:
+            while block and self.active and not self.pending:
+                self.condition.wait()
+
+            if (block and not self.active) or not self.pending:
+                return None
+
+            _, job = self.pending.popitem(last=False)
+            job.status = 'running'
+            job.started_at = time.time()
+            self.jobs_started += 1
+            self.total_queue_wait += job.started_at - job.submitted_at
+            return job
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self.run_job(job)
+
+    def run_job(self, job: DetectionJob):
+        """Process one job and deliver its result"""
+        try:
+            result = self.process(job.signal_id, job.frame)
+            with self.condition:
+                job.result = result
+                job.status = 'completed'
+                self.stats['completed'] += 1
+        except Exception as e:
+            self.logger.error(f"Detection job {job.job_id} for signal {job.signal_id} failed: {e}")
+            with self.condition:
+                job.error = str(e)
+                job.status = 'failed'
+                self.stats['failed'] += 1
+        finally:
+            job.frame = None
+            job.finished_at = time.time()
+
+        if job.callback_url:
+            self._send_callback(job)
+
+    def check_callback_url(self, url: str) -> Optional[str]:
+        """
+        Reason a callback URL may not be used, or None if it may
+
+        Callbacks are sent by this server, so an unchecked URL would let a
+        client make it send requests into the internal network. With
+        JOB_CALLBACK_ALLOWED_HOSTS set only the listed hosts are accepted;
+        otherwise the host must resolve to public addresses only.
+        """
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+            return 'Callback URL must be an http or https URL'
+
+        host = parsed.hostname.lower()
+        if self.callback_allowed_hosts:
+            if host in self.callback_allowed_hosts:
+                return None
+            return f'Callback host {host} is not allowed'
+
+        try:
+            port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+            addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+        except (socket.gaierror, ValueError):
+            return f'Callback host {host} could not be resolved'
+
+        for address in addresses:
+            ip = ipaddress.ip_address(address.split('%')[0])  # drop IPv6 scope IDs
+            if not ip.is_global or ip.is_multicast:
+                return f'Callback host {host} resolves to non-public address {address}'
+
+        return None
+
+    def _send_callback(self, job: DetectionJob):
+        # Checked again at send time, the host may resolve differently by now
+        error = self.check_callback_url(job.callback_url)
+        if error is not None:
+            self.logger.error(f"Callback for detection job {job.job_id} not sent: {error}")
+            return
+
+        try:
+            response = requests.post(job.callback_url, json=job.to_dict(), timeout=self.callback_timeout,
+                                     allow_redirects=False)
+            response.raise_for_status()
+        except Exception as e:
+            self.logger.error(f"Callback for detection job {job.job_id} to {job.callback_url} failed: {e}")
+
+    def get_stats(self) -> Dict:
+        """Get queue depth and job counters"""
+        with self.condition:
+            return {
+                'active': self.active,
+                'workers': self.num_workers,
+                'drop_policy': self.drop_policy,
+                'max_size': self.max_size,
+                'max_per_camera': self.max_per_camera,
+                'queued': len(self.pending),
+                **self.stats,
+                'average_queue_wait_ms': (self.total_queue_wait / self.jobs_started * 1000
+                                          if self.jobs_started else 0.0)
+            }
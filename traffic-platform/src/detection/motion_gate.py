@@ -0,0 +1,108 @@
+import cv2
+import numpy as np
+import os
+import logging
+import threading
+from typing import Dict
+
+class MotionGate:
+    """
+    Cheap change detector that decides whether a camera frame needs YOLO
+
+    Frames are downscaled to a small grayscale thumbnail and compared with
+    the thumbnail of the last frame that was actually analysed for the same
+    signal. Comparing against the last analysed frame (rather than the
+    previous one) means slow changes still accumulate and trigger analysis.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+        self.enabled = os.getenv('MOTION_GATING_ENABLED', 'true').lower() == 'true'
+        self.thumbnail_width = int(os.getenv('MOTION_GATE_WIDTH', 160))
+        self.pixel_threshold = int(os.getenv('MOTION_PIXEL_THRESHOLD', 25))  # grey levels
+        self.area_threshold = float(os.getenv('MOTION_AREA_THRESHOLD', 0.005))  # changed fraction
+        self.max_skipped_frames = int(os.getenv('MOTION_MAX_SKIPPED_FRAMES', 30))
+
+        # Per-signal reference thumbnails and skip streaks
+        self.reference_frames: Dict[str, np.ndarray] = {}
+        self.skip_streaks: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+        self.frames_analyzed = 0
+        self.frames_skipped = 0
+
+    def _thumbnail(self, image: np.ndarray) -> np.ndarray:
+        """Downscaled, blurred grayscale version of the frame"""
+        height, width = image.shape[:2]
+        scale = min(1.0, self.thumbnail_width / float(width))
+        small = cv2.resize(
+            image,
+            (max(1, int(width * scale)), max(1, int(height * scale))),
+            interpolation=cv2.INTER_AREA
+        )
+
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        # Blur out sensor noise and compression artefacts
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def should_analyze(self, signal_id: str, image: np.ndarray) -> bool:
+        """
+        Decide whether a frame differs enough from the last analysed one
+
+        Args:
+            signal_id: Camera/signal the frame came from
+            image: BGR frame
+
+        Returns:
+            True if the frame should go through full detection
+        """
+        if not self.enabled or signal_id is None:
+            return True
+
+        thumbnail = self._thumbnail(image)
+
+        with self.lock:
+            reference = self.reference_frames.get(signal_id)
+            streak = self.skip_streaks.get(signal_id, 0)
+
+            if reference is None or reference.shape != thumbnail.shape or \
+               streak >= self.max_skipped_frames:
+                changed = True
+            else:
+                difference = cv2.absdiff(thumbnail, reference)
+                changed_pixels = np.count_nonzero(difference > self.pixel_threshold)
+                changed = changed_pixels / float(difference.size) > self.area_threshold
+
+            if changed:
+                self.reference_frames[signal_id] = thumbnail
+                self.skip_streaks[signal_id] = 0
+                self.frames_analyzed += 1
+            else:
+                self.skip_streaks[signal_id] = streak + 1
+                self.frames_skipped += 1
+
+        return changed
+
+    def reset(self, signal_id: str = None):
+        """Forget reference frames so the next frame is always analysed"""
+        with self.lock:
+            if signal_id is None:
+                self.reference_frames.clear()
+                self.skip_streaks.clear()
+            else:
+                self.reference_frames.pop(signal_id, None)
+                self.skip_streaks.pop(signal_id, None)
+
+    def get_stats(self) -> Dict:
+        """Get skipped vs. analysed frame counters"""
+        total = self.frames_analyzed + self.frames_skipped
+        return {
+            'enabled': self.enabled,
+            'frames_analyzed': self.frames_analyzed,
+            'frames_skipped': self.frames_skipped,
+            'skip_rate': self.frames_skipped / total if total else 0.0,
+            'tracked_signals': len(self.reference_frames)
+        }
@@ -0,0 +1,610 @@
+import os
+import cv2
+import math
+import time
+import zlib
+import queue
+import logging
+import itertools
+import threading
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from detection.frame_decoder import FrameDecoder
+from utils.metrics import StageMetrics
+
+def create_detector():
+    """Default detector factory, called once inside every pool worker"""
+    from detection.vehicle_detector import EmergencyVehicleDetector
+    return EmergencyVehicleDetector()
+
+def _worker_main(worker_index: int, core: Optional[int], threads_per_worker: int,
+                 detector_factory: Callable, shm_name: str, slot_bytes: int,
+                 task_queue, result_queue):
+    """
+    Pool worker: load the detector once, then serve frames from shared memory
+
+    Tasks are ('detect', task_id, slot, shape, dtype, signal_id, frame_scale,
+    encoded), ('call', task_id, method_name, args) or None to exit. Encoded
+    frames are handed to the detector as bytes, so it decodes them the way
+    it decodes uploads in-process.
+    """
+    logger = logging.getLogger(__name__)
+
+    if core is not None and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, {core})
+        except OSError as e:
+            logger.warning(f"Could not pin detector worker {worker_index} to core {core}: {e}")
+
+    # One inference thread per pinned worker; more would just fight over the core
+    for variable in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'BACKEND_NUM_THREADS'):
+        os.environ[variable] = str(threads_per_worker)
+
+    try:
+        import cv2
+        cv2.setNumThreads(threads_per_worker)
+        try:
+            import torch
+            torch.set_num_threads(threads_per_worker)
+        except ImportError:
+            pass
+
+        detector = detector_factory()
+        shm = shared_memory.SharedMemory(name=shm_name)
+    except Exception as e:
+        result_queue.put(('failed', worker_index, str(e)))
+        return
+
+    result_queue.put(('ready', worker_index, os.getpid()))
+
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+
+            kind, task_id = task[0], task[1]
+            try:
+                if kind == 'detect':
+                    _, _, slot, shape, dtype, signal_id, frame_scale, encoded = task
+                    frame = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=slot * slot_bytes)
+                    if encoded:
+                        frame = frame.tobytes()
+                    kwargs = {'frame_scale': frame_scale} if frame_scale != 1.0 else {}
+                    result = detector.detect_emergency_vehicle(frame, signal_id=signal_id, **kwargs)
+                    del frame  # results must not reference the shared buffer
+                else:
+                    _, _, method_name, args = task
+                    result = getattr(detector, method_name)(*args)
+                result_queue.put(('result', task_id, result))
+            except Exception as e:
+                result_queue.put(('error', task_id, str(e)))
+    finally:
+        shm.close()
+
+class DetectorProcessPool:
+    """
+    Pool of detector processes fed through shared memory
+
+    Each worker process loads the model once and is optionally pinned to its
+    own core, so inference is not serialised under the GIL of the web
+    process. Frames are copied once into a slot of a shared memory block and
+    only the slot index and shape travel over the task queue, instead of a
+    pickled array. Frames from the same signal always go to the same worker
+    so its motion gate and vehicle tracks keep working.
+    """
+
+    def __init__(self, num_workers: int = None, detector_factory: Callable = create_detector,
+                 start_method: str = None):
+        self.logger = logging.getLogger(__name__)
+
+        cpu_count = os.cpu_count() or 1
+        self.num_workers = num_workers or int(os.getenv('DETECTOR_POOL_WORKERS', 0)) or cpu_count
+        self.pin_cores = os.getenv('DETECTOR_POOL_PIN_CORES', 'true').lower() == 'true'
+        self.threads_per_worker = max(1, int(os.getenv('DETECTOR_POOL_THREADS_PER_WORKER', 1)))
+        self.slots_per_worker = max(1, int(os.getenv('DETECTOR_POOL_SLOTS_PER_WORKER', 2)))
+        self.slot_bytes = int(os.getenv('DETECTOR_POOL_SLOT_BYTES', 1920 * 1080 * 3))  # one 1080p BGR frame
+        self.startup_timeout = float(os.getenv('DETECTOR_POOL_STARTUP_TIMEOUT', 120))  # seconds
+        # Longest wait for a free frame slot or a result, and how often worker liveness is checked
+        self.task_timeout = float(os.getenv('DETECTOR_POOL_TASK_TIMEOUT', 30))  # seconds
+        self.liveness_interval = float(os.getenv('DETECTOR_POOL_LIVENESS_INTERVAL', 1.0))  # seconds
+
+        self.detector_factory = detector_factory
+        # fork is cheap but must happen before the parent loads a model or starts threads;
+        # spawn is safe at any time but re-imports the entry point module in every worker
+        self.context = multiprocessing.get_context(start_method or os.getenv('DETECTOR_POOL_START_METHOD', 'fork'))
+
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.free_slots: 'queue.Queue[int]' = queue.Queue()
+        self.processes = []
+        self.task_queues = []
+        self.result_queue = None
+        self.collector = None
+
+        self.pending: Dict[int, Future] = {}
+        self.pending_slots: Dict[int, int] = {}
+        self.pending_workers: Dict[int, int] = {}  # task_id -> worker index
+        self.dead_workers = set()
+        self.task_ids = itertools.count()
+        self.round_robin = itertools.count()
+        self.lock = threading.Lock()
+
+        self.active = False
+        self.frames_processed = 0
+        self.frames_rejected = 0
+        self.worker_frames = [0] * self.num_workers
+
+    def start(self):
+        """Start the worker processes and wait until every model is loaded"""
+        if self.active:
+            return
+
+        total_slots = self.num_workers * self.slots_per_worker
+        self.shm = shared_memory.SharedMemory(create=True, size=total_slots * self.slot_bytes)
+        for slot in range(total_slots):
+            self.free_slots.put(slot)
+
+        self.result_queue = self.context.Queue()
+        cpu_count = os.cpu_count() or 1
+
+        for worker_index in range(self.num_workers):
+            task_queue = self.context.Queue()
+            core = worker_index % cpu_count if self.pin_cores else None
+            process = self.context.Process(
+                target=_worker_main,
+                args=(worker_index, core, self.threads_per_worker, self.detector_factory,
+                      self.shm.name, self.slot_bytes, task_queue, self.result_queue),
+                name=f"detector-{worker_index}",
+                daemon=True
+            )
+            process.start()
+            self.task_queues.append(task_queue)
+            self.processes.append(process)
+
+        # Wait for every worker to report its model as loaded
+        for _ in range(self.num_workers):
+            try:
+                message = self.result_queue.get(timeout=self.startup_timeout)
+            except queue.Empty:
+                self.stop()
+                raise RuntimeError("Detector workers did not start in time")
+            if message[0] == 'failed':
+                self.stop()
+                raise RuntimeError(f"Detector worker {message[1]} failed to start: {message[2]}")
+
+        self.active = True
+        self.collector = threading.Thread(target=self._collect_results, name="detector-pool-results", daemon=True)
+        self.collector.start()
+
+        self.logger.info(f"Started {self.num_workers} detector processes "
+                         f"({total_slots} shared frame slots of {self.slot_bytes} bytes)")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the worker processes and release the shared memory"""
+        self.active = False
+
+        for task_queue in self.task_queues:
+            task_queue.put(None)
+        for process in self.processes:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+
+        if self.result_queue is not None:
+            self.result_queue.put(None)  # wakes the collector
+        if self.collector is not None:
+            self.collector.join(timeout=timeout)
+
+        with self.lock:
+            for future in self.pending.values():
+                future.set_exception(RuntimeError("Detector pool stopped"))
+            self.pending.clear()
+            self.pending_slots.clear()
+            self.pending_workers.clear()
+            self.dead_workers.clear()
+
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+        self.processes = []
+        self.task_queues = []
+        self.free_slots = queue.Queue()
+        self.collector = None
+        self.logger.info("Detector processes stopped")
+
+    def _worker_for(self, signal_id: Optional[str]) -> Optional[int]:
+        """Stable worker for a signal, round-robin for frames without one, None if all workers exited"""
+        if signal_id is None:
+            worker_index = next(self.round_robin) % self.num_workers
+        else:
+            worker_index = zlib.crc32(signal_id.encode()) % self.num_workers
+
+        if worker_index in self.dead_workers:
+            # Move the signal to a surviving worker rather than queue frames nobody reads
+            alive = [index for index in range(self.num_workers) if index not in self.dead_workers]
+            if not alive:
+                return None
+            worker_index = alive[worker_index % len(alive)]
+
+        return worker_index
+
+    def submit(self, frame, signal_id: str = None, frame_scale: float = 1.0) -> Future:
+        """
+        Queue a frame for detection
+
+        Blocks while all shared memory slots are in use, which bounds the
+        number of frames in flight, but for no longer than
+        DETECTOR_POOL_TASK_TIMEOUT. The future fails if its worker exits
+        before answering.
+
+        Args:
+            frame: BGR image as a numpy array, or the encoded frame as bytes
+            signal_id: Camera/signal the frame came from
+            frame_scale: Size of a numpy frame relative to the camera frame
+                it was downscaled from
+
+        Returns:
+            Future resolving to the detection result dict
+        """
+        if not self.active:
+            raise RuntimeError("Detector pool is not running")
+
+        encoded = not isinstance(frame, np.ndarray)
+        if encoded:
+            frame = np.frombuffer(frame, dtype=np.uint8)
+
+        future = Future()
+        if frame.nbytes > self.slot_bytes:
+            self.frames_rejected += 1
+            future.set_result({
+                'is_emergency': False,
+                'error': f'Frame of {frame.nbytes} bytes exceeds the {self.slot_bytes} byte shared memory slot',
+                'confidence': 0.0,
+                'vehicle_type': None
+            })
+            return future
+
+        try:
+            slot = self.free_slots.get(timeout=self.task_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No free shared memory slot after {self.task_timeout:.0f} s")
+        slot_view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self.shm.buf,
+                               offset=slot * self.slot_bytes)
+        slot_view[...] = frame
+        del slot_view
+
+        # Chosen under the lock so a worker can't be declared dead in between
+        with self.lock:
+            worker_index = self._worker_for(signal_id)
+            if worker_index is not None:
+                task_id = next(self.task_ids)
+                self.pending[task_id] = future
+                self.pending_slots[task_id] = slot
+                self.pending_workers[task_id] = worker_index
+                self.worker_frames[worker_index] += 1
+
+        if worker_index is None:
+            self.free_slots.put(slot)
+            raise RuntimeError("All detector workers have exited")
+
+        self.task_queues[worker_index].put(
+            ('detect', task_id, slot, frame.shape, frame.dtype.str, signal_id, frame_scale, encoded)
+        )
+        return future
+
+    def detect(self, frame: np.ndarray, signal_id: str = None, timeout: float = None) -> Dict:
+        """Detect emergency vehicles in one frame and wait for the result"""
+        return self.submit(frame, signal_id).result(timeout=self._timeout(timeout))
+
+    def detect_many(self, frames: List[np.ndarray], signal_ids: List[str] = None,
+                    timeout: float = None) -> List[Dict]:
+        """Spread several frames over the workers and wait for all results"""
+        futures = [
+            self.submit(frame, signal_ids[index] if signal_ids is not None else None)
+            for index, frame in enumerate(frames)
+        ]
+        return [future.result(timeout=self._timeout(timeout)) for future in futures]
+
+    def broadcast(self, method_name: str, *args, timeout: float = None) -> List:
+        """
+        Call a detector method in every running worker, e.g. set_signal_roi
+
+        Returns:
+            One return value per running worker
+        """
+        calls = []
+        with self.lock:
+            for worker_index, task_queue in enumerate(self.task_queues):
+                if worker_index in self.dead_workers:
+                    continue
+                future = Future()
+                task_id = next(self.task_ids)
+                self.pending[task_id] = future
+                self.pending_workers[task_id] = worker_index
+                calls.append((task_queue, task_id, future))
+
+        for task_queue, task_id, future in calls:
+            task_queue.put(('call', task_id, method_name, args))
+
+        return [future.result(timeout=self._timeout(timeout)) for _, _, future in calls]
+
+    def _timeout(self, timeout: Optional[float]) -> float:
+        return self.task_timeout if timeout is None else timeout
+
+    def _collect_results(self):
+        """Resolve futures and free shared memory slots as workers finish, and notice workers that exit"""
+        next_check = time.monotonic() + self.liveness_interval
+        while True:
+            try:
+                message = self.result_queue.get(timeout=self.liveness_interval)
+            except queue.Empty:
+                message = ()
+            if message is None:
+                return
+
+            if message:
+                self._resolve(*message)
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + self.liveness_interval
+
+    def _resolve(self, kind: str, task_id: int, payload):
+        """Complete one task's future and release its frame slot"""
+        with self.lock:
+            future = self.pending.pop(task_id, None)
+            slot = self.pending_slots.pop(task_id, None)
+            self.pending_workers.pop(task_id, None)
+
+        if slot is not None:
+            self.free_slots.put(slot)
+        if future is None:
+            return
+
+        if kind == 'result':
+            if slot is not None:
+                self.frames_processed += 1
+            future.set_result(payload)
+        else:
+            future.set_exception(RuntimeError(payload))
+
+    def _check_workers(self):
+        """Fail the pending tasks of workers that exited (crash, OOM kill) instead of leaving them waiting"""
+        if not self.active:
+            return
+
+        for worker_index, process in enumerate(self.processes):
+            if worker_index in self.dead_workers or process.is_alive():
+                continue
+
+            with self.lock:
+                self.dead_workers.add(worker_index)
+                task_ids = [task_id for task_id, worker in self.pending_workers.items() if worker == worker_index]
+                futures = [self.pending.pop(task_id) for task_id in task_ids if task_id in self.pending]
+                slots = [self.pending_slots.pop(task_id) for task_id in task_ids if task_id in self.pending_slots]
+                for task_id in task_ids:
+                    del self.pending_workers[task_id]
+
+            self.logger.error(f"Detector worker {worker_index} exited with code {process.exitcode}, "
+                              f"failing {len(futures)} pending tasks")
+            for slot in slots:
+                self.free_slots.put(slot)
+            for future in futures:
+                future.set_exception(RuntimeError(f"Detector worker {worker_index} exited"))
+
+    def get_stats(self) -> Dict:
+        """Get pool size and frame counters"""
+        return {
+            'active': self.active,
+            'workers': self.num_workers,
+            'alive_workers': sum(1 for process in self.processes if process.is_alive()),
+            'pinned_to_cores': self.pin_cores,
+            'threads_per_worker': self.threads_per_worker,
+            'slot_bytes': self.slot_bytes,
+            'exited_workers': sorted(self.dead_workers),
+            'frames_in_flight': len(self.pending_slots),
+            'frames_processed': self.frames_processed,
+            'frames_rejected': self.frames_rejected,
+            'frames_per_worker': list(self.worker_frames)
+        }
+
+class PooledDetector:
+    """
+    Detector interface of the web process when inference runs in the pool
+
+    Encoded uploads are passed to the workers as they are, so they get the
+    same reduced-resolution decode as in-process detection and this process
+    never loads a model; detection and configuration calls are forwarded to
+    the worker processes and their status counters are added up into one
+    report.
+    """
+
+    def __init__(self, pool: DetectorProcessPool):
+        self.logger = logging.getLogger(__name__)
+        self.pool = pool
+        self.frame_decoder = FrameDecoder()
+        self.stage_metrics = StageMetrics()
+
+    def detect_emergency_vehicle(self, image_input, signal_id: Optional[str] = None) -> Dict:
+        """Decode a frame and detect emergency vehicles in it in a worker process"""
+        try:
+            return self.submit(image_input, signal_id).result(timeout=self.pool.task_timeout)
+        except Exception as e:
+            self.logger.error(f"Error in pooled emergency vehicle detection: {e}")
+            return _error_result(str(e))
+
+    def detect_batch(self, frames: List, signal_ids: Optional[List[str]] = None) -> List[Dict]:
+        """Spread several frames over the worker processes, results in frame order"""
+        futures = []
+        for index, frame in enumerate(frames):
+            try:
+                futures.append(self.submit(frame, signal_ids[index] if signal_ids is not None else None))
+            except Exception as e:
+                self.logger.error(f"Error submitting frame to the detector pool: {e}")
+                futures.append(_error_result(str(e)))
+
+        results = []
+        for future in futures:
+            if isinstance(future, dict):
+                results.append(future)
+                continue
+            try:
+                results.append(future.result(timeout=self.pool.task_timeout))
+            except Exception as e:
+                self.logger.error(f"Error in pooled emergency vehicle detection: {e}")
+                results.append(_error_result(str(e)))
+
+        if signal_ids is not None:
+            for signal_id, result in zip(signal_ids, results):
+                result['signal_id'] = signal_id
+
+        return results
+
+    def submit(self, image_input, signal_id: Optional[str] = None) -> Future:
+        """
+        Queue a frame for a worker
+
+        Encoded frames that fit a shared memory slot are decoded by the
+        worker. Numpy frames, and encoded ones too large for a slot, are
+        decoded here at reduced resolution and downscaled until they fit, with
+        the scale passed on so boxes still refer to the camera frame.
+        """
+        data = self.frame_decoder.read(image_input)
+        if data is not None and not isinstance(data, np.ndarray) and data.nbytes <= self.pool.slot_bytes:
+            # The pool copies the frame into shared memory before returning
+            return self.pool.submit(data, signal_id)
+
+        with self.stage_metrics.measure('decode'):
+            image, scale = self.frame_decoder.decode(data)
+            if image is not None and image.nbytes > self.pool.slot_bytes:
+                image, scale = self._fit_slot(image, scale)
+
+        if image is None:
+            future = Future()
+            future.set_result(_error_result('Invalid image input'))
+            return future
+
+        return self.pool.submit(image, signal_id, frame_scale=scale)
+
+    def _fit_slot(self, image: np.ndarray, scale: float):
+        """Downscale a frame to fit a shared memory slot, returns (image, scale)"""
+        height, width = image.shape[:2]
+        factor = math.sqrt(self.pool.slot_bytes / image.nbytes)
+        size = (max(1, int(width * factor)), max(1, int(height * factor)))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        return image, scale * size[0] / width
+
+    def set_signal_roi(self, signal_id: str, polygon: Optional[List[List[int]]]) -> bool:
+        """Apply a signal's ROI in every worker; False if any worker rejected it"""
+        return all(self.pool.broadcast('set_signal_roi', signal_id, polygon))
+
+    def get_signal_roi(self, signal_id: str) -> Optional[List[List[int]]]:
+        """A signal's ROI polygon; every worker holds the same ROIs"""
+        polygons = self.pool.broadcast('get_signal_roi', signal_id)
+        return polygons[0] if polygons else None
+
+    def warm_up(self) -> float:
+        """Warm up every worker's model, returns the slowest warm-up in ms"""
+        return max(self.pool.broadcast('warm_up'), default=0.0)
+
+    def get_system_status(self) -> Dict:
+        """Status of the worker detectors with their counters added up"""
+        try:
+            statuses = self.pool.broadcast('get_system_status')
+        except Exception as e:
+            self.logger.error(f"Error getting detector worker status: {e}")
+            statuses = []
+
+        if not statuses:
+            return {
+                'model_loaded': False,
+                'decoding': self.frame_decoder.get_stats(),
+                'stage_timings': self.get_stage_metrics(),
+                'status': 'degraded'
+            }
+
+        status = _merge_worker_status(statuses)
+        # Oversized and numpy frames are decoded in this process, inference latency is on /api/detect/metrics
+        status['decoding'] = _merge_decoding_stats(
+            [self.frame_decoder.get_stats()] + [worker['decoding'] for worker in statuses if 'decoding' in worker]
+        )
+        status['stage_timings'] = self.get_stage_metrics()
+        if len(statuses) < self.pool.num_workers:
+            status['status'] = 'degraded'
+        return status
+
+    def get_stage_metrics(self) -> Dict:
+        """Rolling latency percentiles of the stages run in this process"""
+        return self.stage_metrics.get_stats()
+
+    def export_stage_metrics(self, header: bool = True) -> str:
+        """Stage latencies in the Prometheus text format, labelled with this process"""
+        return self.stage_metrics.to_prometheus(
+            'detection_stage_latency_ms', {'pid': str(os.getpid())}, header=header
+        )
+
+def _error_result(error: str) -> Dict:
+    return {
+        'is_emergency': False,
+        'error': error,
+        'confidence': 0.0,
+        'vehicle_type': None
+    }
+
+# Per-worker counters that add up across the pool, and the rates derived from them
+SUMMED_STATUS_FIELDS = {
+    'motion_gating': ('frames_analyzed', 'frames_skipped', 'tracked_signals'),
+    'result_cache': ('entries', 'max_entries', 'hits', 'misses', 'evictions', 'expirations'),
+    'tracking': ('active_tracks', 'tracks_created', 'analyses_run', 'analyses_reused'),
+    'cascade': ('frames_processed', 'frames_escalated')
+}
+DERIVED_STATUS_RATES = {
+    'motion_gating': ('skip_rate', 'frames_skipped', ('frames_analyzed', 'frames_skipped')),
+    'result_cache': ('hit_rate', 'hits', ('hits', 'misses')),
+    'tracking': ('reuse_rate', 'analyses_reused', ('analyses_run', 'analyses_reused')),
+    'cascade': ('hit_rate', 'frames_escalated', ('frames_processed',))
+}
+
+def _merge_decoding_stats(stats: List[Dict]) -> Dict:
+    """Add up the per-path decode counters of several FrameDecoders"""
+    merged = dict(stats[0])
+    merged['decoded'] = {
+        path: sum(decoder['decoded'].get(path, 0) for decoder in stats)
+        for path in stats[0]['decoded']
+    }
+    return merged
+
+def _merge_worker_status(statuses: List[Dict]) -> Dict:
+    """Combine get_system_status of every worker: configuration from the first, counters summed"""
+    status = dict(statuses[0])
+    status['workers'] = len(statuses)
+    status['model_loaded'] = all(worker.get('model_loaded') for worker in statuses)
+    status['warmed_up'] = all(worker.get('warmed_up') for worker in statuses)
+    status['roi_signals'] = sorted({signal_id for worker in statuses for signal_id in worker.get('roi_signals', [])})
+    if any(worker.get('status') != 'operational' for worker in statuses):
+        status['status'] = 'degraded'
+
+    for section, fields in SUMMED_STATUS_FIELDS.items():
+        if not all(section in worker for worker in statuses):
+            continue
+        merged = dict(statuses[0][section])
+        for field in fields:
+            merged[field] = sum(worker[section].get(field, 0) for worker in statuses)
+
+        rate, numerator, denominator = DERIVED_STATUS_RATES[section]
+        total = sum(merged[field] for field in denominator)
+        merged[rate] = merged[numerator] / total if total else 0.0
+        status[section] = merged
+
+    if 'cascade' in status:
+        status['cascade']['stage_runs'] = {
+            model: sum(worker['cascade']['stage_runs'].get(model, 0) for worker in statuses)
+            for model in statuses[0]['cascade']['stage_runs']
+        }
+
+    return status
@@ -0,0 +1,173 @@
+import cv2
+import numpy as np
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+def frame_dhash(image: np.ndarray, hash_size: int = 16) -> int:
+    """
+    Difference hash of a frame
+
+    The frame is shrunk to a (hash_size + 1) x hash_size grayscale thumbnail
+    and each bit records whether a pixel is brighter than its right-hand
+    neighbour. Re-encoded copies of the same snapshot hash identically,
+    while anything that moves changes the gradients and with them the hash.
+
+    Args:
+        image: BGR or grayscale frame
+        hash_size: Bits per row and number of rows (hash has hash_size² bits)
+
+    Returns:
+        Hash as a Python integer
+    """
+    if image.ndim == 3:
+        # Shrink before converting so the colour conversion only touches a few pixels
+        image = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    else:
+        image = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+
+    gradient_bits = image[:, 1:] > image[:, :-1]
+    return int.from_bytes(np.packbits(gradient_bits).tobytes(), 'big')
+
+def frame_thumbnail(image: np.ndarray, size: int = 64) -> np.ndarray:
+    """Grayscale size x size thumbnail of a frame, averaged over each cell"""
+    image = cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA)
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+class FrameSignature(NamedTuple):
+    """dHash used as the cache key and the thumbnail that confirms a match"""
+    dhash: int
+    thumbnail: np.ndarray
+
+class DetectionResultCache:
+    """
+    LRU cache of detection results keyed by signal and perceptual frame hash
+
+    Operators and the dashboard re-submit the same snapshot and frozen
+    cameras keep sending identical frames; both are answered from the
+    cache without running the model. Entries expire after a TTL so a
+    camera that stays frozen still gets re-analysed now and then.
+
+    The dHash averages the ROI over a 17 x 16 grid, so a small vehicle
+    moving through a large view can leave it unchanged. A hit therefore
+    also needs every cell of a finer thumbnail to be within
+    RESULT_CACHE_MAX_PIXEL_CHANGE gray levels of the cached frame's.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+        self.enabled = os.getenv('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+        self.max_entries = max(1, int(os.getenv('RESULT_CACHE_SIZE', 256)))
+        self.ttl = float(os.getenv('RESULT_CACHE_TTL', 30))  # seconds
+        self.hash_size = int(os.getenv('RESULT_CACHE_HASH_SIZE', 16))
+        self.thumbnail_size = int(os.getenv('RESULT_CACHE_THUMBNAIL_SIZE', 64))
+        self.max_pixel_change = int(os.getenv('RESULT_CACHE_MAX_PIXEL_CHANGE', 12))
+
+        # (signal_id, dHash) -> (stored at, thumbnail, result), least recently used first
+        self.entries: 'OrderedDict[Tuple[Optional[str], int], Tuple[float, np.ndarray, Dict]]' = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def frame_hash(self, image: np.ndarray) -> Optional[FrameSignature]:
+        """Signature of the frame, or None when caching is disabled"""
+        if not self.enabled:
+            return None
+        return FrameSignature(frame_dhash(image, self.hash_size), frame_thumbnail(image, self.thumbnail_size))
+
+    def get(self, signal_id: Optional[str], frame_hash: Optional[FrameSignature]) -> Optional[Dict]:
+        """
+        Look up the result of an identical earlier frame from the same signal
+
+        A stored frame with the same dHash but a thumbnail that differs in
+        any cell by more than max_pixel_change is a miss.
+
+        Returns:
+            Copy of the cached result marked as a cache hit, or None
+        """
+        if frame_hash is None:
+            return None
+
+        key = (signal_id, frame_hash.dhash)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                del self.entries[key]
+                self.expirations += 1
+                entry = None
+
+            if entry is not None and not self._same_frame(entry[1], frame_hash.thumbnail):
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+        cached_result = {**entry[2], 'cache_hit': True}
+        if 'new_event' in cached_result:
+            # The vehicles in a cached result have already been reported
+            cached_result['new_event'] = False
+
+        return cached_result
+
+    def put(self, signal_id: Optional[str], frame_hash: Optional[FrameSignature], result: Dict):
+        """Store a detection result, evicting the least recently used entries when full"""
+        if frame_hash is None or 'error' in result:
+            return
+
+        key = (signal_id, frame_hash.dhash)
+        with self.lock:
+            self.entries[key] = (time.time(), frame_hash.thumbnail, result)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def _same_frame(self, cached: np.ndarray, thumbnail: np.ndarray) -> bool:
+        """Whether no thumbnail cell changed by more than max_pixel_change"""
+        if cached.shape != thumbnail.shape:
+            return False
+        return int(cv2.absdiff(cached, thumbnail).max()) <= self.max_pixel_change
+
+    def invalidate(self, signal_id: Optional[str] = None):
+        """Drop the cached results of one signal, or of all signals"""
+        with self.lock:
+            if signal_id is None:
+                self.entries.clear()
+                return
+
+            for key in [key for key in self.entries if key[0] == signal_id]:
+                del self.entries[key]
+
+    def get_stats(self) -> Dict:
+        """Get cache size and hit/miss/eviction counters"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hash_bits': self.hash_size * self.hash_size,
+                'thumbnail_size': self.thumbnail_size,
+                'max_pixel_change': self.max_pixel_change,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,216 @@
+import os
+import math
+import time
+import logging
+import threading
+from typing import Dict
+
+class SamplingScheduler:
+    """
+    Per-camera frame sampling rates that follow the detector's capacity
+
+    The stream worker analyses every STREAM_FRAME_INTERVAL-th frame of each
+    camera while the detector keeps up. Once the measured inference latency
+    says the detector can't analyse that many frames per second, the
+    analysis budget is shared out by weight instead: cameras near a
+    hospital and cameras with recent emergency-like detections get a larger
+    share, quiet cameras are sampled less often but never below
+    SAMPLING_MIN_FPS.
+    """
+
+    def __init__(self, base_interval: int = None):
+        self.logger = logging.getLogger(__name__)
+
+        self.enabled = os.getenv('SAMPLING_SCHEDULER_ENABLED', 'true').lower() == 'true'
+
+        # Highest sampling rate: every base_interval-th frame
+        self.base_interval = max(1, base_interval or int(os.getenv('STREAM_FRAME_INTERVAL', 5)))
+
+        # Detector capacity: frames analysed concurrently, share of it streams may use
+        self.concurrency = max(1, int(os.getenv('SAMPLING_DETECTOR_CONCURRENCY', 1)))
+        self.target_utilization = float(os.getenv('SAMPLING_TARGET_UTILIZATION', 0.8))
+        self.min_fps = float(os.getenv('SAMPLING_MIN_FPS', 0.5))
+
+        # A camera counts as active for a while after a frame scores this high
+        self.activity_confidence = float(os.getenv('SAMPLING_ACTIVITY_CONFIDENCE', 0.3))
+        self.activity_window = float(os.getenv('SAMPLING_ACTIVITY_WINDOW', 30))  # seconds
+        self.activity_boost = float(os.getenv('SAMPLING_ACTIVITY_BOOST', 4.0))
+
+        self.update_interval = float(os.getenv('SAMPLING_UPDATE_INTERVAL', 2))  # seconds
+        self.latency_smoothing = 0.2  # weight of a new sample in the latency average
+
+        # signal_id -> camera state; priorities may be set before a camera connects
+        self.cameras: Dict[str, Dict] = {}
+        self.priorities: Dict[str, float] = {}
+        self.latency_ms = None
+        self.budget_fps = None
+        self.last_update = 0.0
+        self.lock = threading.Lock()
+
+    def register(self, signal_id: str, source_fps: float = None):
+        """Add a camera (or update its frame rate when it reconnects)"""
+        if not source_fps or source_fps <= 0 or math.isnan(source_fps):
+            source_fps = 25.0  # live streams often don't report a frame rate
+
+        with self.lock:
+            camera = self.cameras.setdefault(signal_id, {
+                'last_activity': None,
+                'frames_analyzed': 0,
+                'interval': self.base_interval
+            })
+            camera['source_fps'] = float(source_fps)
+            self.last_update = 0.0
+
+    def unregister(self, signal_id: str):
+        with self.lock:
+            self.cameras.pop(signal_id, None)
+            self.last_update = 0.0
+
+    def set_priority(self, signal_id: str, priority: float):
+        """Weight of a signal's camera in the budget (1.0 is normal)"""
+        with self.lock:
+            self.priorities[signal_id] = max(0.0, float(priority))
+            self.last_update = 0.0
+
+    def record(self, signal_id: str, latency_ms: float, detection_result: Dict, now: float = None):
+        """
+        Feed back one analysed frame
+
+        Args:
+            signal_id: Traffic signal identifier
+            latency_ms: Wall time the detection took
+            detection_result: Result of detect_emergency_vehicle
+            now: Time of the frame (defaults to time.time())
+        """
+        if now is None:
+            now = time.time()
+
+        with self.lock:
+            # Frames answered from a cache or the motion gate say nothing about model latency
+            if not detection_result.get('cache_hit') and not detection_result.get('motion_skipped'):
+                if self.latency_ms is None:
+                    self.latency_ms = latency_ms
+                else:
+                    self.latency_ms += self.latency_smoothing * (latency_ms - self.latency_ms)
+
+            camera = self.cameras.get(signal_id)
+            if camera is None:
+                return
+            camera['frames_analyzed'] += 1
+
+            if detection_result.get('is_emergency') or \
+               detection_result.get('confidence', 0.0) >= self.activity_confidence:
+                if not self._is_active(camera, now):
+                    # A newly active camera shouldn't wait for the next periodic update
+                    self.last_update = 0.0
+                camera['last_activity'] = now
+
+    def get_interval(self, signal_id: str, now: float = None) -> int:
+        """Analyse every N-th frame of this camera"""
+        if not self.enabled:
+            return self.base_interval
+
+        if now is None:
+            now = time.time()
+
+        with self.lock:
+            if now - self.last_update >= self.update_interval:
+                self._rebalance(now)
+
+            camera = self.cameras.get(signal_id)
+            return camera['interval'] if camera is not None else self.base_interval
+
+    def _rebalance(self, now: float):
+        """Share the detector's frame budget between cameras by weight (lock held)"""
+        self.last_update = now
+        if not self.cameras:
+            return
+
+        # Each camera never gets more than its base-interval rate
+        caps = {signal_id: camera['source_fps'] / self.base_interval
+                for signal_id, camera in self.cameras.items()}
+
+        if self.latency_ms is None or self.latency_ms <= 0:
+            self.budget_fps = None
+            rates = caps
+        else:
+            self.budget_fps = self.concurrency * self.target_utilization * 1000.0 / self.latency_ms
+            rates = self._allocate(caps, self._weights(now), self.budget_fps)
+
+        for signal_id, camera in self.cameras.items():
+            rate = max(rates[signal_id], 1e-6)
+            camera['interval'] = max(self.base_interval, int(math.ceil(camera['source_fps'] / rate - 1e-9)))
+
+    def _is_active(self, camera: Dict, now: float) -> bool:
+        return camera['last_activity'] is not None and now - camera['last_activity'] <= self.activity_window
+
+    def _weights(self, now: float) -> Dict[str, float]:
+        weights = {}
+        for signal_id, camera in self.cameras.items():
+            weight = self.priorities.get(signal_id, 1.0)
+            if self._is_active(camera, now):
+                weight *= self.activity_boost
+            weights[signal_id] = weight
+        return weights
+
+    def _allocate(self, caps: Dict[str, float], weights: Dict[str, float], budget: float) -> Dict[str, float]:
+        """
+        Weighted water-filling of the budget with a per-camera floor and cap
+
+        Every camera first gets the minimum rate; what is left is split in
+        proportion to the weights, and the share a capped camera can't use
+        goes back to the others.
+        """
+        rates = {signal_id: min(self.min_fps, cap) for signal_id, cap in caps.items()}
+        remaining = budget - sum(rates.values())
+        open_cameras = {signal_id for signal_id in caps if rates[signal_id] < caps[signal_id]}
+
+        while remaining > 1e-9 and open_cameras:
+            total_weight = sum(weights[signal_id] for signal_id in open_cameras)
+            if total_weight <= 0:
+                break
+
+            spent = 0.0
+            for signal_id in list(open_cameras):
+                share = remaining * weights[signal_id] / total_weight
+                grant = min(share, caps[signal_id] - rates[signal_id])
+                rates[signal_id] += grant
+                spent += grant
+                if rates[signal_id] >= caps[signal_id] - 1e-9:
+                    open_cameras.discard(signal_id)
+
+            remaining -= spent
+            if spent <= 1e-9:
+                break
+
+        return rates
+
+    def get_rates(self) -> Dict:
+        """Current sampling interval and rate per camera, for the API"""
+        now = time.time()
+        with self.lock:
+            if self.enabled and now - self.last_update >= self.update_interval:
+                self._rebalance(now)
+
+            weights = self._weights(now)
+            cameras = {
+                signal_id: {
+                    'frame_interval': camera['interval'] if self.enabled else self.base_interval,
+                    'sample_fps': round(camera['source_fps'] / (camera['interval'] if self.enabled
+                                                                else self.base_interval), 2),
+                    'source_fps': camera['source_fps'],
+                    'priority': self.priorities.get(signal_id, 1.0),
+                    'weight': weights[signal_id],
+                    'active': self._is_active(camera, now),
+                    'frames_analyzed': camera['frames_analyzed']
+                }
+                for signal_id, camera in self.cameras.items()
+            }
+
+            return {
+                'enabled': self.enabled,
+                'base_interval': self.base_interval,
+                'inference_latency_ms': round(self.latency_ms, 1) if self.latency_ms is not None else None,
+                'budget_fps': round(self.budget_fps, 2) if self.budget_fps is not None else None,
+                'cameras': cameras
+            }
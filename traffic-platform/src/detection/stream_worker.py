@@ -0,0 +1,305 @@
+import cv2
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, List
+from datetime import datetime
+from dataclasses import dataclass
+
+@dataclass
+class StreamSource:
+    signal_id: str
+    source: str  # RTSP/HTTP URL, device index or local video file
+    loop: bool = False  # Restart local video files when they end
+
+class VideoStreamWorker:
+    """
+    Long-running camera ingestion for emergency vehicle detection
+
+    Each signal gets its own reader thread that pulls frames with
+    cv2.VideoCapture, feeds them straight into the detector and triggers the
+    signal override without going through the HTTP API.
+    """
+
+    def __init__(self, detector, signal_controller, sources: List[StreamSource] = None,
+                 on_detection: Callable = None, voter=None, scheduler=None):
+        self.logger = logging.getLogger(__name__)
+
+        self.detector = detector
+        self.signal_controller = signal_controller
+
+        # Optional EmergencyVoter deciding when frames add up to an override;
+        # without one every new emergency event overrides the signal
+        self.voter = voter
+
+        # Optional SamplingScheduler that lowers per-camera sampling rates
+        # when the detector can't keep up with every stream
+        self.scheduler = scheduler
+
+        # Optional hook called as on_detection(signal_id, detection, override_result, vehicle_type),
+        # vehicle_type being the majority type over the voting window
+        self.on_detection = on_detection
+
+        # Stream parameters
+        self.frame_interval = max(1, int(os.getenv('STREAM_FRAME_INTERVAL', 5)))  # analyse every Nth frame
+        self.reconnect_delay = float(os.getenv('STREAM_RECONNECT_DELAY', 5))  # seconds
+        self.loop_files = os.getenv('STREAM_LOOP_FILES', 'false').lower() == 'true'
+
+        if sources is None:
+            sources = self._parse_sources(os.getenv('STREAM_SOURCES', ''))
+        self.sources: Dict[str, StreamSource] = {source.signal_id: source for source in sources}
+
+        # Per-stream counters
+        self.stream_stats: Dict[str, Dict] = {}
+
+        self.active = False
+        self.stop_event = threading.Event()
+        self.threads: Dict[str, threading.Thread] = {}
+
+    def _parse_sources(self, sources_config: str) -> List[StreamSource]:
+        """Parse 'signal_id=source,signal_id=source' into stream sources"""
+        sources = []
+
+        for entry in sources_config.split(','):
+            entry = entry.strip()
+            if not entry:
+                continue
+
+            if '=' not in entry:
+                self.logger.warning(f"Ignoring stream source without signal ID: {entry}")
+                continue
+
+            signal_id, source = entry.split('=', 1)
+            sources.append(StreamSource(
+                signal_id=signal_id.strip(),
+                source=source.strip(),
+                loop=self.loop_files
+            ))
+
+        return sources
+
+    def add_source(self, signal_id: str, source: str, loop: bool = None) -> Dict:
+        """
+        Register a camera stream for a signal and start it if the worker is running
+
+        Args:
+            signal_id: Traffic signal identifier
+            source: Stream URL or local video file path
+            loop: Restart local video files at the end (defaults to STREAM_LOOP_FILES)
+
+        Returns:
+            Dict containing registration result
+        """
+        if signal_id in self.threads and self.threads[signal_id].is_alive():
+            return {'success': False, 'error': f'Stream already running for signal {signal_id}'}
+
+        stream_source = StreamSource(
+            signal_id=signal_id,
+            source=source,
+            loop=self.loop_files if loop is None else loop
+        )
+        self.sources[signal_id] = stream_source
+
+        if self.active:
+            self._start_thread(stream_source)
+
+        self.logger.info(f"Registered stream source for signal {signal_id}")
+
+        return {'success': True, 'signal_id': signal_id, 'source': source}
+
+    def start(self):
+        """Start a reader thread for every configured source"""
+        self.active = True
+        self.stop_event.clear()
+
+        for stream_source in self.sources.values():
+            if stream_source.signal_id not in self.threads or \
+               not self.threads[stream_source.signal_id].is_alive():
+                self._start_thread(stream_source)
+
+        self.logger.info(f"Started {len(self.threads)} camera streams")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop all reader threads"""
+        self.active = False
+        self.stop_event.set()
+
+        for thread in self.threads.values():
+            thread.join(timeout=timeout)
+
+        self.threads = {}
+        self.logger.info("Camera streams stopped")
+
+    def _start_thread(self, stream_source: StreamSource):
+        thread = threading.Thread(
+            target=self.run_stream,
+            args=(stream_source,),
+            name=f"stream-{stream_source.signal_id}",
+            daemon=True
+        )
+        self.threads[stream_source.signal_id] = thread
+        thread.start()
+
+    def run_stream(self, stream_source: StreamSource, max_frames: int = None) -> Dict:
+        """
+        Read and analyse frames from one source until stopped or the file ends
+
+        Args:
+            stream_source: Source to read
+            max_frames: Optional limit on frames read (used for offline runs)
+
+        Returns:
+            Final stream statistics
+        """
+        signal_id = stream_source.signal_id
+        stats = self.stream_stats.setdefault(signal_id, {
+            'signal_id': signal_id,
+            'source': stream_source.source,
+            'status': 'starting',
+            'frames_read': 0,
+            'frames_analyzed': 0,
+            'emergencies_detected': 0,
+            'reconnects': 0,
+            'last_frame_time': None,
+            'last_detection_time': None
+        })
+
+        is_file = os.path.isfile(stream_source.source)
+        capture = None
+        next_analysis_frame = stats['frames_read']
+
+        try:
+            while not self.stop_event.is_set():
+                if capture is None or not capture.isOpened():
+                    capture = self._open_capture(stream_source.source)
+
+                    if capture is None:
+                        if is_file:
+                            stats['status'] = 'error'
+                            break
+                        stats['status'] = 'reconnecting'
+                        stats['reconnects'] += 1
+                        self.stop_event.wait(self.reconnect_delay)
+                        continue
+
+                    stats['status'] = 'streaming'
+                    if self.scheduler is not None:
+                        self.scheduler.register(signal_id, capture.get(cv2.CAP_PROP_FPS))
+
+                if max_frames is not None and stats['frames_read'] >= max_frames:
+                    break
+
+                if self.scheduler is None:
+                    analyse = stats['frames_read'] % self.frame_interval == 0
+                else:
+                    analyse = stats['frames_read'] >= next_analysis_frame
+                    if analyse:
+                        next_analysis_frame = stats['frames_read'] + self.scheduler.get_interval(signal_id)
+
+                # grab() skips frames cheaply, retrieve() only decodes those we analyse
+                if not capture.grab():
+                    if is_file:
+                        if stream_source.loop:
+                            capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                            continue
+                        stats['status'] = 'finished'
+                        break
+
+                    self.logger.warning(f"Lost stream for signal {signal_id}, reconnecting")
+                    capture.release()
+                    capture = None
+                    continue
+
+                stats['frames_read'] += 1
+                stats['last_frame_time'] = datetime.utcnow().isoformat()
+
+                if not analyse:
+                    continue
+
+                ok, frame = capture.retrieve()
+                if not ok or frame is None:
+                    continue
+
+                self._process_frame(signal_id, frame)
+
+            if stats['status'] == 'streaming':
+                stats['status'] = 'stopped'
+
+        except Exception as e:
+            self.logger.error(f"Error in camera stream for signal {signal_id}: {e}")
+            stats['status'] = 'error'
+            stats['error'] = str(e)
+        finally:
+            if capture is not None:
+                capture.release()
+
+        return stats
+
+    def _open_capture(self, source: str):
+        """Open a capture for a URL, file path or numeric device index"""
+        capture = cv2.VideoCapture(int(source) if source.isdigit() else source)
+
+        if not capture.isOpened():
+            self.logger.error(f"Could not open video source {source}")
+            capture.release()
+            return None
+
+        return capture
+
+    def _process_frame(self, signal_id: str, frame) -> Dict:
+        """Run detection on a frame and override the signal on an emergency"""
+        stats = self.stream_stats[signal_id]
+
+        start = time.perf_counter()
+        detection = self.detector.detect_emergency_vehicle(frame, signal_id=signal_id)
+        stats['frames_analyzed'] += 1
+
+        if self.scheduler is not None:
+            self.scheduler.record(signal_id, (time.perf_counter() - start) * 1000, detection)
+
+        if self.voter is not None:
+            vote = self.voter.observe(signal_id, detection)
+            fire = vote['fire']
+            vehicle_type = vote['vehicle_type']
+        else:
+            fire = detection.get('is_emergency') and detection.get('new_event', True)
+            vehicle_type = detection.get('vehicle_type')
+
+        override_result = None
+        if fire:
+            stats['emergencies_detected'] += 1
+            stats['last_detection_time'] = datetime.utcnow().isoformat()
+
+            override_result = self.signal_controller.emergency_override(
+                signal_id,
+                reason=f"Emergency {vehicle_type} detected on camera stream"
+            )
+
+            if self.on_detection:
+                try:
+                    self.on_detection(signal_id, detection, override_result, vehicle_type)
+                except Exception as e:
+                    self.logger.error(f"Error in stream detection callback for signal {signal_id}: {e}")
+
+        return detection
+
+    def get_status(self) -> Dict:
+        """Get the status of all camera streams"""
+        status = {
+            'active': self.active,
+            'frame_interval': self.frame_interval,
+            'streams': {
+                signal_id: {
+                    **self.stream_stats.get(signal_id, {'signal_id': signal_id, 'status': 'idle'}),
+                    'running': signal_id in self.threads and self.threads[signal_id].is_alive()
+                }
+                for signal_id in self.sources
+            },
+            'timestamp': datetime.utcnow().isoformat()
+        }
+
+        if self.scheduler is not None:
+            status['sampling'] = self.scheduler.get_rates()
+
+        return status
@@ -0,0 +1,174 @@
+import os
+import time
+import logging
+import threading
+from collections import Counter, deque
+from typing import Dict, Optional
+
+class EmergencyVoter:
+    """
+    Per-signal N-of-M voting over consecutive detection results
+
+    A single frame scoring just over the emergency threshold is not enough
+    to override a signal: at least VOTING_MIN_POSITIVE of the last
+    VOTING_WINDOW_FRAMES frames of a camera (none older than
+    VOTING_WINDOW_SECONDS) must be emergencies. Once an override fires,
+    further confirmations for that signal are debounced until the override
+    would have run out, so a vehicle waiting at the junction doesn't cause
+    a database write and a Redis update for every frame.
+
+    Results repeated from the result cache or the motion gate only show
+    that the scene hasn't changed, so they count once no vote was added to
+    the window for VOTING_REPEAT_INTERVAL seconds: a vehicle standing in
+    view still confirms, a snapshot sent several times in a row doesn't.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+        self.enabled = os.getenv('VOTING_ENABLED', 'true').lower() == 'true'
+        self.window_frames = max(1, int(os.getenv('VOTING_WINDOW_FRAMES', 5)))
+        self.min_positive = min(self.window_frames, max(1, int(os.getenv('VOTING_MIN_POSITIVE', 3))))
+        self.window_seconds = float(os.getenv('VOTING_WINDOW_SECONDS', 10))
+        # Default spacing fits min_positive repeated votes into one window
+        self.repeat_interval = float(os.getenv('VOTING_REPEAT_INTERVAL', self.window_seconds / self.min_positive))
+
+        # Repeat confirmations are suppressed for as long as an override lasts
+        self.debounce_seconds = float(os.getenv(
+            'VOTING_DEBOUNCE_SECONDS', os.getenv('EMERGENCY_OVERRIDE_DURATION', 60)
+        ))
+
+        # signal_id -> deque of (time, is_emergency, vehicle_type, confidence)
+        self.windows: Dict[str, deque] = {}
+        # signal_id -> time until which new overrides are suppressed
+        self.override_until: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+        self.frames_observed = 0
+        self.overrides_fired = 0
+        self.confirmations_debounced = 0
+        self.positives_unconfirmed = 0
+
+    def observe(self, signal_id: str, detection_result: Dict, now: float = None) -> Dict:
+        """
+        Add a frame's detection result to the signal's window and decide
+
+        Args:
+            signal_id: Traffic signal identifier
+            detection_result: Result of detect_emergency_vehicle
+            now: Observation time (defaults to time.time())
+
+        Returns:
+            Vote with 'fire' set when the caller should override the signal,
+            plus the window counts and the majority vehicle type
+        """
+        if now is None:
+            now = time.time()
+
+        is_emergency = bool(detection_result.get('is_emergency'))
+
+        if not self.enabled:
+            # Single-frame decision, one event per tracked vehicle
+            return {
+                'fire': is_emergency and detection_result.get('new_event', True),
+                'confirmed': is_emergency,
+                'debounced': False,
+                'positives': int(is_emergency),
+                'frames': 1,
+                'required': 1,
+                'vehicle_type': detection_result.get('vehicle_type'),
+                'confidence': detection_result.get('confidence', 0.0)
+            }
+
+        with self.lock:
+            window = self.windows.get(signal_id)
+            if window is None:
+                window = self.windows[signal_id] = deque(maxlen=self.window_frames)
+
+            # Failed frames carry no evidence either way, and repeats of an analysed
+            # frame (result cache, motion gate) only count once the last vote has aged
+            repeated = bool(detection_result.get('cache_hit') or detection_result.get('motion_skipped'))
+            counted = 'error' not in detection_result and (
+                not repeated or not window or now - window[-1][0] >= self.repeat_interval
+            )
+            if counted:
+                window.append((now, is_emergency, detection_result.get('vehicle_type'),
+                               detection_result.get('confidence', 0.0)))
+                self.frames_observed += 1
+
+            while window and now - window[0][0] > self.window_seconds:
+                window.popleft()
+
+            positive_frames = [frame for frame in window if frame[1]]
+            confirmed = len(positive_frames) >= self.min_positive
+            # Only a positive frame counted in the window completes a vote
+            is_emergency = is_emergency and counted
+            debounced = confirmed and is_emergency and now < self.override_until.get(signal_id, 0.0)
+            fire = confirmed and is_emergency and not debounced
+
+            if fire:
+                self.override_until[signal_id] = now + self.debounce_seconds
+                self.overrides_fired += 1
+            elif debounced:
+                self.confirmations_debounced += 1
+            elif is_emergency:
+                self.positives_unconfirmed += 1
+
+            vehicle_type = None
+            confidence = 0.0
+            if positive_frames:
+                vehicle_type = Counter(frame[2] for frame in positive_frames).most_common(1)[0][0]
+                confidence = max(frame[3] for frame in positive_frames)
+
+            return {
+                'fire': fire,
+                'confirmed': confirmed,
+                'debounced': debounced,
+                'positives': len(positive_frames),
+                'frames': len(window),
+                'required': self.min_positive,
+                'vehicle_type': vehicle_type,
+                'confidence': confidence
+            }
+
+    def note_override(self, signal_id: str, duration: float = None, now: float = None):
+        """Debounce detections for a signal overridden by other means (e.g. manually)"""
+        if now is None:
+            now = time.time()
+        if duration is None:
+            duration = self.debounce_seconds
+
+        with self.lock:
+            self.override_until[signal_id] = max(self.override_until.get(signal_id, 0.0), now + duration)
+
+    def reset(self, signal_id: Optional[str] = None):
+        """Forget the window and debounce of one signal, or of all signals"""
+        with self.lock:
+            if signal_id is None:
+                self.windows.clear()
+                self.override_until.clear()
+                return
+
+            self.windows.pop(signal_id, None)
+            self.override_until.pop(signal_id, None)
+
+    def get_stats(self) -> Dict:
+        """Get voting parameters, counters and the signals currently debounced"""
+        now = time.time()
+        with self.lock:
+            return {
+                'enabled': self.enabled,
+                'window_frames': self.window_frames,
+                'min_positive': self.min_positive,
+                'window_seconds': self.window_seconds,
+                'repeat_interval': self.repeat_interval,
+                'debounce_seconds': self.debounce_seconds,
+                'frames_observed': self.frames_observed,
+                'overrides_fired': self.overrides_fired,
+                'confirmations_debounced': self.confirmations_debounced,
+                'positives_unconfirmed': self.positives_unconfirmed,
+                'debounced_signals': {
+                    signal_id: round(until - now, 1)
+                    for signal_id, until in self.override_until.items() if until > now
+                }
+            }
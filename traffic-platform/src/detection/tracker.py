@@ -0,0 +1,223 @@
+import numpy as np
+import os
+import logging
+import threading
+from typing import Dict, List, Optional
+from datetime import datetime
+from dataclasses import dataclass, field
+
+@dataclass
+class Track:
+    track_id: int
+    signal_id: str
+    bbox: List[int]  # [x1, y1, x2, y2]
+    analysis: Optional[Dict] = None  # Cached emergency feature analysis
+    hits: int = 1
+    missed: int = 0
+    frames_since_analysis: int = 0
+    event_emitted: bool = False
+    first_seen: datetime = field(default_factory=datetime.utcnow)
+    last_seen: datetime = field(default_factory=datetime.utcnow)
+
+def _iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between two sets of [x1, y1, x2, y2] boxes"""
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+class VehicleTracker:
+    """
+    Lightweight IoU/centroid tracker for vehicles seen by each signal camera
+
+    Tracks carry the emergency analysis of their vehicle so it only has to be
+    recomputed when a track is new, its score is close to the decision
+    threshold or the cached analysis has gone stale.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+        self.enabled = os.getenv('TRACKER_ENABLED', 'true').lower() == 'true'
+        self.iou_threshold = float(os.getenv('TRACKER_IOU_THRESHOLD', 0.3))
+        self.max_missed_frames = int(os.getenv('TRACKER_MAX_MISSED_FRAMES', 10))
+        self.borderline_margin = float(os.getenv('TRACKER_BORDERLINE_MARGIN', 0.1))
+        self.reanalyze_interval = int(os.getenv('TRACKER_REANALYZE_INTERVAL', 50))  # frames
+
+        # Score at which a vehicle counts as an emergency vehicle
+        self.decision_threshold = 0.5
+
+        self.tracks: Dict[str, List[Track]] = {}
+        self.next_track_id = 1
+        self.lock = threading.Lock()
+
+        self.tracks_created = 0
+        self.analyses_run = 0
+        self.analyses_reused = 0
+
+    def update(self, signal_id: str, bboxes: List[List[int]]) -> List[Track]:
+        """
+        Associate this frame's vehicle boxes with existing tracks
+
+        Args:
+            signal_id: Camera/signal the frame came from
+            bboxes: Vehicle boxes as [x1, y1, x2, y2]
+
+        Returns:
+            One track per box, in the same order as bboxes
+        """
+        with self.lock:
+            tracks = self.tracks.setdefault(signal_id, [])
+            assigned: List[Optional[Track]] = [None] * len(bboxes)
+            matched_tracks = set()
+
+            if tracks and bboxes:
+                track_boxes = np.array([t.bbox for t in tracks], dtype=np.float32)
+                detection_boxes = np.array(bboxes, dtype=np.float32)
+                ious = _iou_matrix(track_boxes, detection_boxes)
+
+                # Greedy assignment, best overlaps first
+                for track_index, box_index in zip(*np.unravel_index(np.argsort(-ious, axis=None), ious.shape)):
+                    if ious[track_index, box_index] < self.iou_threshold:
+                        break
+                    if track_index in matched_tracks or assigned[box_index] is not None:
+                        continue
+                    assigned[box_index] = tracks[track_index]
+                    matched_tracks.add(track_index)
+
+                # Centroid fallback for fast movers whose boxes no longer overlap
+                for box_index, bbox in enumerate(bboxes):
+                    if assigned[box_index] is not None:
+                        continue
+                    track_index = self._nearest_track_by_centroid(tracks, bbox, matched_tracks)
+                    if track_index is not None:
+                        assigned[box_index] = tracks[track_index]
+                        matched_tracks.add(track_index)
+
+            now = datetime.utcnow()
+            for box_index, bbox in enumerate(bboxes):
+                track = assigned[box_index]
+                if track is None:
+                    track = Track(track_id=self.next_track_id, signal_id=signal_id, bbox=list(bbox))
+                    self.next_track_id += 1
+                    self.tracks_created += 1
+                    tracks.append(track)
+                    matched_tracks.add(len(tracks) - 1)
+                    assigned[box_index] = track
+                else:
+                    track.bbox = list(bbox)
+                    track.hits += 1
+                    track.missed = 0
+                    track.frames_since_analysis += 1
+                track.last_seen = now
+
+            # Age out tracks that have not been seen for a while
+            surviving = []
+            for track_index, track in enumerate(tracks):
+                if track_index not in matched_tracks:
+                    track.missed += 1
+                if track.missed <= self.max_missed_frames:
+                    surviving.append(track)
+            self.tracks[signal_id] = surviving
+
+            return assigned
+
+    def _nearest_track_by_centroid(self, tracks: List[Track], bbox: List[int],
+                                   matched_tracks: set) -> Optional[int]:
+        """Find an unmatched track whose centre is within half a box size"""
+        center_x = (bbox[0] + bbox[2]) / 2.0
+        center_y = (bbox[1] + bbox[3]) / 2.0
+
+        best_index = None
+        best_distance = float('infinity')
+
+        for track_index, track in enumerate(tracks):
+            if track_index in matched_tracks:
+                continue
+
+            track_center_x = (track.bbox[0] + track.bbox[2]) / 2.0
+            track_center_y = (track.bbox[1] + track.bbox[3]) / 2.0
+            max_distance = 0.5 * max(track.bbox[2] - track.bbox[0], track.bbox[3] - track.bbox[1])
+
+            distance = np.hypot(center_x - track_center_x, center_y - track_center_y)
+            if distance <= max_distance and distance < best_distance:
+                best_index = track_index
+                best_distance = distance
+
+        return best_index
+
+    def needs_analysis(self, track: Track) -> bool:
+        """Whether a track's emergency analysis has to be (re)computed"""
+        with self.lock:
+            return self._needs_analysis(track)
+
+    def _needs_analysis(self, track: Track) -> bool:
+        """needs_analysis with the lock already held"""
+        if not self.enabled or track.analysis is None:
+            return True
+
+        if abs(track.analysis.get('confidence', 0.0) - self.decision_threshold) < self.borderline_margin:
+            return True
+
+        return self.reanalyze_interval > 0 and track.frames_since_analysis >= self.reanalyze_interval
+
+    def get_analysis(self, track: Track, analyze) -> Dict:
+        """
+        Return the track's cached analysis, running analyze() when needed
+
+        Args:
+            track: Track of the vehicle
+            analyze: Zero-argument callable producing a fresh analysis
+
+        Returns:
+            Emergency analysis dict
+        """
+        with self.lock:
+            if not self._needs_analysis(track):
+                self.analyses_reused += 1
+                return track.analysis
+
+        # Analysed without the lock so other signals' updates don't wait on it
+        analysis = analyze()
+        with self.lock:
+            track.analysis = analysis
+            track.frames_since_analysis = 0
+            self.analyses_run += 1
+
+        return analysis
+
+    def claim_event(self, track: Track) -> bool:
+        """Return True the first time an emergency is reported for a track"""
+        with self.lock:
+            if track.event_emitted:
+                return False
+            track.event_emitted = True
+            return True
+
+    def reset(self, signal_id: str = None):
+        """Drop tracks for one signal or all signals"""
+        with self.lock:
+            if signal_id is None:
+                self.tracks.clear()
+            else:
+                self.tracks.pop(signal_id, None)
+
+    def get_stats(self) -> Dict:
+        """Get tracker counters"""
+        with self.lock:
+            total_analyses = self.analyses_run + self.analyses_reused
+            return {
+                'enabled': self.enabled,
+                'active_tracks': sum(len(tracks) for tracks in self.tracks.values()),
+                'tracks_created': self.tracks_created,
+                'analyses_run': self.analyses_run,
+                'analyses_reused': self.analyses_reused,
+                'reuse_rate': self.analyses_reused / total_analyses if total_analyses else 0.0
+            }
@@ -1,31 +1,159 @@
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import os
+import time
 import logging
-from typing import Dict, List, Tuple, Optional
-from PIL import Image
-import io
+from typing import Callable, Dict, List, Tuple, Optional
 from datetime import datetime
 
+try:
+    from ultralytics import YOLO
+except ImportError:
+    # Exported ONNX/OpenVINO models run without ultralytics and PyTorch
+    YOLO = None
+
+from detection.inference_backends import resolve_backend, load_exported_backend
+from detection.frame_decoder import FrameDecoder
+from detection.motion_gate import MotionGate
+from detection.result_cache import DetectionResultCache
+from detection.feature_extractors import FEATURE_EXTRACTORS, ProjectionFeatureExtractor
+from detection.tracker import VehicleTracker
+from utils.metrics import StageMetrics, timed_stage
+
+# HSV boxes (lower, upper pairs, inclusive) for emergency vehicle colors
+COLOR_RANGES = {
+    'red': [(0, 50, 50), (10, 255, 255), (170, 50, 50), (180, 255, 255)],
+    'blue': [(100, 50, 50), (130, 255, 255)],
+    'white': [(0, 0, 200), (180, 30, 255)],
+    'yellow': [(20, 50, 50), (30, 255, 255)]
+}
+
+# Bright, saturated pixels typical of emergency lights
+LIGHT_BAR_RANGE = [(0, 100, 200), (180, 255, 255)]
+
+def _build_hsv_lookup_table() -> Tuple[np.ndarray, Dict[str, int], int]:
+    """
+    Build a per-channel lookup table that classifies HSV pixels into color buckets
+    
+    Every color range is an axis-aligned box in HSV space, so the full
+    hue/sat/val table factorises into one 256-entry table per channel. Each
+    box owns one bit; a pixel belongs to a box when the bit is set in the
+    lookups of all three channels.
+    
+    Returns:
+        (lookup table for cv2.LUT, bitmask per color, light bar bitmask)
+    """
+    boxes = []
+    color_bits = {}
+    for color_name, ranges in COLOR_RANGES.items():
+        color_bits[color_name] = 0
+        for i in range(0, len(ranges), 2):
+            color_bits[color_name] |= 1 << len(boxes)
+            boxes.append((ranges[i], ranges[i + 1]))
+    
+    light_bar_bit = 1 << len(boxes)
+    boxes.append((LIGHT_BAR_RANGE[0], LIGHT_BAR_RANGE[1]))
+    
+    values = np.arange(256)
+    lookup_table = np.zeros((1, 256, 3), dtype=np.uint8)
+    for bit, (lower, upper) in enumerate(boxes):
+        for channel in range(3):
+            in_range = (values >= lower[channel]) & (values <= upper[channel])
+            lookup_table[0, :, channel] |= (in_range.astype(np.uint8) << bit)
+    
+    return lookup_table, color_bits, light_bar_bit
+
+HSV_LOOKUP_TABLE, COLOR_BITS, LIGHT_BAR_BIT = _build_hsv_lookup_table()
+
+# Number of distinct pixel codes the lookup table can produce
+PIXEL_CODE_COUNT = LIGHT_BAR_BIT << 1
+
+# Pixel code x color matrix: 1 where a code belongs to the color
+COLOR_CODE_MEMBERSHIP = np.array([
+    [1 if code & color_bits else 0 for color_bits in COLOR_BITS.values()]
+    for code in range(PIXEL_CODE_COUNT)
+], dtype=np.int64)
+
 class EmergencyVehicleDetector:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         
-        # Load YOLOv8 model
+        # Rolling latency histograms of every pipeline stage
+        self.stage_metrics = StageMetrics()
+        
+        # Load YOLOv8 model (PyTorch, or an exported ONNX/OpenVINO version)
         model_path = os.getenv('MODEL_PATH', 'models/yolov8n.pt')
         try:
-            self.model = YOLO(model_path)
-            self.logger.info(f"Loaded YOLO model from {model_path}")
+            self.backend = resolve_backend(model_path, os.getenv('DETECTION_BACKEND', 'auto'))
+            self.model = self._load_model(model_path, self.backend)
+            self.logger.info(f"Loaded YOLO model from {model_path} using {self.backend} backend")
         except Exception as e:
             self.logger.error(f"Failed to load YOLO model: {e}")
             # Fallback to default model
-            self.model = YOLO('yolov8n.pt')
+            self.backend = 'ultralytics'
+            self.model = self._load_model('yolov8n.pt', self.backend)
         
         # Detection parameters
         self.confidence_threshold = float(os.getenv('DETECTION_CONFIDENCE_THRESHOLD', 0.85))
         self.emergency_colors = os.getenv('EMERGENCY_VEHICLE_COLORS', 'blue,red,white').split(',')
         
+        # Set once warm_up has primed the model with dummy inferences
+        self.warmed_up = False
+        
+        # Upload decoding (reusable buffers, reduced-resolution JPEG, raw frames)
+        self.frame_decoder = FrameDecoder()
+        
+        # Vehicles smaller than this in a reduced decode are analysed on a full-resolution decode
+        self.full_feature_size = int(os.getenv('DECODE_FULL_FEATURE_SIZE', 128))
+        
+        # Maximum number of frames sent to the model in one batched call
+        self.batch_size = max(1, int(os.getenv('DETECTION_BATCH_SIZE', 16)))
+        
+        # Motion gating: reuse the last result while a camera view is static
+        self.motion_gate = MotionGate()
+        self.last_results: Dict[str, Dict] = {}
+        
+        # Results of identical frames (re-submitted snapshots, frozen cameras)
+        self.result_cache = DetectionResultCache()
+        
+        # Per-signal vehicle tracks with cached emergency classification
+        self.tracker = VehicleTracker()
+        
+        # Model cascade: frames with uncertain emergency scores are re-run on larger models
+        self.cascade_enabled = os.getenv('CASCADE_ENABLED', 'false').lower() == 'true'
+        self.cascade_model_paths = [
+            path.strip()
+            for path in os.getenv('CASCADE_MODEL_PATHS', 'models/yolov8s.pt,models/yolov8m.pt').split(',')
+            if path.strip()
+        ]
+        self.cascade_uncertainty_band = (
+            float(os.getenv('CASCADE_UNCERTAINTY_LOW', 0.35)),
+            float(os.getenv('CASCADE_UNCERTAINTY_HIGH', 0.65))
+        )
+        self.cascade_models: Dict[int, object] = {}  # loaded on first escalation
+        self.cascade_frames = 0
+        self.cascade_escalations = 0
+        self.cascade_stage_runs = [0] * len(self.cascade_model_paths)
+        
+        # Per-signal regions of interest: inference only sees the ROI bounding box
+        self.signal_rois: Dict[str, Dict] = {}
+        self.roi_mask_outside = os.getenv('ROI_MASK_OUTSIDE', 'true').lower() == 'true'
+        
+        # Pattern/light bar features: 'contour' on full crops, 'projection' on downscaled crops
+        self.feature_extractor_name = os.getenv('FEATURE_EXTRACTOR', 'contour')
+        if self.feature_extractor_name not in FEATURE_EXTRACTORS:
+            self.logger.error(f"Unknown feature extractor {self.feature_extractor_name}, using contour")
+            self.feature_extractor_name = 'contour'
+        self.feature_extractor = (
+            ProjectionFeatureExtractor(LIGHT_BAR_BIT) if self.feature_extractor_name == 'projection' else None
+        )
+        
+        # Frames with at least this many vehicles to analyse use the batched feature path
+        self.batched_features_enabled = os.getenv('BATCHED_FEATURES_ENABLED', 'false').lower() == 'true'
+        self.batched_features_min_crops = max(1, int(os.getenv('BATCHED_FEATURES_MIN_CROPS', 8)))
+        self.batched_crop_size = int(os.getenv('BATCHED_FEATURES_CROP_SIZE', 64))
+        self._batch_pattern_extractor = ProjectionFeatureExtractor(LIGHT_BAR_BIT)
+        
         # Vehicle classes that could be emergency vehicles
         self.vehicle_classes = ['car', 'truck', 'bus', 'motorcycle']
         
@@ -48,19 +176,35 @@ class EmergencyVehicleDetector:
             }
         }
     
-    def detect_emergency_vehicle(self, image_input) -> Dict:
+    def _load_model(self, model_path: str, backend: str):
+        """Load a detection model with the given inference backend"""
+        if backend == 'ultralytics':
+            if YOLO is None:
+                raise ImportError("ultralytics is required to load PyTorch models")
+            return YOLO(model_path)
+        
+        return load_exported_backend(model_path, backend)
+    
+    @timed_stage('total')
+    def detect_emergency_vehicle(self, image_input, signal_id: Optional[str] = None,
+                                 frame_scale: float = 1.0) -> Dict:
         """
         Main detection function for emergency vehicles
         
         Args:
             image_input: Image file or numpy array
+            signal_id: Camera/signal the frame came from, enables motion gating
+            frame_scale: Size of a numpy frame relative to the camera frame,
+                when the caller already downscaled it
             
         Returns:
             Dict containing detection results
         """
         try:
-            # Convert input to OpenCV format
-            image = self._prepare_image(image_input)
+            # Convert input to OpenCV format, at reduced resolution for large JPEGs
+            encoded = self._read_frame(image_input)
+            image, scale = self._decode_frame(encoded)
+            scale *= frame_scale
             
             if image is None:
                 return {
@@ -70,61 +214,30 @@ class EmergencyVehicleDetector:
                     'vehicle_type': None
                 }
             
+            # Only the signal's region of interest goes through gating and YOLO
+            model_input = self._crop_to_roi(signal_id, image, scale)
+            
+            # Answer repeats of an already analysed frame from the result cache
+            frame_hash = self.result_cache.frame_hash(model_input)
+            cached_result = self.result_cache.get(signal_id, frame_hash)
+            if cached_result is not None:
+                return cached_result
+            
+            # Skip inference when nothing moved since the last analysed frame
+            cached_result = self._get_motion_gated_result(signal_id, model_input)
+            if cached_result is not None:
+                return cached_result
+            
             # Run YOLO detection
-            results = self.model(image)
-            
-            # Process detections
-            emergency_detections = []
-            
-            for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        # Get class name and confidence
-                        class_id = int(box.cls[0])
-                        class_name = self.model.names[class_id]
-                        confidence = float(box.conf[0])
-                        
-                        # Check if it's a vehicle
-                        if class_name in self.vehicle_classes and confidence > self.confidence_threshold:
-                            # Extract bounding box
-                            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                            vehicle_crop = image[int(y1):int(y2), int(x1):int(x2)]
-                            
-                            # Analyze if it's an emergency vehicle
-                            emergency_analysis = self._analyze_emergency_features(vehicle_crop)
-                            
-                            if emergency_analysis['is_emergency']:
-                                emergency_detections.append({
-                                    'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                                    'confidence': confidence,
-                                    'vehicle_type': emergency_analysis['vehicle_type'],
-                                    'emergency_confidence': emergency_analysis['confidence'],
-                                    'features_detected': emergency_analysis['features']
-                                })
-            
-            # Return best detection
-            if emergency_detections:
-                best_detection = max(emergency_detections, 
-                                   key=lambda x: x['emergency_confidence'])
-                
-                return {
-                    'is_emergency': True,
-                    'vehicle_type': best_detection['vehicle_type'],
-                    'confidence': best_detection['emergency_confidence'],
-                    'bbox': best_detection['bbox'],
-                    'features_detected': best_detection['features_detected'],
-                    'detection_time': datetime.utcnow().isoformat(),
-                    'all_detections': emergency_detections
-                }
-            else:
-                return {
-                    'is_emergency': False,
-                    'vehicle_type': None,
-                    'confidence': 0.0,
-                    'detection_time': datetime.utcnow().isoformat(),
-                    'message': 'No emergency vehicles detected'
-                }
+            with self.stage_metrics.measure('yolo'):
+                results = self.model(model_input)
+            
+            detection_result = self._build_detection_result(image, results, signal_id, scale, encoded)
+            if signal_id is not None:
+                self.last_results[signal_id] = detection_result
+            self.result_cache.put(signal_id, frame_hash, detection_result)
+            
+            return detection_result
                 
         except Exception as e:
             self.logger.error(f"Error in emergency vehicle detection: {e}")
@@ -135,35 +248,486 @@ class EmergencyVehicleDetector:
                 'vehicle_type': None
             }
     
-    def _prepare_image(self, image_input):
-        """Convert various image inputs to OpenCV format"""
-        try:
-            if hasattr(image_input, 'read'):
-                # File-like object
-                image_bytes = image_input.read()
-                image_array = np.frombuffer(image_bytes, np.uint8)
-                image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-            elif isinstance(image_input, np.ndarray):
-                # Already a numpy array
-                image = image_input
-            elif isinstance(image_input, str):
-                # File path
-                image = cv2.imread(image_input)
+    @timed_stage('batch_total')
+    def detect_batch(self, frames: List, signal_ids: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Detect emergency vehicles in several frames with one model call per batch
+        
+        Args:
+            frames: List of image files, numpy arrays or file paths
+            signal_ids: Optional signal identifiers, one per frame
+            
+        Returns:
+            List of detection result dicts in the same order as frames
+        """
+        if signal_ids is not None and len(signal_ids) != len(frames):
+            self.logger.error(
+                f"Batch detection got {len(frames)} frames but {len(signal_ids)} signal IDs"
+            )
+            return [{
+                'is_emergency': False,
+                'error': 'Frame and signal ID counts do not match',
+                'confidence': 0.0,
+                'vehicle_type': None
+            } for _ in frames]
+        
+        batch_results: List[Dict] = [None] * len(frames)
+        
+        # Decode everything up front so invalid frames don't break the batch
+        valid_indices = []
+        images = []
+        scales = []
+        encoded_frames = []
+        frame_hashes = []
+        model_inputs = []
+        for index, frame in enumerate(frames):
+            # Frames are kept until the batch runs, so they must not share the read buffer
+            encoded = self._read_frame(frame)
+            image, scale = self._decode_frame(encoded, detach=True)
+            if image is None:
+                batch_results[index] = {
+                    'is_emergency': False,
+                    'error': 'Invalid image input',
+                    'confidence': 0.0,
+                    'vehicle_type': None
+                }
+                continue
+            
+            signal_id = signal_ids[index] if signal_ids is not None else None
+            model_input = self._crop_to_roi(signal_id, image, scale)
+            frame_hash = self.result_cache.frame_hash(model_input)
+            cached_result = self.result_cache.get(signal_id, frame_hash)
+            if cached_result is None:
+                cached_result = self._get_motion_gated_result(signal_id, model_input)
+            if cached_result is not None:
+                batch_results[index] = cached_result
+            else:
+                valid_indices.append(index)
+                images.append(image)
+                scales.append(scale)
+                # Kept for full-resolution feature crops; the read buffer is reused by the next frame
+                encoded_frames.append(bytes(encoded) if scale != 1.0 else None)
+                frame_hashes.append(frame_hash)
+                model_inputs.append(model_input)
+        
+        for start in range(0, len(images), self.batch_size):
+            chunk_indices = valid_indices[start:start + self.batch_size]
+            chunk_images = images[start:start + self.batch_size]
+            chunk_scales = scales[start:start + self.batch_size]
+            chunk_encoded = encoded_frames[start:start + self.batch_size]
+            chunk_hashes = frame_hashes[start:start + self.batch_size]
+            
+            try:
+                # One model invocation for the whole chunk, one result per frame
+                with self.stage_metrics.measure('yolo_batch'):
+                    results = self.model(model_inputs[start:start + self.batch_size])
+                
+                for index, image, scale, encoded, frame_hash, result in zip(chunk_indices, chunk_images, chunk_scales,
+                                                                            chunk_encoded, chunk_hashes, results):
+                    signal_id = signal_ids[index] if signal_ids is not None else None
+                    batch_results[index] = self._build_detection_result(image, [result], signal_id, scale, encoded)
+                    if signal_ids is not None:
+                        self.last_results[signal_ids[index]] = batch_results[index]
+                    self.result_cache.put(signal_id, frame_hash, batch_results[index])
+                    
+            except Exception as e:
+                self.logger.error(f"Error in batch emergency vehicle detection: {e}")
+                for index in chunk_indices:
+                    batch_results[index] = {
+                        'is_emergency': False,
+                        'error': str(e),
+                        'confidence': 0.0,
+                        'vehicle_type': None
+                    }
+        
+        if signal_ids is not None:
+            for signal_id, result in zip(signal_ids, batch_results):
+                result['signal_id'] = signal_id
+        
+        return batch_results
+    
+    @timed_stage('motion_gate')
+    def _get_motion_gated_result(self, signal_id: Optional[str], image) -> Optional[Dict]:
+        """Return the last result for a signal if its camera view hasn't changed"""
+        if signal_id is None or self.motion_gate.should_analyze(signal_id, image):
+            return None
+        
+        last_result = self.last_results.get(signal_id)
+        if last_result is None:
+            return None
+        
+        cached_result = {**last_result, 'motion_skipped': True}
+        if 'new_event' in cached_result:
+            # The vehicles in a reused result have already been reported
+            cached_result['new_event'] = False
+        
+        return cached_result
+    
+    @timed_stage('postprocess')
+    def _extract_vehicle_boxes(self, results, model=None) -> List[Tuple[List[int], float]]:
+        """Collect confident vehicle boxes as ([x1, y1, x2, y2], confidence)"""
+        names = (model or self.model).names
+        vehicles = []
+        
+        for result in results:
+            boxes = result.boxes
+            if boxes is not None:
+                for box in boxes:
+                    # Get class name and confidence
+                    class_id = int(box.cls[0])
+                    class_name = names[class_id]
+                    confidence = float(box.conf[0])
+                    
+                    # Check if it's a vehicle
+                    if class_name in self.vehicle_classes and confidence > self.confidence_threshold:
+                        # Extract bounding box (torch tensor or numpy array)
+                        xyxy = box.xyxy[0]
+                        if hasattr(xyxy, 'cpu'):
+                            xyxy = xyxy.cpu().numpy()
+                        x1, y1, x2, y2 = xyxy
+                        vehicles.append(([int(x1), int(y1), int(x2), int(y2)], confidence))
+        
+        return vehicles
+    
+    def _build_detection_result(self, image, results, signal_id: Optional[str] = None,
+                                scale: float = 1.0, encoded=None) -> Dict:
+        """
+        Turn raw model results for one image into a detection result dict
+        
+        Args:
+            image: Decoded frame
+            results: Model results for the frame (or its ROI crop)
+            signal_id: Camera/signal the frame came from
+            scale: Size of the decoded frame relative to the original frame
+            encoded: Encoded frame, for full-resolution crops of small vehicles
+            
+        Returns:
+            Detection result with boxes in original frame coordinates
+        """
+        vehicles = self._map_roi_boxes(signal_id, self._extract_vehicle_boxes(results), scale)
+        feature_crop = self._feature_crop_source(image, scale, encoded)
+        
+        # Escalate to larger models while any vehicle's emergency score is uncertain
+        analyses = None
+        cascade_stage = None
+        if self.cascade_enabled:
+            vehicles, analyses, cascade_stage = self._run_cascade(image, vehicles, signal_id, scale, feature_crop)
+        
+        # Follow vehicles across frames so each one is only analysed when needed
+        tracks = None
+        if signal_id is not None and self.tracker.enabled:
+            tracks = self.tracker.update(signal_id, [bbox for bbox, _ in vehicles])
+        
+        # Busy frames: analyse every vehicle that needs it in one batch up front
+        if analyses is None and self.batched_features_enabled:
+            pending = [
+                index for index in range(len(vehicles))
+                if tracks is None or self.tracker.needs_analysis(tracks[index])
+            ]
+            if len(pending) >= self.batched_features_min_crops:
+                crops = [feature_crop(vehicles[index][0]) for index in pending]
+                batch = self._analyze_emergency_features_batch(
+                    [crop for crop, _ in crops], [crop_scale for _, crop_scale in crops]
+                )
+                analyses = [None] * len(vehicles)
+                for index, analysis in zip(pending, batch):
+                    analyses[index] = analysis
+        
+        emergency_detections = []
+        
+        for index, (bbox, confidence) in enumerate(vehicles):
+            # Analyze if it's an emergency vehicle (the cascade or batch already did)
+            if analyses is not None and analyses[index] is not None:
+                analyze = lambda analysis=analyses[index]: analysis
             else:
-                return None
+                analyze = lambda bbox=bbox: self._analyze_emergency_features(*feature_crop(bbox))
             
+            if tracks is None:
+                emergency_analysis = analyze()
+            else:
+                emergency_analysis = self.tracker.get_analysis(tracks[index], analyze)
+            
+            if emergency_analysis['is_emergency']:
+                detection = {
+                    'bbox': bbox,
+                    'confidence': confidence,
+                    'vehicle_type': emergency_analysis['vehicle_type'],
+                    'emergency_confidence': emergency_analysis['confidence'],
+                    'features_detected': emergency_analysis['features']
+                }
+                
+                if tracks is not None:
+                    detection['track_id'] = tracks[index].track_id
+                    detection['new_event'] = self.tracker.claim_event(tracks[index])
+                
+                emergency_detections.append(detection)
+        
+        # Return best detection
+        if emergency_detections:
+            best_detection = max(emergency_detections, 
+                               key=lambda x: x['emergency_confidence'])
+            
+            detection_result = {
+                'is_emergency': True,
+                'vehicle_type': best_detection['vehicle_type'],
+                'confidence': best_detection['emergency_confidence'],
+                'bbox': best_detection['bbox'],
+                'features_detected': best_detection['features_detected'],
+                'detection_time': datetime.utcnow().isoformat(),
+                'all_detections': emergency_detections
+            }
+            
+            if tracks is not None:
+                # Only the first frame of each emergency vehicle is a new event
+                detection_result['track_id'] = best_detection['track_id']
+                detection_result['new_event'] = any(d['new_event'] for d in emergency_detections)
+        else:
+            detection_result = {
+                'is_emergency': False,
+                'vehicle_type': None,
+                'confidence': 0.0,
+                'detection_time': datetime.utcnow().isoformat(),
+                'message': 'No emergency vehicles detected'
+            }
+        
+        if cascade_stage is not None:
+            # 0 is the primary model, N the Nth cascade model
+            detection_result['cascade_stage'] = cascade_stage
+        
+        if scale != 1.0:
+            # Report boxes in the coordinates of the frame that was uploaded
+            for detection in [detection_result] + detection_result.get('all_detections', []):
+                if 'bbox' in detection:
+                    detection['bbox'] = [int(round(value / scale)) for value in detection['bbox']]
+            detection_result['decode_scale'] = scale
+        
+        return detection_result
+    
+    def _run_cascade(self, image, vehicles: List[Tuple[List[int], float]], signal_id: Optional[str] = None,
+                     scale: float = 1.0, feature_crop: Optional[Callable] = None) -> Tuple[List, List[Dict], int]:
+        """
+        Re-run detection on larger models while vehicle scores are uncertain
+        
+        Args:
+            image: Full frame
+            vehicles: Vehicle boxes found by the primary model
+            signal_id: Camera/signal the frame came from, selects its ROI
+            scale: Size of the decoded frame relative to the original frame
+            feature_crop: Crops vehicles for feature analysis, see _feature_crop_source
+            
+        Returns:
+            (vehicle boxes, emergency analysis per box, cascade stage used)
+        """
+        feature_crop = feature_crop or self._feature_crop_source(image, scale)
+        analyses = [self._analyze_emergency_features(*feature_crop(bbox)) for bbox, _ in vehicles]
+        stage = 0
+        
+        self.cascade_frames += 1
+        escalated = False
+        
+        for cascade_index in range(len(self.cascade_model_paths)):
+            if not self._is_uncertain(analyses):
+                break
+            
+            model = self._get_cascade_model(cascade_index)
+            if model is None:
+                continue
+            
+            with self.stage_metrics.measure(f'yolo_cascade_{cascade_index + 1}'):
+                results = model(self._crop_to_roi(signal_id, image, scale))
+            vehicles = self._map_roi_boxes(signal_id, self._extract_vehicle_boxes(results, model), scale)
+            analyses = [self._analyze_emergency_features(*feature_crop(bbox)) for bbox, _ in vehicles]
+            
+            stage = cascade_index + 1
+            self.cascade_stage_runs[cascade_index] += 1
+            escalated = True
+        
+        if escalated:
+            self.cascade_escalations += 1
+        
+        return vehicles, analyses, stage
+    
+    def _feature_crop_source(self, image, scale: float = 1.0, encoded=None) -> Callable:
+        """
+        Crop vehicles for feature analysis as (crop, scale of the frame it was cut from)
+        
+        Light bars and body markings of small vehicles don't survive a reduced
+        resolution decode, so vehicles under DECODE_FULL_FEATURE_SIZE decoded
+        pixels are cropped from a full-resolution decode of the encoded frame
+        instead. That decode happens at most once per frame, and only when such
+        a vehicle actually needs analysis.
+        """
+        full_frames = []
+        
+        def crop(bbox):
+            x1, y1, x2, y2 = bbox
+            if scale == 1.0 or encoded is None or isinstance(encoded, np.ndarray) or \
+                    max(x2 - x1, y2 - y1) >= self.full_feature_size:
+                return image[y1:y2, x1:x2], scale
+            
+            if not full_frames:
+                full_frames.append(self._decode_frame(encoded, reduce=False)[0])
+            if full_frames[0] is None:
+                return image[y1:y2, x1:x2], scale
+            
+            x1, y1, x2, y2 = (int(round(value / scale)) for value in bbox)
+            return full_frames[0][y1:y2, x1:x2], 1.0
+        
+        return crop
+    
+    def _is_uncertain(self, analyses: List[Dict]) -> bool:
+        """Whether any emergency score falls inside the cascade uncertainty band"""
+        low, high = self.cascade_uncertainty_band
+        return any(low <= analysis['confidence'] <= high for analysis in analyses)
+    
+    def set_signal_roi(self, signal_id: str, polygon: Optional[List[List[int]]]) -> bool:
+        """
+        Restrict detection for a signal's camera to a polygon
+        
+        Args:
+            signal_id: Traffic signal identifier
+            polygon: ROI vertices as [[x, y], ...] in frame pixels, or None to clear it
+            
+        Returns:
+            True if the ROI was updated
+        """
+        if polygon is None:
+            self.signal_rois.pop(signal_id, None)
+        else:
+            points = np.array(polygon, dtype=np.int32)
+            if points.ndim != 2 or points.shape[1] != 2 or len(points) < 3 or (points < 0).any():
+                self.logger.error(f"Invalid ROI polygon for signal {signal_id}: {polygon}")
+                return False
+            
+            if cv2.contourArea(points) == 0:
+                self.logger.error(f"Degenerate ROI polygon for signal {signal_id}: {polygon}")
+                return False
+            
+            self.signal_rois[signal_id] = self._build_roi(points)
+        
+        # Cached results and tracks were computed with the previous ROI
+        self.last_results.pop(signal_id, None)
+        self.result_cache.invalidate(signal_id)
+        self.motion_gate.reset(signal_id)
+        self.tracker.reset(signal_id)
+        
+        self.logger.info(f"{'Cleared' if polygon is None else 'Set'} ROI for signal {signal_id}")
+        return True
+    
+    def get_signal_roi(self, signal_id: str) -> Optional[List[List[int]]]:
+        """A signal's ROI polygon as set with set_signal_roi, or None"""
+        roi = self.signal_rois.get(signal_id)
+        return roi['polygon'].tolist() if roi is not None else None
+    
+    def _build_roi(self, points: np.ndarray) -> Dict:
+        """Bounding box and polygon mask of an ROI, plus a cache of its rescaled versions"""
+        x, y, width, height = cv2.boundingRect(points)
+        
+        # Mask in the coordinates of the ROI bounding box
+        mask = np.zeros((height, width), dtype=np.uint8)
+        cv2.fillPoly(mask, [points - (x, y)], 255)
+        
+        return {
+            'polygon': points,
+            'rect': (x, y, width, height),
+            'mask': mask,
+            'scaled': {}
+        }
+    
+    def _get_roi(self, signal_id: Optional[str], scale: float = 1.0) -> Optional[Dict]:
+        """A signal's ROI in the coordinates of a frame decoded at the given scale"""
+        roi = self.signal_rois.get(signal_id) if signal_id is not None else None
+        if roi is None or scale == 1.0:
+            return roi
+        
+        if scale not in roi['scaled']:
+            scaled_points = np.round(roi['polygon'] * scale).astype(np.int32)
+            roi['scaled'][scale] = self._build_roi(scaled_points)
+        
+        return roi['scaled'][scale]
+    
+    @timed_stage('roi_crop')
+    def _crop_to_roi(self, signal_id: Optional[str], image, scale: float = 1.0):
+        """Crop a frame to the signal's ROI bounding box, blanking pixels outside the polygon"""
+        roi = self._get_roi(signal_id, scale)
+        if roi is None:
             return image
+        
+        x, y, width, height = roi['rect']
+        crop = image[y:y + height, x:x + width]
+        
+        if self.roi_mask_outside and crop.size > 0:
+            mask = roi['mask'][:crop.shape[0], :crop.shape[1]]
+            crop = cv2.bitwise_and(crop, crop, mask=mask)
+        
+        return crop
+    
+    def _map_roi_boxes(self, signal_id: Optional[str], vehicles: List[Tuple[List[int], float]],
+                       scale: float = 1.0) -> List[Tuple[List[int], float]]:
+        """Move boxes from ROI crop to frame coordinates and drop those centred outside the ROI"""
+        roi = self._get_roi(signal_id, scale)
+        if roi is None:
+            return vehicles
+        
+        x, y = roi['rect'][:2]
+        mapped = []
+        for (x1, y1, x2, y2), confidence in vehicles:
+            bbox = [x1 + x, y1 + y, x2 + x, y2 + y]
+            center = ((bbox[0] + bbox[2]) / 2.0, (bbox[1] + bbox[3]) / 2.0)
             
+            if cv2.pointPolygonTest(roi['polygon'], center, False) >= 0:
+                mapped.append((bbox, confidence))
+        
+        return mapped
+    
+    def _get_cascade_model(self, cascade_index: int):
+        """Load a cascade model on first use; None if it cannot be loaded"""
+        if cascade_index not in self.cascade_models:
+            model_path = self.cascade_model_paths[cascade_index]
+            try:
+                self.cascade_models[cascade_index] = self._load_model(model_path, resolve_backend(model_path))
+                self.logger.info(f"Loaded cascade model {model_path}")
+            except Exception as e:
+                self.logger.error(f"Failed to load cascade model {model_path}: {e}")
+                self.cascade_models[cascade_index] = None
+        
+        return self.cascade_models[cascade_index]
+    
+    def _prepare_image(self, image_input):
+        """Convert various image inputs to a full-resolution OpenCV image the caller can keep"""
+        return self._decode_frame(image_input, reduce=False, detach=True)[0]
+    
+    def _read_frame(self, image_input):
+        """Read the encoded bytes of an image input, see FrameDecoder.read"""
+        try:
+            return self.frame_decoder.read(image_input)
         except Exception as e:
-            self.logger.error(f"Error preparing image: {e}")
+            self.logger.error(f"Error reading image: {e}")
             return None
     
-    def _analyze_emergency_features(self, vehicle_crop) -> Dict:
+    @timed_stage('decode')
+    def _decode_frame(self, image_input, reduce: bool = True, detach: bool = False) -> Tuple[Optional[np.ndarray], float]:
+        """
+        Decode a file-like object, bytes, file path or numpy array
+        
+        Returns:
+            (image or None, scale of the image relative to the original frame)
+        """
+        try:
+            return self.frame_decoder.decode(image_input, reduce=reduce, detach=detach)
+        except Exception as e:
+            self.logger.error(f"Error preparing image: {e}")
+            return None, 1.0
+    
+    @timed_stage('features')
+    def _analyze_emergency_features(self, vehicle_crop, scale: float = 1.0) -> Dict:
         """
         Analyze vehicle crop for emergency vehicle features
         
         Args:
             vehicle_crop: Cropped image of detected vehicle
+            scale: Size of the frame the crop was cut from relative to the original
+                   frame; pixel size thresholds are defined at the original size
             
         Returns:
             Dict with emergency analysis results
@@ -177,43 +741,27 @@ class EmergencyVehicleDetector:
                     'features': []
                 }
             
+            # The projection extractor analyses a downscaled copy of the crop
+            if self.feature_extractor is not None:
+                vehicle_crop, resize_scale = self.feature_extractor.resize(vehicle_crop)
+                scale *= resize_scale
+            
+            # Classify every pixel once, shared by color and light bar analysis
+            pixel_codes = self._classify_hsv_pixels(vehicle_crop)
+            
             # Color analysis
-            color_score, dominant_colors = self._analyze_colors(vehicle_crop)
+            color_score, dominant_colors = self._analyze_colors(vehicle_crop, pixel_codes)
             
             # Shape and pattern analysis
-            pattern_score, detected_patterns = self._analyze_patterns(vehicle_crop)
+            pattern_score, detected_patterns = self._analyze_patterns(vehicle_crop, scale)
             
             # Light bar detection (for police/emergency vehicles)
-            light_score, has_light_bar = self._detect_light_bar(vehicle_crop)
+            light_score, has_light_bar = self._detect_light_bar(vehicle_crop, pixel_codes, scale)
             
-            # Combine scores
-            total_score = (color_score * 0.4 + pattern_score * 0.4 + light_score * 0.2)
-            
-            # Determine vehicle type based on features
-            vehicle_type = self._classify_emergency_type(
-                dominant_colors, detected_patterns, has_light_bar
+            return self._combine_features(
+                color_score, dominant_colors, pattern_score, detected_patterns, light_score, has_light_bar
             )
             
-            features_detected = []
-            if color_score > 0.3:
-                features_detected.extend([f"emergency_color_{color}" for color in dominant_colors])
-            if pattern_score > 0.3:
-                features_detected.extend(detected_patterns)
-            if has_light_bar:
-                features_detected.append("light_bar")
-            
-            is_emergency = total_score > 0.5
-            
-            return {
-                'is_emergency': is_emergency,
-                'vehicle_type': vehicle_type if is_emergency else None,
-                'confidence': total_score,
-                'features': features_detected,
-                'color_score': color_score,
-                'pattern_score': pattern_score,
-                'light_score': light_score
-            }
-            
         except Exception as e:
             self.logger.error(f"Error analyzing emergency features: {e}")
             return {
@@ -223,35 +771,170 @@ class EmergencyVehicleDetector:
                 'features': []
             }
     
-    def _analyze_colors(self, image) -> Tuple[float, List[str]]:
+    def _combine_features(self, color_score: float, dominant_colors: List[str], pattern_score: float,
+                          detected_patterns: List[str], light_score: float, has_light_bar: bool) -> Dict:
+        """Turn color, pattern and light bar scores into an emergency analysis"""
+        # Combine scores
+        total_score = (color_score * 0.4 + pattern_score * 0.4 + light_score * 0.2)
+        
+        # Determine vehicle type based on features
+        vehicle_type = self._classify_emergency_type(
+            dominant_colors, detected_patterns, has_light_bar
+        )
+        
+        features_detected = []
+        if color_score > 0.3:
+            features_detected.extend([f"emergency_color_{color}" for color in dominant_colors])
+        if pattern_score > 0.3:
+            features_detected.extend(detected_patterns)
+        if has_light_bar:
+            features_detected.append("light_bar")
+        
+        is_emergency = total_score > 0.5
+        
+        return {
+            'is_emergency': is_emergency,
+            'vehicle_type': vehicle_type if is_emergency else None,
+            'confidence': total_score,
+            'features': features_detected,
+            'color_score': color_score,
+            'pattern_score': pattern_score,
+            'light_score': light_score
+        }
+    
+    @timed_stage('features_batch')
+    def _analyze_emergency_features_batch(self, vehicle_crops: List[np.ndarray],
+                                          scales: Optional[List[float]] = None) -> List[Dict]:
+        """
+        Analyze all vehicle crops of a frame at once
+        
+        Every crop is resized to the same small square and stacked, so HSV
+        classification, color fractions, light bar extents and edge density
+        are computed for all crops with a handful of vectorised calls. The
+        rectangle search only runs on crops with enough edges to hold the
+        three rectangles it looks for and whose other features are strong
+        enough for the rectangles to make them emergency vehicles; other
+        crops report a pattern score of 0.
+        
+        Args:
+            vehicle_crops: Cropped images of the detected vehicles
+            scales: Size of the frame each crop was cut from relative to the original frame
+            
+        Returns:
+            Emergency analysis dict per crop, in the same order
+        """
+        analyses = [{
+            'is_emergency': False,
+            'vehicle_type': None,
+            'confidence': 0.0,
+            'features': []
+        } for _ in vehicle_crops]
+        
+        valid = [i for i, crop in enumerate(vehicle_crops) if crop is not None and crop.size > 0]
+        if not valid:
+            return analyses
+        
+        try:
+            size = self.batched_crop_size
+            # INTER_AREA only where heavy shrinking would otherwise alias; it is much slower
+            stack = np.stack([
+                cv2.resize(
+                    vehicle_crops[i], (size, size),
+                    interpolation=cv2.INTER_AREA if min(vehicle_crops[i].shape[:2]) > 2 * size else cv2.INTER_LINEAR
+                )
+                for i in valid
+            ])
+            count = len(valid)
+            
+            # Original pixels per stacked pixel, horizontally and vertically
+            frame_scales = np.array([scales[i] if scales is not None else 1.0 for i in valid], dtype=np.float64)
+            x_scale = np.array([vehicle_crops[i].shape[1] for i in valid], dtype=np.float64) / (size * frame_scales)
+            y_scale = np.array([vehicle_crops[i].shape[0] for i in valid], dtype=np.float64) / (size * frame_scales)
+            
+            # One HSV conversion and lookup over all crops stacked vertically
+            mosaic = stack.reshape(count * size, size, 3)
+            pixel_codes = self._classify_hsv_pixels(mosaic).reshape(count, size, size)
+            
+            # Color fractions: per-crop histogram of pixel codes, then codes -> colors
+            offsets = (np.arange(count, dtype=np.int64) * PIXEL_CODE_COUNT)[:, None]
+            code_counts = np.bincount(
+                (offsets + pixel_codes.reshape(count, -1)).ravel(), minlength=count * PIXEL_CODE_COUNT
+            ).reshape(count, PIXEL_CODE_COUNT)
+            color_fractions = code_counts @ COLOR_CODE_MEMBERSHIP / float(size * size)
+            color_present = color_fractions > 0.1  # At least 10% of the vehicle
+            emergency_color_mask = np.array([color in self.emergency_colors for color in COLOR_BITS])
+            color_scores = np.minimum((color_fractions * color_present * emergency_color_mask).sum(axis=1), 1.0)
+            
+            # Light bars: extent of bright pixels in the top third, in original pixels
+            bright = (pixel_codes[:, :size // 3, :] & LIGHT_BAR_BIT) != 0
+            bright_width = bright.any(axis=1).sum(axis=1) * x_scale
+            bright_height = bright.any(axis=2).sum(axis=1) * y_scale
+            has_light_bars = (bright_width > 2 * bright_height) & (bright_width > 20)
+            
+            # Edge density decides which crops are worth a rectangle search
+            gray = cv2.cvtColor(mosaic, cv2.COLOR_BGR2GRAY).reshape(count, size, size).astype(np.int16)
+            gradient = np.abs(np.diff(gray, axis=2))[:, :-1, :] + np.abs(np.diff(gray, axis=1))[:, :, :-1]
+            edge_pixels = np.count_nonzero(gradient >= 12, axis=(1, 2))
+            
+            # Three rectangles over 100 px² have at least 120 px of outline at full size
+            pattern_scale = 1.0 / np.sqrt(x_scale * y_scale)
+            enough_edges = edge_pixels >= 60 * pattern_scale
+            
+            # Rectangles add 0.3 * 0.4 to the score; skip crops they cannot make emergencies
+            base_scores = color_scores * 0.4 + has_light_bars * 0.3 * 0.2
+            can_reach_threshold = base_scores + 0.3 * 0.4 > 0.5
+            
+            extractor = self.feature_extractor or self._batch_pattern_extractor
+            pattern_results = [(0.0, [])] * count
+            for j in np.flatnonzero(enough_edges & can_reach_threshold):
+                pattern_results[j] = extractor.analyze_patterns(stack[j], pattern_scale[j])
+            
+            color_names = list(COLOR_BITS)
+            for j, i in enumerate(valid):
+                pattern_score, detected_patterns = pattern_results[j]
+                analyses[i] = self._combine_features(
+                    float(color_scores[j]),
+                    [color_names[k] for k in np.flatnonzero(color_present[j])],
+                    pattern_score,
+                    detected_patterns,
+                    0.3 if has_light_bars[j] else 0.0,
+                    bool(has_light_bars[j])
+                )
+            
+        except Exception as e:
+            self.logger.error(f"Error in batched feature analysis: {e}")
+        
+        return analyses
+    
+    @timed_stage('hsv_lookup')
+    def _classify_hsv_pixels(self, image) -> np.ndarray:
+        """Convert to HSV once and map every pixel to its color bucket bits"""
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        
+        hue_bits, sat_bits, val_bits = cv2.split(cv2.LUT(hsv, HSV_LOOKUP_TABLE))
+        
+        return cv2.bitwise_and(cv2.bitwise_and(hue_bits, sat_bits), val_bits)
+    
+    @timed_stage('colors')
+    def _analyze_colors(self, image, pixel_codes: np.ndarray = None) -> Tuple[float, List[str]]:
         """Analyze dominant colors in the vehicle"""
         try:
-            # Convert to HSV for better color analysis
-            hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-            
-            # Define color ranges for emergency vehicles
-            color_ranges = {
-                'red': [(0, 50, 50), (10, 255, 255), (170, 50, 50), (180, 255, 255)],
-                'blue': [(100, 50, 50), (130, 255, 255)],
-                'white': [(0, 0, 200), (180, 30, 255)],
-                'yellow': [(20, 50, 50), (30, 255, 255)]
-            }
+            if pixel_codes is None:
+                pixel_codes = self._classify_hsv_pixels(image)
+            
+            # One histogram over pixel codes gives the pixel count of every bucket
+            code_counts = cv2.calcHist(
+                [pixel_codes], [0], None, [PIXEL_CODE_COUNT], [0, PIXEL_CODE_COUNT]
+            ).ravel()
+            codes = np.arange(PIXEL_CODE_COUNT)
             
             detected_colors = []
             color_percentages = {}
             
             total_pixels = image.shape[0] * image.shape[1]
             
-            for color_name, ranges in color_ranges.items():
-                mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
-                
-                for i in range(0, len(ranges), 2):
-                    lower = np.array(ranges[i])
-                    upper = np.array(ranges[i + 1])
-                    color_mask = cv2.inRange(hsv, lower, upper)
-                    mask = cv2.bitwise_or(mask, color_mask)
-                
-                color_pixels = cv2.countNonZero(mask)
+            for color_name, color_bits in COLOR_BITS.items():
+                color_pixels = float(code_counts[(codes & color_bits) != 0].sum())
                 percentage = color_pixels / total_pixels
                 
                 if percentage > 0.1:  # At least 10% of the vehicle
@@ -270,9 +953,13 @@ class EmergencyVehicleDetector:
             self.logger.error(f"Error in color analysis: {e}")
             return 0.0, []
     
-    def _analyze_patterns(self, image) -> Tuple[float, List[str]]:
+    @timed_stage('patterns')
+    def _analyze_patterns(self, image, scale: float = 1.0) -> Tuple[float, List[str]]:
         """Analyze patterns and text that indicate emergency vehicles"""
         try:
+            if self.feature_extractor is not None:
+                return self.feature_extractor.analyze_patterns(image, scale)
+            
             # Convert to grayscale for pattern detection
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
@@ -294,7 +981,7 @@ class EmergencyVehicleDetector:
                 # Check if it's roughly rectangular
                 if len(approx) == 4:
                     area = cv2.contourArea(contour)
-                    if area > 100:  # Minimum size threshold
+                    if area > 100 * scale * scale:  # Minimum size threshold, in original pixels
                         rectangular_patterns += 1
             
             if rectangular_patterns > 2:
@@ -313,19 +1000,28 @@ class EmergencyVehicleDetector:
             self.logger.error(f"Error in pattern analysis: {e}")
             return 0.0, []
     
-    def _detect_light_bar(self, image) -> Tuple[float, bool]:
+    @timed_stage('light_bar')
+    def _detect_light_bar(self, image, pixel_codes: np.ndarray = None, scale: float = 1.0) -> Tuple[float, bool]:
         """Detect emergency light bars on top of vehicles"""
         try:
             # Focus on the top portion of the vehicle
             height = image.shape[0]
-            top_portion = image[:height//3, :]
             
-            # Convert to HSV
-            hsv = cv2.cvtColor(top_portion, cv2.COLOR_BGR2HSV)
+            if self.feature_extractor is not None:
+                if pixel_codes is None:
+                    pixel_codes = self._classify_hsv_pixels(image)
+                return self.feature_extractor.detect_light_bar(image, pixel_codes, scale)
+            
+            if pixel_codes is None:
+                top_codes = self._classify_hsv_pixels(image[:height//3, :])
+            else:
+                top_codes = pixel_codes[:height//3, :]
             
             # Look for bright, saturated colors (emergency lights)
             # High saturation and value indicate bright colored lights
-            bright_mask = cv2.inRange(hsv, (0, 100, 200), (180, 255, 255))
+            bright_mask = cv2.compare(
+                cv2.bitwise_and(top_codes, LIGHT_BAR_BIT), 0, cv2.CMP_NE
+            )
             
             # Find contours of bright areas
             contours, _ = cv2.findContours(bright_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -337,7 +1033,7 @@ class EmergencyVehicleDetector:
                 aspect_ratio = w / h if h > 0 else 0
                 
                 # Light bars are typically wider than they are tall
-                if aspect_ratio > 2 and w > 20:
+                if aspect_ratio > 2 and w > 20 * scale:
                     horizontal_patterns += 1
             
             has_light_bar = horizontal_patterns > 0
@@ -349,6 +1045,7 @@ class EmergencyVehicleDetector:
             self.logger.error(f"Error in light bar detection: {e}")
             return 0.0, False
     
+    @timed_stage('classification')
     def _classify_emergency_type(self, colors: List[str], patterns: List[str], 
                                 has_light_bar: bool) -> Optional[str]:
         """Classify the type of emergency vehicle based on detected features"""
@@ -392,21 +1089,89 @@ class EmergencyVehicleDetector:
             self.logger.error(f"Error classifying emergency type: {e}")
             return None
     
+    def warm_up(self, iterations: int = None) -> float:
+        """
+        Run dummy inferences so the first real frame does not pay for
+        kernel selection, buffer allocation and lazy backend setup
+        
+        Args:
+            iterations: Number of dummy inferences (default WARMUP_INFERENCES)
+            
+        Returns:
+            Time spent warming up in milliseconds
+        """
+        if iterations is None:
+            iterations = int(os.getenv('WARMUP_INFERENCES', 2))
+        
+        start = time.perf_counter()
+        
+        size = self.frame_decoder.target_size
+        frame = np.zeros((size, size, 3), dtype=np.uint8)
+        for _ in range(iterations):
+            self.model(frame)
+        
+        if iterations:
+            # Also prime the color lookup and pattern analysis on a vehicle-sized crop
+            self._analyze_emergency_features(frame[:128, :128])
+        
+        self.warmed_up = True
+        # Dummy frames would skew the live latency numbers
+        self.stage_metrics.reset()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.logger.info(f"Detector warmed up with {iterations} dummy inferences in {elapsed_ms:.0f} ms")
+        return elapsed_ms
+    
     def get_system_status(self) -> Dict:
         """Get the current status of the detection system"""
         return {
             'model_loaded': self.model is not None,
+            'warmed_up': self.warmed_up,
+            'inference_backend': self.backend,
             'confidence_threshold': self.confidence_threshold,
             'emergency_colors': self.emergency_colors,
+            'batch_size': self.batch_size,
+            'feature_extractor': self.feature_extractor_name,
+            'batched_features': {
+                'enabled': self.batched_features_enabled,
+                'min_crops': self.batched_features_min_crops,
+                'crop_size': self.batched_crop_size
+            },
+            'decoding': self.frame_decoder.get_stats(),
+            'roi_signals': sorted(self.signal_rois.keys()),
+            'motion_gating': self.motion_gate.get_stats(),
+            'result_cache': self.result_cache.get_stats(),
+            'stage_timings': self.get_stage_metrics(),
+            'tracking': self.tracker.get_stats(),
+            'cascade': {
+                'enabled': self.cascade_enabled,
+                'models': self.cascade_model_paths,
+                'uncertainty_band': list(self.cascade_uncertainty_band),
+                'frames_processed': self.cascade_frames,
+                'frames_escalated': self.cascade_escalations,
+                'hit_rate': self.cascade_escalations / self.cascade_frames if self.cascade_frames else 0.0,
+                'stage_runs': dict(zip(self.cascade_model_paths, self.cascade_stage_runs))
+            },
             'supported_vehicle_types': list(self.emergency_patterns.keys()),
             'system_time': datetime.utcnow().isoformat(),
             'status': 'operational'
         }
     
+    def get_stage_metrics(self) -> Dict:
+        """Rolling latency percentiles per pipeline stage"""
+        return self.stage_metrics.get_stats()
+    
+    def export_stage_metrics(self, header: bool = True) -> str:
+        """Stage latencies in the Prometheus text format, labelled with this process"""
+        return self.stage_metrics.to_prometheus(
+            'detection_stage_latency_ms', {'pid': str(os.getpid())}, header=header
+        )
+    
     def update_confidence_threshold(self, new_threshold: float):
         """Update the confidence threshold for detections"""
         if 0.0 <= new_threshold <= 1.0:
             self.confidence_threshold = new_threshold
+            # Cached results were filtered with the old threshold
+            self.result_cache.invalidate()
             self.logger.info(f"Updated confidence threshold to {new_threshold}")
             return True
         return False
@@ -1,28 +1,28 @@
 import os
 import logging
+import threading
 from flask import Flask, request, jsonify, render_template, send_from_directory
 from flask_cors import CORS
 from dotenv import load_dotenv
 import redis
 import psycopg2
 from psycopg2.extras import RealDictCursor
+import io
 import json
 from datetime import datetime
 
-# Import our custom modules
-<<<<<<< HEAD
-from src.detection.vehicle_detector import EmergencyVehicleDetector
-from src.routing.route_optimizer import RouteOptimizer
-from src.signals.signal_controller import SignalController
-from src.config.database import DatabaseManager
-from src.utils.logger import setup_logger
-=======
-from detection.vehicle_detector import EmergencyVehicleDetector
+# Import our custom modules (the detector module, which imports ultralytics/torch,
+# is only imported when the detector is first built)
+from detection.stream_worker import VideoStreamWorker
+from detection.temporal_voting import EmergencyVoter
+from detection.sampling_scheduler import SamplingScheduler
+from detection.job_queue import DetectionJobQueue
+from detection.process_pool import DetectorProcessPool, PooledDetector, create_detector
 from routing.route_optimizer import RouteOptimizer
 from signals.signal_controller import SignalController
 from config.database import DatabaseManager
 from utils.logger import setup_logger
->>>>>>> 4ab97fac9c15350495332ae16e32c4793b53983c
+from utils.startup import StartupTimer, LazyComponent, WarmupThread
 
 # Load environment variables
 load_dotenv()
@@ -34,15 +34,138 @@ CORS(app)
 # Setup logging
 logger = setup_logger(__name__)
 
-# Initialize components
-detector = EmergencyVehicleDetector()
-route_optimizer = RouteOptimizer()
-signal_controller = SignalController()
-db_manager = DatabaseManager()
+# Startup phase durations are logged and reported by /ready
+startup_timer = StartupTimer(logger)
+
+# Detector worker processes, started per server process by start_services
+detector_pool_enabled = os.getenv('DETECTOR_POOL_ENABLED', 'false').lower() == 'true'
+detector_pool = None
+
+def _create_detector():
+    """With the pool, this process only decodes frames and never loads a model itself"""
+    if detector_pool is not None:
+        return PooledDetector(detector_pool)
+    return create_detector()
+
+# Initialize components on first use; the warm-up thread builds them in the background
+detector = LazyComponent('detector', _create_detector, startup_timer)
+route_optimizer = LazyComponent('route_optimizer', RouteOptimizer, startup_timer)
+signal_controller = LazyComponent('signal_controller', SignalController, startup_timer)
+db_manager = LazyComponent('database', DatabaseManager, startup_timer)
+
+def _log_stream_detection(signal_id, detection_result, override_result, vehicle_type):
+    """Persist detections made by the camera stream worker, with the voted vehicle type"""
+    db_manager.log_emergency_detection(
+        signal_id=signal_id,
+        vehicle_type=vehicle_type,
+        confidence=detection_result['confidence'],
+        detection_time=datetime.utcnow()
+    )
+
+# N-of-M frame voting and override debouncing, shared by uploads and camera streams
+emergency_voter = EmergencyVoter()
+
+# Per-camera sampling rates that follow detector load, activity and priority
+sampling_scheduler = SamplingScheduler()
+
+# Continuous camera ingestion (configured through STREAM_SOURCES)
+stream_worker = VideoStreamWorker(
+    detector, signal_controller, on_detection=_log_stream_detection,
+    voter=emergency_voter, scheduler=sampling_scheduler
+)
+
+def _process_detection_job(signal_id, frame):
+    """Run detection and its follow-up actions for a queued frame"""
+    if isinstance(frame, bytes):
+        frame = io.BytesIO(frame)
+    
+    detection_result = detector.detect_emergency_vehicle(frame, signal_id=signal_id)
+    return _respond_to_detection(signal_id, detection_result)
+
+# Asynchronous detection: endpoints enqueue frames, workers drain the queue
+job_queue_enabled = os.getenv('JOB_QUEUE_ENABLED', 'false').lower() == 'true'
+detection_queue = DetectionJobQueue(_process_detection_job)
 
 # Redis connection for caching
 redis_client = redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379'))
 
+def _load_signal_rois():
+    """Restrict detection to each camera's configured region of interest"""
+    for roi_signal_id, roi_polygon in db_manager.get_signal_rois().items():
+        detector.set_signal_roi(roi_signal_id, roi_polygon)
+
+def _load_sampling_priorities():
+    """Sample cameras at signals near a hospital (or listed in SAMPLING_PRIORITY_SIGNALS) more often"""
+    priority = float(os.getenv('SAMPLING_PRIORITY_WEIGHT', 2.0))
+    radius = float(os.getenv('SAMPLING_HOSPITAL_RADIUS', 1.0))  # km
+    
+    priority_signals = {s.strip() for s in os.getenv('SAMPLING_PRIORITY_SIGNALS', '').split(',') if s.strip()}
+    for priority_signal_id, location in route_optimizer.traffic_signals.items():
+        if route_optimizer.get_nearby_hospitals(location.latitude, location.longitude, radius):
+            priority_signals.add(priority_signal_id)
+    
+    for priority_signal_id in priority_signals:
+        sampling_scheduler.set_priority(priority_signal_id, priority)
+
+# Background initialisation: /health answers at once, /ready once this finishes
+warmup = WarmupThread(
+    [db_manager, detector, signal_controller, route_optimizer],
+    startup_timer,
+    warmup_steps=[
+        ('database tables', lambda: db_manager.initialize_database()),
+        ('signal ROIs', _load_signal_rois),
+        ('sampling priorities', _load_sampling_priorities),
+        ('detector warm-up', lambda: detector.warm_up())
+    ]
+)
+
+# Background work is started once per server process, see start_services
+services_lock = threading.Lock()
+services_pid = None
+
+def start_services():
+    """
+    Start the detector pool, warm-up, camera streams and queue workers of this process
+    
+    Runs once per process: from create_app or the first request under a WSGI
+    server (every gunicorn worker is its own process), and before serving
+    under python src/main.py. Nothing is started at import, so the Flask
+    reloader's watcher process and a preloading gunicorn master don't start
+    a pool that their workers would inherit.
+    """
+    global detector_pool, services_pid
+    
+    with services_lock:
+        if services_pid == os.getpid():
+            return
+        services_pid = os.getpid()
+        
+        # Detector worker processes are forked before this process loads any model
+        # or starts any thread of its own, so the pool still starts synchronously
+        if detector_pool_enabled:
+            detector_pool = DetectorProcessPool()
+            startup_timer.phase('detector process pool', detector_pool.start)
+    
+    # Build components, create database tables, load ROIs and warm up the model
+    # in the background while the server already answers /health
+    warmup.start()
+    
+    # Start camera streams (their first frames wait for the detector)
+    stream_worker.start()
+    
+    # Start detection workers
+    if job_queue_enabled:
+        detection_queue.start()
+
+@app.before_request
+def _start_services_on_first_request():
+    start_services()
+
+def create_app():
+    """App factory for WSGI servers, e.g. gunicorn 'main:create_app()' (without --preload)"""
+    start_services()
+    return app
+
 @app.route('/')
 def dashboard():
     """Main dashboard page"""
@@ -50,7 +173,7 @@ def dashboard():
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Liveness endpoint: the process is up, models may still be loading"""
     return jsonify({
         'status': 'healthy',
         'service': 'traffic-management',
@@ -58,6 +181,13 @@ def health_check():
         'version': '1.0.0'
     })
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: 200 once every component is built and the model is warmed up"""
+    state = warmup.get_state()
+    state['timestamp'] = datetime.utcnow().isoformat()
+    return jsonify(state), 200 if state['ready'] else 503
+
 @app.route('/api/detect/vehicle', methods=['POST'])
 def detect_emergency_vehicle():
     """
@@ -73,53 +203,217 @@ def detect_emergency_vehicle():
         if not signal_id:
             return jsonify({'error': 'Signal ID is required'}), 400
         
-        # Detect emergency vehicle
-        detection_result = detector.detect_emergency_vehicle(image_file)
-        
-        if detection_result['is_emergency']:
-            # Log detection
-            db_manager.log_emergency_detection(
-                signal_id=signal_id,
-                vehicle_type=detection_result['vehicle_type'],
-                confidence=detection_result['confidence'],
-                detection_time=datetime.utcnow()
-            )
+        # Queue mode: hand the frame to the detection workers and return at once
+        if job_queue_enabled or request.form.get('async', '').lower() == 'true':
+            callback_url = request.form.get('callback_url')
+            if callback_url:
+                callback_error = detection_queue.check_callback_url(callback_url)
+                if callback_error is not None:
+                    return jsonify({'error': callback_error}), 400
             
-            # Trigger signal override
-            override_result = signal_controller.emergency_override(signal_id)
+            if not detection_queue.active:
+                detection_queue.start()
             
-            # Calculate route if it's an ambulance
-            route_result = None
-            if detection_result['vehicle_type'] == 'ambulance':
-                route_result = route_optimizer.calculate_emergency_route(signal_id)
+            job = detection_queue.submit(signal_id, image_file.read(), callback_url=callback_url)
+            if job['status'] == 'rejected':
+                return jsonify(job), 503
             
-            return jsonify({
-                'detection': detection_result,
-                'signal_override': override_result,
-                'route': route_result,
-                'timestamp': datetime.utcnow().isoformat()
-            })
-        else:
-            return jsonify({
-                'detection': detection_result,
-                'message': 'No emergency vehicle detected',
-                'timestamp': datetime.utcnow().isoformat()
-            })
+            job['status_url'] = f"/api/detect/jobs/{job['job_id']}"
+            return jsonify(job), 202
+        
+        # Detect emergency vehicle
+        detection_result = detector.detect_emergency_vehicle(image_file, signal_id=signal_id)
+        
+        return jsonify(_respond_to_detection(signal_id, detection_result))
             
     except Exception as e:
         logger.error(f"Error in vehicle detection: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/detect/vehicle/batch', methods=['POST'])
+def detect_emergency_vehicle_batch():
+    """
+    Detect emergency vehicles in several camera frames with one model call
+    """
+    try:
+        image_files = request.files.getlist('images')
+        signal_ids = request.form.getlist('signal_ids')
+        
+        if not image_files:
+            return jsonify({'error': 'No image files provided'}), 400
+        
+        if len(signal_ids) != len(image_files):
+            return jsonify({'error': 'A signal ID is required for each image'}), 400
+        
+        # Detect emergency vehicles in all frames at once (spread over the worker processes with the pool)
+        detection_results = detector.detect_batch(image_files, signal_ids)
+        
+        results = [
+            _respond_to_detection(signal_id, detection_result)
+            for signal_id, detection_result in zip(signal_ids, detection_results)
+        ]
+        
+        return jsonify({
+            'results': results,
+            'frames_processed': len(results),
+            'emergencies_detected': sum(1 for r in detection_results if r['is_emergency']),
+            'timestamp': datetime.utcnow().isoformat()
+        })
+            
+    except Exception as e:
+        logger.error(f"Error in batch vehicle detection: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+def _respond_to_detection(signal_id, detection_result):
+    """Log an emergency detection and trigger the signal override and routing"""
+    # Enough recent frames must agree, and an active override is not re-triggered
+    vote = emergency_voter.observe(signal_id, detection_result)
+    
+    if vote['fire']:
+        # Majority vehicle type over the voting window
+        vehicle_type = vote['vehicle_type']
+        
+        # Log detection
+        db_manager.log_emergency_detection(
+            signal_id=signal_id,
+            vehicle_type=vehicle_type,
+            confidence=detection_result['confidence'],
+            detection_time=datetime.utcnow()
+        )
+        
+        # Trigger signal override
+        override_result = signal_controller.emergency_override(signal_id)
+        
+        # Calculate route if it's an ambulance
+        route_result = None
+        if vehicle_type == 'ambulance':
+            route_result = route_optimizer.calculate_emergency_route(signal_id)
+        
+        return {
+            'detection': detection_result,
+            'vote': vote,
+            'signal_override': override_result,
+            'route': route_result,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+    elif detection_result['is_emergency'] and not vote['confirmed']:
+        return {
+            'detection': detection_result,
+            'vote': vote,
+            'message': f"Emergency vehicle awaiting confirmation "
+                       f"({vote['positives']} of {vote['required']} frames)",
+            'timestamp': datetime.utcnow().isoformat()
+        }
+    elif detection_result['is_emergency']:
+        return {
+            'detection': detection_result,
+            'vote': vote,
+            'message': 'Emergency vehicle already reported',
+            'timestamp': datetime.utcnow().isoformat()
+        }
+    else:
+        return {
+            'detection': detection_result,
+            'message': 'No emergency vehicle detected',
+            'timestamp': datetime.utcnow().isoformat()
+        }
+
+@app.route('/api/detect/jobs/<job_id>', methods=['GET'])
+def get_detection_job(job_id):
+    """Get the status and result of a queued detection"""
+    try:
+        job = detection_queue.get_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job)
+    except Exception as e:
+        logger.error(f"Error getting detection job {job_id}: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/detect/queue', methods=['GET'])
+def get_detection_queue_status():
+    """Get detection job queue depth and counters"""
+    try:
+        return jsonify(detection_queue.get_stats())
+    except Exception as e:
+        logger.error(f"Error getting detection queue status: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/detect/status', methods=['GET'])
 def get_detection_status():
     """Get detection system status"""
     try:
         status = detector.get_system_status()
+        status['voting'] = emergency_voter.get_stats()
+        if detector_pool is not None:
+            status['process_pool'] = detector_pool.get_stats()
         return jsonify(status)
     except Exception as e:
         logger.error(f"Error getting detection status: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/detect/metrics', methods=['GET'])
+def get_detection_metrics():
+    """Get rolling per-stage detection latency (?format=prometheus for the text format)"""
+    try:
+        if request.args.get('format') == 'prometheus':
+            text = detector.export_stage_metrics()
+            if detector_pool is not None:
+                text += ''.join(detector_pool.broadcast('export_stage_metrics', False))
+            return text, 200, {'Content-Type': 'text/plain; version=0.0.4'}
+        
+        metrics = {
+            'stages': detector.get_stage_metrics(),
+            'window_seconds': detector.stage_metrics.window_seconds,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        if detector_pool is not None:
+            # Inference runs in the worker processes, decoding in this one
+            metrics['workers'] = detector_pool.broadcast('get_stage_metrics')
+        return jsonify(metrics)
+    except Exception as e:
+        logger.error(f"Error getting detection metrics: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/streams', methods=['GET'])
+def get_streams_status():
+    """Get status of the continuous camera streams"""
+    try:
+        return jsonify(stream_worker.get_status())
+    except Exception as e:
+        logger.error(f"Error getting stream status: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/streams/sampling', methods=['GET'])
+def get_stream_sampling():
+    """Get the current frame interval and sampling rate of every camera stream"""
+    try:
+        rates = sampling_scheduler.get_rates()
+        rates['timestamp'] = datetime.utcnow().isoformat()
+        return jsonify(rates)
+    except Exception as e:
+        logger.error(f"Error getting stream sampling rates: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/streams', methods=['POST'])
+def add_stream():
+    """Register an RTSP or video file source for a signal"""
+    try:
+        data = request.get_json()
+        signal_id = data.get('signal_id')
+        source = data.get('source')
+        
+        if not signal_id or not source:
+            return jsonify({'error': 'Signal ID and source are required'}), 400
+        
+        result = stream_worker.add_source(signal_id, source, data.get('loop'))
+        if not result.get('success'):
+            return jsonify(result), 409
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error adding stream: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/signals', methods=['GET'])
 def get_all_signals():
     """Get all traffic signals"""
@@ -151,6 +445,9 @@ def override_signal(signal_id):
         reason = data.get('reason', 'Manual override')
         
         result = signal_controller.emergency_override(signal_id, duration, reason)
+        if result.get('success'):
+            # Detections at this signal don't re-trigger the override while it lasts
+            emergency_voter.note_override(signal_id, duration)
         return jsonify(result)
     except Exception as e:
         logger.error(f"Error overriding signal {signal_id}: {str(e)}")
@@ -173,6 +470,36 @@ def update_signal_timing(signal_id):
         logger.error(f"Error updating signal timing {signal_id}: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/signals/<signal_id>/roi', methods=['PUT'])
+def update_signal_roi(signal_id):
+    """Set or clear the camera region of interest used for detection"""
+    try:
+        data = request.get_json() or {}
+        polygon = data.get('polygon')
+        previous_polygon = detector.get_signal_roi(signal_id)
+        
+        # Applying the polygon validates it; it is rolled back if it can't be stored
+        if polygon is not None and not detector.set_signal_roi(signal_id, polygon):
+            return jsonify({'error': 'polygon must be at least 3 [x, y] pixel points'}), 400
+        
+        try:
+            updated = db_manager.update_signal_roi(signal_id, polygon)
+        except Exception:
+            detector.set_signal_roi(signal_id, previous_polygon)
+            raise
+        
+        if not updated:
+            detector.set_signal_roi(signal_id, previous_polygon)
+            return jsonify({'error': 'Signal not found'}), 404
+        
+        if polygon is None:
+            detector.set_signal_roi(signal_id, None)
+        
+        return jsonify({'success': True, 'signal_id': signal_id, 'polygon': polygon})
+    except Exception as e:
+        logger.error(f"Error updating signal ROI {signal_id}: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/routing/emergency', methods=['POST'])
 def calculate_emergency_route():
     """Calculate emergency route to nearest hospital"""
@@ -469,16 +796,14 @@ def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
 if __name__ == '__main__':
-    # Initialize database tables
-    db_manager.initialize_database()
-    
-    # Start the Flask application
     port = int(os.getenv('FLASK_PORT', 5000))
     debug = os.getenv('FLASK_ENV') == 'development'
     
-    logger.info(f"Starting Traffic Management Platform on port {port}")
-<<<<<<< HEAD
-    app.run(host='0.0.0.0', port=port, debug=debug)
-=======
+    # With the debug reloader only the child process that serves requests starts services
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_services()
+    
+    # Start the Flask application
+    logger.info(f"Starting Traffic Management Platform on port {port} "
+                f"({startup_timer.elapsed_ms():.0f} ms after launch)")
     app.run(host='0.0.0.0', port=port, debug=debug)
->>>>>>> 4ab97fac9c15350495332ae16e32c4793b53983c
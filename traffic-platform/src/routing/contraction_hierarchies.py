@@ -0,0 +1,340 @@
+import os
+import heapq
+import logging
+import numpy as np
+from typing import Dict, List, Tuple
+
+from routing.road_graph import RoadGraph, SearchResult, read_array_file, write_array_file
+
+class ContractionHierarchy:
+    """
+    Contraction Hierarchies (CH) over a RoadGraph for fast exact route queries
+
+    Preprocessing contracts the nodes one at a time, least important first.
+    Removing node v adds a shortcut u -> x wherever u -> v -> x was the only
+    shortest connection left (no "witness" path around v), so distances
+    between the remaining nodes never change. Every node ends up with a rank,
+    and every shortest path in the city becomes a path that only climbs in
+    rank from the source and only descends to the target.
+
+    A query is then a bidirectional Dijkstra in which the forward search
+    follows edges to higher-ranked nodes from the source and the backward
+    search follows incoming edges from higher-ranked nodes into the
+    target. Both searches stay within a few hundred nodes on city networks.
+    Shortcuts remember the node they bypass, so the route is unpacked back
+    into the original intersections.
+    """
+
+    def __init__(self, graph: RoadGraph, rank: np.ndarray,
+                 up_offsets: np.ndarray, up_targets: np.ndarray, up_weights: np.ndarray, up_middle: np.ndarray,
+                 down_offsets: np.ndarray, down_sources: np.ndarray, down_weights: np.ndarray,
+                 down_middle: np.ndarray):
+        self.graph = graph
+        self.rank = rank
+
+        # Edges u -> v to higher-ranked v, stored with u (forward search)
+        self.up_offsets = up_offsets
+        self.up_targets = up_targets
+        self.up_weights = up_weights
+
+        # Edges u -> v from higher-ranked u, stored with v (backward search)
+        self.down_offsets = down_offsets
+        self.down_sources = down_sources
+        self.down_weights = down_weights
+
+        # Node a shortcut bypasses, -1 for an original road
+        self.up_middle = up_middle
+        self.down_middle = down_middle
+
+    @property
+    def shortcut_count(self) -> int:
+        return int(np.count_nonzero(self.up_middle >= 0) + np.count_nonzero(self.down_middle >= 0))
+
+    @classmethod
+    def build(cls, graph: RoadGraph, witness_settle_limit: int = None) -> 'ContractionHierarchy':
+        """
+        Contract every node of a graph
+
+        Nodes are ordered by edge difference (shortcuts added minus edges
+        removed), the number of neighbours already contracted and their
+        depth in the hierarchy, which spreads the contraction evenly over
+        the city. Priorities are updated lazily: a node whose priority has
+        grown since it was queued goes back into the queue.
+
+        Args:
+            graph: Road graph to preprocess
+            witness_settle_limit: Nodes a witness search may settle before
+                giving up and adding the shortcut (extra shortcuts cost query
+                time, never correctness); defaults to CH_WITNESS_SETTLE_LIMIT
+
+        Returns:
+            ContractionHierarchy for the graph
+        """
+        logger = logging.getLogger(__name__)
+        settle_limit = witness_settle_limit or int(os.getenv('CH_WITNESS_SETTLE_LIMIT', 100))
+
+        n = graph.node_count
+        # Remaining graph: node -> {neighbour: (weight, middle)}, lightest parallel edge only
+        out_edges: List[Dict[int, Tuple[float, int]]] = [{} for _ in range(n)]
+        in_edges: List[Dict[int, Tuple[float, int]]] = [{} for _ in range(n)]
+
+        sources = np.repeat(np.arange(n), np.diff(graph.offsets))
+        for u, v, weight in zip(sources.tolist(), graph.targets.tolist(), graph.weights.tolist()):
+            if u != v and weight < out_edges[u].get(v, (float('inf'),))[0]:
+                out_edges[u][v] = (weight, -1)
+                in_edges[v][u] = (weight, -1)
+
+        contracted_neighbors = [0] * n
+        level = [0] * n
+
+        def priority(v: int, shortcuts: list) -> int:
+            edge_difference = len(shortcuts) - len(in_edges[v]) - len(out_edges[v])
+            return 2 * edge_difference + contracted_neighbors[v] + level[v]
+
+        heap = [(priority(v, cls._shortcuts(v, out_edges, in_edges, settle_limit)), v) for v in range(n)]
+        heapq.heapify(heap)
+
+        rank = np.full(n, -1, dtype=np.int32)
+        up: List[list] = [None] * n
+        down: List[list] = [None] * n
+        next_rank = 0
+
+        while heap:
+            _, v = heapq.heappop(heap)
+            if rank[v] >= 0:
+                continue
+
+            shortcuts = cls._shortcuts(v, out_edges, in_edges, settle_limit)
+            current = priority(v, shortcuts)
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, v))
+                continue
+
+            rank[v] = next_rank
+            next_rank += 1
+
+            # All remaining neighbours are contracted later, so rank higher than v
+            up[v] = list(out_edges[v].items())
+            down[v] = list(in_edges[v].items())
+            for u in set(out_edges[v]) | set(in_edges[v]):
+                contracted_neighbors[u] += 1
+                level[u] = max(level[u], level[v] + 1)
+            for x in out_edges[v]:
+                del in_edges[x][v]
+            for u in in_edges[v]:
+                del out_edges[u][v]
+            out_edges[v] = in_edges[v] = None
+
+            for u, x, weight in shortcuts:
+                if weight < out_edges[u].get(x, (float('inf'),))[0]:
+                    out_edges[u][x] = (weight, v)
+                    in_edges[x][u] = (weight, v)
+
+        up_arrays = cls._to_csr(up)
+        down_arrays = cls._to_csr(down)
+        hierarchy = cls(graph, rank, *up_arrays, *down_arrays)
+        logger.info(f"Contracted {n} nodes, adding {hierarchy.shortcut_count} shortcuts")
+        return hierarchy
+
+    @staticmethod
+    def _shortcuts(v: int, out_edges: List[Dict], in_edges: List[Dict], settle_limit: int) -> List[Tuple]:
+        """(u, x, weight) shortcuts needed to contract v without changing any distance"""
+        shortcuts = []
+        for u, (weight_in, _) in in_edges[v].items():
+            via = {x: weight_in + weight_out for x, (weight_out, _) in out_edges[v].items() if x != u}
+            if not via:
+                continue
+
+            # Local Dijkstra from u around v, up to the longest path through v
+            limit = max(via.values())
+            remaining = set(via)
+            distances = {u: 0.0}
+            heap = [(0.0, u)]
+            settled = 0
+            while heap and remaining and settled < settle_limit:
+                distance, w = heapq.heappop(heap)
+                if distance > distances[w]:
+                    continue
+                if distance > limit:
+                    break
+                remaining.discard(w)
+                settled += 1
+                for y, (weight, _) in out_edges[w].items():
+                    if y == v:
+                        continue
+                    candidate = distance + weight
+                    if candidate < distances.get(y, float('inf')):
+                        distances[y] = candidate
+                        heapq.heappush(heap, (candidate, y))
+
+            for x, weight in via.items():
+                if distances.get(x, float('inf')) > weight:
+                    shortcuts.append((u, x, weight))
+
+        return shortcuts
+
+    @staticmethod
+    def _to_csr(edges: List[list]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Per-node [(neighbour, (weight, middle))] lists as offsets, neighbours, weights, middles"""
+        offsets = np.zeros(len(edges) + 1, dtype=np.int64)
+        np.cumsum([len(node_edges) for node_edges in edges], out=offsets[1:])
+        flat = [edge for node_edges in edges for edge in node_edges]
+        neighbors = np.array([neighbor for neighbor, _ in flat], dtype=np.int32)
+        weights = np.array([weight for _, (weight, _) in flat], dtype=np.float64)
+        middle = np.array([middle for _, (_, middle) in flat], dtype=np.int32)
+        return offsets, neighbors, weights, middle
+
+    def _fingerprint(self) -> Dict:
+        """Identifies the graph a hierarchy was built for"""
+        return {
+            'node_count': self.graph.node_count,
+            'edge_count': self.graph.edge_count,
+            'weight_sum': float(self.graph.weights.sum())
+        }
+
+    def save(self, path: str):
+        """Write the hierarchy in the road graph file layout, for load() to memory-map"""
+        arrays = {
+            'rank': self.rank,
+            'up_offsets': self.up_offsets,
+            'up_targets': self.up_targets,
+            'up_weights': self.up_weights,
+            'up_middle': self.up_middle,
+            'down_offsets': self.down_offsets,
+            'down_sources': self.down_sources,
+            'down_weights': self.down_weights,
+            'down_middle': self.down_middle
+        }
+        write_array_file(path, {'kind': 'contraction_hierarchy', 'graph': self._fingerprint()}, arrays)
+
+    @classmethod
+    def load(cls, path: str, graph: RoadGraph, mmap: bool = True) -> 'ContractionHierarchy':
+        """
+        Open a hierarchy written by save()
+
+        Raises:
+            ValueError: The file isn't a hierarchy or was built for another graph
+        """
+        header, arrays = read_array_file(path, mmap)
+        if header.get('kind') != 'contraction_hierarchy':
+            raise ValueError(f"{path} is not a contraction hierarchy file")
+
+        hierarchy = cls(graph, arrays['rank'],
+                        arrays['up_offsets'], arrays['up_targets'], arrays['up_weights'], arrays['up_middle'],
+                        arrays['down_offsets'], arrays['down_sources'], arrays['down_weights'],
+                        arrays['down_middle'])
+        if header['graph'] != hierarchy._fingerprint():
+            raise ValueError(f"{path} was built for a different road graph")
+        return hierarchy
+
+    def search(self, source: str, target: str) -> SearchResult:
+        """Shortest path between two nodes (or signals), unpacked to the original nodes"""
+        s, t = self.graph.resolve(source), self.graph.resolve(target)
+        distance, path, expanded = self._query(s, t)
+        return SearchResult(distance, [self.graph.node_ids[u] for u in path], expanded)
+
+    def _query(self, s: int, t: int) -> Tuple[float, List[int], int]:
+        """
+        Bidirectional upward search
+
+        Unlike plain bidirectional Dijkstra, the first meeting point isn't
+        final: the highest-ranked node of the path may be settled late, so
+        each side runs until its queue head alone reaches the best distance.
+        A node that a higher-ranked node already reaches more cheaply is
+        "stalled" and not expanded, since no shortest path goes through it
+        from this side (stall-on-demand).
+        """
+        if s == t:
+            return 0.0, [s], 1
+
+        # Each side searches its own edges and checks for stalling along the other side's
+        sides = [
+            (self.up_offsets, self.up_targets, self.up_weights,
+             self.down_offsets, self.down_sources, self.down_weights, {s: 0.0}, {}, [(0.0, s)]),
+            (self.down_offsets, self.down_sources, self.down_weights,
+             self.up_offsets, self.up_targets, self.up_weights, {t: 0.0}, {}, [(0.0, t)])
+        ]
+        forward_heap, backward_heap = sides[0][8], sides[1][8]
+        settled = [set(), set()]
+        best, meeting = float('inf'), None
+        expanded = 0
+
+        while True:
+            forward_head = forward_heap[0][0] if forward_heap else float('inf')
+            backward_head = backward_heap[0][0] if backward_heap else float('inf')
+            if min(forward_head, backward_head) >= best:
+                break
+
+            side = 0 if forward_head <= backward_head else 1
+            offsets, neighbors, weights, stall_offsets, stall_neighbors, stall_weights, \
+                distances, previous, heap = sides[side]
+
+            distance, u = heapq.heappop(heap)
+            if u in settled[side]:
+                continue
+            settled[side].add(u)
+            expanded += 1
+
+            other_distance = sides[1 - side][6].get(u)
+            if other_distance is not None and distance + other_distance < best:
+                best, meeting = distance + other_distance, u
+
+            start, end = stall_offsets[u], stall_offsets[u + 1]
+            stalled = False
+            for w, weight in zip(stall_neighbors[start:end].tolist(), stall_weights[start:end].tolist()):
+                if w in distances and distances[w] + weight < distance:
+                    stalled = True
+                    break
+            if stalled:
+                continue
+
+            start, end = offsets[u], offsets[u + 1]
+            for edge, (v, weight) in enumerate(zip(neighbors[start:end].tolist(),
+                                                   weights[start:end].tolist()), start):
+                candidate = distance + weight
+                if candidate < distances.get(v, float('inf')):
+                    distances[v] = candidate
+                    previous[v] = (u, edge)
+                    heapq.heappush(heap, (candidate, v))
+
+        if meeting is None:
+            return float('inf'), [], expanded
+
+        # Edges s -> meeting from the forward search, meeting -> t from the backward one
+        forward_edges = []
+        node = meeting
+        while node in sides[0][7]:
+            node, edge = sides[0][7][node]
+            forward_edges.append((node, int(self.up_targets[edge]), int(self.up_middle[edge])))
+        forward_edges.reverse()
+
+        backward_edges = []
+        node = meeting
+        while node in sides[1][7]:
+            target, edge = sides[1][7][node]
+            backward_edges.append((node, target, int(self.down_middle[edge])))
+            node = target
+
+        path = [s]
+        for edge in forward_edges + backward_edges:
+            self._unpack(edge, path)
+        return best, path, expanded
+
+    def _unpack(self, edge: Tuple[int, int, int], path: List[int]):
+        """Append the original nodes of edge (a, b, middle), after a, to path"""
+        stack = [edge]
+        while stack:
+            a, b, middle = stack.pop()
+            if middle < 0:
+                path.append(b)
+                continue
+            # middle ranks below a and b, so both halves are stored with it
+            stack.append((middle, b, self._middle(self.up_offsets, self.up_targets, self.up_middle, middle, b)))
+            stack.append((a, middle, self._middle(self.down_offsets, self.down_sources, self.down_middle,
+                                                  middle, a)))
+
+    @staticmethod
+    def _middle(offsets: np.ndarray, neighbors: np.ndarray, middles: np.ndarray, node: int, neighbor: int) -> int:
+        start = offsets[node]
+        position = neighbors[start:offsets[node + 1]].tolist().index(neighbor)
+        return int(middles[start + position])
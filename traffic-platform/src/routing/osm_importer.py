@@ -0,0 +1,303 @@
+import os
+import re
+import bz2
+import gzip
+import logging
+import numpy as np
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Set, Tuple
+
+from routing.road_graph import RoadGraph, haversine_km
+
+# Speeds (km/h) assumed for roads without a usable maxspeed tag
+DEFAULT_SPEEDS_KMH = {
+    'motorway': 80, 'motorway_link': 50,
+    'trunk': 60, 'trunk_link': 40,
+    'primary': 50, 'primary_link': 35,
+    'secondary': 40, 'secondary_link': 30,
+    'tertiary': 35, 'tertiary_link': 25,
+    'unclassified': 30,
+    'residential': 25,
+    'living_street': 10,
+    'service': 15
+}
+
+MPH_TO_KMH = 1.609344
+
+def parse_maxspeed(value: Optional[str]) -> Optional[float]:
+    """
+    Speed in km/h from an OSM maxspeed tag ('50', '30 mph', '40;60'), or None
+
+    Zone values such as 'IN:urban' or 'walk' are not understood and give None.
+    """
+    if not value:
+        return None
+
+    match = re.match(r'\s*(\d+(?:\.\d+)?)\s*(mph|km/h|kmh|kph)?', value)
+    if not match:
+        return None
+
+    speed = float(match.group(1))
+    if match.group(2) == 'mph':
+        speed *= MPH_TO_KMH
+    return speed if speed > 0 else None
+
+def oneway_direction(tags: Dict[str, str]) -> int:
+    """1 for one-way along the way, -1 for against it, 0 for both directions"""
+    oneway = tags.get('oneway', '').lower()
+    if oneway in ('yes', 'true', '1'):
+        return 1
+    if oneway in ('-1', 'reverse'):
+        return -1
+    if oneway == 'no':
+        return 0
+
+    # Implied one-way roads
+    if tags.get('junction') in ('roundabout', 'circular') or tags.get('highway') == 'motorway':
+        return 1
+    return 0
+
+class OSMImporter:
+    """
+    Builds a routable RoadGraph from an OpenStreetMap extract
+
+    Ways tagged with a drivable highway class become directed edges
+    weighted by travel time at the way's speed limit. Chains of shape
+    points between intersections are merged into single edges, except that
+    nodes tagged highway=traffic_signals are kept so the city's signals can
+    be snapped onto them.
+    """
+
+    def __init__(self, speed_factor: float = None, signal_snap_radius: float = None):
+        self.logger = logging.getLogger(__name__)
+
+        # Emergency vehicles may drive above the limit; 1.0 plans at the speed limit
+        self.speed_factor = speed_factor or float(os.getenv('OSM_SPEED_FACTOR', 1.0))
+
+        # Signals prefer an OSM signal node within this many metres over the nearest node
+        self.signal_snap_radius = signal_snap_radius or float(os.getenv('OSM_SIGNAL_SNAP_RADIUS', 50))
+
+        # Signals farther than this from every road (e.g. outside the extract) are left out
+        self.signal_max_distance = float(os.getenv('OSM_SIGNAL_MAX_DISTANCE', 500))  # metres
+
+    def import_file(self, path: str, signals: Dict[str, Tuple[float, float]] = None) -> RoadGraph:
+        """
+        Read an .osm/.osm.xml(.gz/.bz2) or .osm.pbf file and build the graph
+
+        Args:
+            path: OSM extract on disk
+            signals: Optional signal_id -> (latitude, longitude) to snap onto the graph
+
+        Returns:
+            RoadGraph with travel-time weights in minutes and edge lengths in km
+        """
+        if path.endswith('.pbf'):
+            coordinates, signal_osm_nodes, ways = self._read_pbf(path)
+        else:
+            coordinates, signal_osm_nodes, ways = self._read_xml(path)
+
+        self.logger.info(f"Read {len(coordinates)} nodes and {len(ways)} drivable ways from {path}")
+
+        graph = self.build_graph(coordinates, signal_osm_nodes, ways)
+        if signals:
+            graph.signal_nodes = self.snap_signals(graph, signals, signal_osm_nodes)
+
+        return graph
+
+    def _read_xml(self, path: str):
+        """Stream an OSM XML file, keeping node coordinates and drivable ways"""
+        if path.endswith('.gz'):
+            source = gzip.open(path, 'rb')
+        elif path.endswith('.bz2'):
+            source = bz2.open(path, 'rb')
+        else:
+            source = open(path, 'rb')
+
+        coordinates: Dict[int, Tuple[float, float]] = {}
+        signal_osm_nodes: Set[int] = set()
+        ways: List[Tuple[List[int], Dict[str, str]]] = []
+
+        with source:
+            for _, element in ET.iterparse(source, events=('end',)):
+                if element.tag == 'node':
+                    node_id = int(element.get('id'))
+                    coordinates[node_id] = (float(element.get('lat')), float(element.get('lon')))
+                    for tag in element.iter('tag'):
+                        if tag.get('k') == 'highway' and tag.get('v') == 'traffic_signals':
+                            signal_osm_nodes.add(node_id)
+                    element.clear()
+
+                elif element.tag == 'way':
+                    tags = {tag.get('k'): tag.get('v') for tag in element.iter('tag')}
+                    if self._is_drivable(tags):
+                        ways.append(([int(nd.get('ref')) for nd in element.iter('nd')], tags))
+                    element.clear()
+
+                elif element.tag == 'relation':
+                    element.clear()
+
+        return coordinates, signal_osm_nodes, ways
+
+    def _read_pbf(self, path: str):
+        """Read an OSM PBF file with pyosmium"""
+        try:
+            import osmium
+        except ImportError:
+            raise ImportError("osmium (pyosmium) is required to read .osm.pbf files; "
+                              "convert the extract to .osm XML with osmium-tool otherwise")
+
+        importer = self
+
+        class Handler(osmium.SimpleHandler):
+            def __init__(self):
+                super().__init__()
+                self.coordinates = {}
+                self.signal_osm_nodes = set()
+                self.ways = []
+
+            def node(self, node):
+                if node.location.valid():
+                    self.coordinates[node.id] = (node.location.lat, node.location.lon)
+                if node.tags.get('highway') == 'traffic_signals':
+                    self.signal_osm_nodes.add(node.id)
+
+            def way(self, way):
+                tags = {tag.k: tag.v for tag in way.tags}
+                if importer._is_drivable(tags):
+                    self.ways.append(([node.ref for node in way.nodes], tags))
+
+        handler = Handler()
+        handler.apply_file(path)
+        return handler.coordinates, handler.signal_osm_nodes, handler.ways
+
+    @staticmethod
+    def _is_drivable(tags: Dict[str, str]) -> bool:
+        if tags.get('highway') not in DEFAULT_SPEEDS_KMH or tags.get('area') == 'yes':
+            return False
+        if tags.get('access') in ('no', 'private') or tags.get('motor_vehicle') in ('no', 'private'):
+            # Closed to traffic unless emergency vehicles are let through
+            return tags.get('emergency') in ('yes', 'designated')
+        return True
+
+    def way_speed(self, tags: Dict[str, str]) -> float:
+        """Planning speed of a way in km/h"""
+        speed = parse_maxspeed(tags.get('maxspeed')) or DEFAULT_SPEEDS_KMH[tags['highway']]
+        return speed * self.speed_factor
+
+    def build_graph(self, coordinates: Dict[int, Tuple[float, float]], signal_osm_nodes: Set[int],
+                    ways: List[Tuple[List[int], Dict[str, str]]]) -> RoadGraph:
+        """
+        Turn drivable ways into a directed, travel-time weighted graph
+
+        Args:
+            coordinates: OSM node id -> (latitude, longitude)
+            signal_osm_nodes: OSM node ids tagged highway=traffic_signals
+            ways: (node refs, tags) of drivable ways
+
+        Returns:
+            RoadGraph whose node identifiers are OSM node ids
+        """
+        # Nodes shared by several ways (or visited twice by one) are intersections
+        usage: Dict[int, int] = {}
+        for refs, _ in ways:
+            for ref in refs:
+                usage[ref] = usage.get(ref, 0) + 1
+
+        index: Dict[int, int] = {}
+        sources, targets, lengths, minutes = [], [], [], []
+        missing_nodes = 0
+
+        for refs, tags in ways:
+            speed = self.way_speed(tags)
+            direction = oneway_direction(tags)
+
+            # Ways clipped at the extract boundary reference nodes without coordinates
+            segments, segment = [], []
+            for ref in refs:
+                if ref in coordinates:
+                    segment.append(ref)
+                else:
+                    missing_nodes += 1
+                    if len(segment) > 1:
+                        segments.append(segment)
+                    segment = []
+            if len(segment) > 1:
+                segments.append(segment)
+
+            for segment in segments:
+                points = np.array([coordinates[ref] for ref in segment])
+                step_lengths = haversine_km(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1])
+
+                start, length = segment[0], 0.0
+                for position in range(1, len(segment)):
+                    length += float(step_lengths[position - 1])
+                    ref = segment[position]
+                    is_last = position == len(segment) - 1
+                    if not (is_last or usage[ref] > 1 or ref in signal_osm_nodes):
+                        continue  # shape point in the middle of a road
+
+                    u = index.setdefault(start, len(index))
+                    v = index.setdefault(ref, len(index))
+                    edges = [(u, v)] if direction > 0 else [(v, u)] if direction < 0 else [(u, v), (v, u)]
+                    for from_node, to_node in edges:
+                        sources.append(from_node)
+                        targets.append(to_node)
+                        lengths.append(length)
+                        minutes.append(length / speed * 60)
+
+                    start, length = ref, 0.0
+
+        if missing_nodes:
+            self.logger.warning(f"{missing_nodes} way nodes lie outside the extract and were skipped")
+
+        osm_ids = list(index.keys())
+        points = np.array([coordinates[osm_id] for osm_id in osm_ids]).reshape(-1, 2)
+
+        graph = RoadGraph.from_arrays(
+            [str(osm_id) for osm_id in osm_ids], sources, targets, minutes,
+            points[:, 0], points[:, 1], edge_lengths=lengths, weight_unit='min'
+        )
+
+        self.logger.info(f"Built road graph with {graph.node_count} nodes and {graph.edge_count} edges")
+        return graph
+
+    def snap_signals(self, graph: RoadGraph, signals: Dict[str, Tuple[float, float]],
+                     signal_osm_nodes: Set[int] = None) -> Dict[str, int]:
+        """
+        Attach each traffic signal to a graph node
+
+        A node tagged as a traffic signal in OSM within signal_snap_radius
+        metres wins; otherwise the signal goes to the nearest node. Signals
+        more than signal_max_distance metres from every node are skipped.
+
+        Args:
+            graph: Graph built by build_graph
+            signals: signal_id -> (latitude, longitude)
+            signal_osm_nodes: OSM node ids tagged highway=traffic_signals
+
+        Returns:
+            signal_id -> node index
+        """
+        tagged = np.array([graph.index[str(osm_id)] for osm_id in (signal_osm_nodes or ())
+                           if str(osm_id) in graph.index], dtype=np.int64)
+
+        signal_nodes = {}
+        if not graph.node_count:
+            return signal_nodes
+
+        for signal_id, (latitude, longitude) in signals.items():
+            distances = haversine_km(graph.latitudes, graph.longitudes, latitude, longitude)
+            node = int(np.argmin(distances))
+
+            if len(tagged):
+                nearest_tagged = tagged[np.argmin(distances[tagged])]
+                if distances[nearest_tagged] * 1000 <= self.signal_snap_radius:
+                    node = int(nearest_tagged)
+
+            if distances[node] * 1000 > self.signal_max_distance:
+                self.logger.warning(f"Signal {signal_id} is {distances[node] * 1000:.0f} m from the nearest road, "
+                                    f"not snapped")
+                continue
+            signal_nodes[signal_id] = node
+
+        return signal_nodes
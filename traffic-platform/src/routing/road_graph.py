@@ -0,0 +1,626 @@
+import os
+import json
+import heapq
+import struct
+import numpy as np
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+SEARCH_ALGORITHMS = ('dijkstra', 'astar', 'bidirectional')
+
+EARTH_RADIUS_KM = 6371
+
+# Graph file: magic, header length, JSON header, then the arrays at aligned offsets
+GRAPH_FILE_MAGIC = b'RDGRAPH1'
+GRAPH_FILE_ALIGNMENT = 64
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in km (works element-wise on arrays)"""
+    lat1, lng1, lat2, lng2 = (np.radians(value) for value in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+def _align(position: int) -> int:
+    return -(-position // GRAPH_FILE_ALIGNMENT) * GRAPH_FILE_ALIGNMENT
+
+def write_array_file(path: str, header: Dict, arrays: Dict[str, np.ndarray]):
+    """
+    Write named arrays and a JSON header in the graph file layout
+
+    The file is written next to the target and renamed into place, so
+    processes that have the old file mapped keep reading intact pages.
+    """
+    layout, position = {}, 0
+    for name, array in arrays.items():
+        position = _align(position)
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': position}
+        position += array.nbytes
+
+    encoded = json.dumps(dict(header, arrays=layout)).encode('utf-8')
+    data_start = _align(len(GRAPH_FILE_MAGIC) + 8 + len(encoded))
+
+    temporary_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(temporary_path, 'wb') as f:
+            f.write(GRAPH_FILE_MAGIC)
+            f.write(struct.pack('<Q', len(encoded)))
+            f.write(encoded)
+            for name, array in arrays.items():
+                f.write(b'\0' * (data_start + layout[name]['offset'] - f.tell()))
+                np.ascontiguousarray(array).tofile(f)
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.unlink(temporary_path)
+        raise
+
+def read_array_file(path: str, mmap: bool = True) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """
+    Open a file written by write_array_file()
+
+    Args:
+        path: File to open
+        mmap: Map the file read-only instead of reading it into memory.
+              The arrays are then views of the OS page cache, so opening
+              costs little more than parsing the header and all worker
+              processes on a machine share one copy.
+
+    Returns:
+        (header, name -> array)
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(GRAPH_FILE_MAGIC)) != GRAPH_FILE_MAGIC:
+            raise ValueError(f"{path} is not a road graph file")
+        header_length, = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    data_start = _align(len(GRAPH_FILE_MAGIC) + 8 + header_length)
+
+    if mmap:
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        data = np.fromfile(path, dtype=np.uint8)
+
+    arrays = {}
+    for name, spec in header.pop('arrays').items():
+        dtype = np.dtype(spec['dtype'])
+        start = data_start + spec['offset']
+        count = int(np.prod(spec['shape']))
+        # Plain ndarray views; the memmap subclass would slow down every slice in the searches
+        arrays[name] = np.asarray(data[start:start + count * dtype.itemsize]).view(dtype).reshape(spec['shape'])
+
+    return header, arrays
+
+class NodeIdArray(Sequence):
+    """
+    Node identifiers kept as a fixed-width byte array
+
+    A graph loaded from a file keeps its identifiers in the mapped file
+    instead of as Python strings. Lookups by identifier go through a
+    sorted copy of the array (also in the file) by binary search, so no
+    per-process dict of the whole city is built.
+    """
+
+    def __init__(self, ids: np.ndarray, sorted_ids: np.ndarray, order: np.ndarray):
+        self.ids = ids
+        self.sorted_ids = sorted_ids
+        self.order = order  # sorted_ids[i] == ids[order[i]]
+
+    @classmethod
+    def from_list(cls, node_ids: List[str]) -> 'NodeIdArray':
+        ids = np.array([node_id.encode('utf-8') for node_id in node_ids], dtype=np.bytes_)
+        order = np.argsort(ids, kind='stable').astype(np.int32)
+        return cls(ids, ids[order], order)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [node_id.decode('utf-8') for node_id in self.ids[i].tolist()]
+        return self.ids[i].decode('utf-8')
+
+    def __iter__(self):
+        return (node_id.decode('utf-8') for node_id in self.ids.tolist())
+
+    def position(self, node_id: str) -> Optional[int]:
+        """Node index of an identifier, or None"""
+        if not isinstance(node_id, str):
+            return None
+        key = node_id.encode('utf-8')
+        # Longer keys would be truncated to the array's width and could match a prefix
+        if len(key) > self.ids.dtype.itemsize:
+            return None
+        i = int(np.searchsorted(self.sorted_ids, key))
+        if i < len(self.sorted_ids) and self.sorted_ids[i] == key:
+            return int(self.order[i])
+        return None
+
+class NodeIndex(Mapping):
+    """node_id -> node index over a NodeIdArray, in place of a dict"""
+
+    def __init__(self, node_ids: NodeIdArray):
+        self.node_ids = node_ids
+
+    def __getitem__(self, node_id: str) -> int:
+        position = self.node_ids.position(node_id)
+        if position is None:
+            raise KeyError(node_id)
+        return position
+
+    def __iter__(self):
+        return iter(self.node_ids)
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+@dataclass
+class SearchResult:
+    distance: float  # total weight (km or minutes), inf when the target can't be reached
+    path: List[str]  # node identifiers from source to target
+    expanded: int  # nodes settled by the search
+
+class RoadGraph:
+    """
+    Directed road graph in compressed sparse row (CSR) form
+
+    Nodes are numbered 0..V-1 in the order of node_ids. The outgoing edges
+    of node u are targets[offsets[u]:offsets[u + 1]] with the matching
+    weights. Three flat arrays replace a dict of lists per node, so the
+    full city network stays compact and searches touch contiguous memory
+    only.
+
+    Weights are km for hand-made networks and travel minutes for imported
+    ones (weight_unit), in which case edge_lengths holds the km. Traffic
+    signals are aliases for the nodes they were snapped to, so searches
+    accept signal IDs as well as node IDs.
+    """
+
+    def __init__(self, node_ids: Union[List[str], NodeIdArray], offsets: np.ndarray, targets: np.ndarray,
+                 weights: np.ndarray, latitudes: np.ndarray = None, longitudes: np.ndarray = None,
+                 edge_lengths: np.ndarray = None, weight_unit: str = 'km',
+                 signal_nodes: Dict[str, int] = None):
+        if isinstance(node_ids, NodeIdArray):
+            self.node_ids = node_ids
+            self.index: Mapping = NodeIndex(node_ids)
+        else:
+            self.node_ids = list(node_ids)
+            self.index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float64)
+
+        # Node coordinates in degrees (NaN where unknown)
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+
+        # Edge lengths in km when the weights are something else (e.g. minutes)
+        self.weight_unit = weight_unit
+        self.edge_lengths = edge_lengths
+
+        # signal_id -> node index
+        self.signal_nodes: Dict[str, int] = dict(signal_nodes or {})
+
+        if len(self.offsets) != len(self.node_ids) + 1 or len(self.targets) != len(self.weights):
+            raise ValueError("Inconsistent CSR arrays")
+        if edge_lengths is not None and len(edge_lengths) != len(self.weights):
+            raise ValueError("Edge lengths don't match the edges")
+
+        # Built on first use: incoming edges for backward searches, A* speed bound
+        self._reverse = None
+        self._max_speed = None
+
+    @classmethod
+    def from_edges(cls, node_ids: Iterable[str], edges: Iterable[Tuple[str, str, float]],
+                   coordinates: Dict[str, Tuple[float, float]] = None) -> 'RoadGraph':
+        """
+        Build a graph from (from_node, to_node, weight) edges
+
+        Args:
+            node_ids: All node identifiers; endpoints of edges are added if missing
+            edges: Directed edges with weights in km
+            coordinates: Optional node_id -> (latitude, longitude)
+
+        Returns:
+            RoadGraph
+        """
+        node_ids = list(node_ids)
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
+
+        sources, targets, weights = [], [], []
+        for from_node, to_node, weight in edges:
+            for node_id in (from_node, to_node):
+                if node_id not in index:
+                    index[node_id] = len(node_ids)
+                    node_ids.append(node_id)
+            sources.append(index[from_node])
+            targets.append(index[to_node])
+            weights.append(weight)
+
+        latitudes = longitudes = None
+        if coordinates:
+            latitudes = np.array([coordinates.get(node_id, (np.nan, np.nan))[0] for node_id in node_ids])
+            longitudes = np.array([coordinates.get(node_id, (np.nan, np.nan))[1] for node_id in node_ids])
+
+        return cls.from_arrays(node_ids, sources, targets, weights, latitudes, longitudes)
+
+    @classmethod
+    def from_arrays(cls, node_ids: List[str], sources, targets, weights,
+                    latitudes: np.ndarray = None, longitudes: np.ndarray = None,
+                    edge_lengths=None, weight_unit: str = 'km') -> 'RoadGraph':
+        """
+        Build a graph from parallel edge arrays of node indices and weights
+
+        Args:
+            node_ids: Node identifiers; edge endpoints index into this list
+            sources: Edge start node indices
+            targets: Edge end node indices
+            weights: Edge weights
+            latitudes: Optional node latitudes in degrees
+            longitudes: Optional node longitudes in degrees
+            edge_lengths: Optional edge lengths in km when weights aren't km
+            weight_unit: Unit of the weights ('km' or 'min')
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        # A stable sort keeps each node's edges in input order
+        order = np.argsort(sources, kind='stable')
+
+        offsets = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(node_ids)), out=offsets[1:])
+
+        if edge_lengths is not None:
+            edge_lengths = np.asarray(edge_lengths, dtype=np.float64)[order]
+
+        return cls(
+            node_ids,
+            offsets,
+            np.asarray(targets, dtype=np.int32)[order],
+            np.asarray(weights, dtype=np.float64)[order],
+            latitudes,
+            longitudes,
+            edge_lengths,
+            weight_unit
+        )
+
+    @classmethod
+    def from_adjacency(cls, network: Dict[str, Dict], locations: Dict = None) -> 'RoadGraph':
+        """
+        Build a graph from the {'node': {'connections': [...], 'distances': [...]}} format
+
+        Args:
+            network: Adjacency dict as returned by RouteOptimizer._initialize_road_network
+            locations: Optional node_id -> Location
+        """
+        edges = [
+            (node_id, neighbor, distance)
+            for node_id, node in network.items()
+            for neighbor, distance in zip(node['connections'], node['distances'])
+        ]
+        coordinates = None
+        if locations:
+            coordinates = {node_id: (location.latitude, location.longitude)
+                           for node_id, location in locations.items()}
+
+        graph = cls.from_edges(network.keys(), edges, coordinates)
+        # Every node of a hand-made network is a signal
+        graph.signal_nodes = dict(graph.index)
+        return graph
+
+    def save(self, path: str):
+        """
+        Write the graph as a flat binary file for load() to memory-map
+
+        Besides the CSR arrays, the file holds what every process would
+        otherwise derive at startup: the incoming-edge arrays, the A* speed
+        bound and a sorted table of node identifiers.
+        """
+        node_ids = self.node_ids if isinstance(self.node_ids, NodeIdArray) else NodeIdArray.from_list(self.node_ids)
+        reverse_offsets, reverse_sources, reverse_weights = self._reverse_arrays()
+
+        arrays = {
+            'offsets': self.offsets,
+            'targets': self.targets,
+            'weights': self.weights,
+            'reverse_offsets': reverse_offsets,
+            'reverse_sources': reverse_sources,
+            'reverse_weights': reverse_weights,
+            'node_ids': node_ids.ids,
+            'sorted_node_ids': node_ids.sorted_ids,
+            'node_order': node_ids.order
+        }
+        if self.latitudes is not None:
+            arrays['latitudes'] = np.asarray(self.latitudes, dtype=np.float64)
+            arrays['longitudes'] = np.asarray(self.longitudes, dtype=np.float64)
+        if self.edge_lengths is not None:
+            arrays['edge_lengths'] = np.asarray(self.edge_lengths, dtype=np.float64)
+
+        header = {
+            'kind': 'road_graph',
+            'weight_unit': self.weight_unit,
+            'max_speed': self.max_speed,
+            'signal_nodes': {signal_id: int(node) for signal_id, node in self.signal_nodes.items()}
+        }
+        write_array_file(path, header, arrays)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'RoadGraph':
+        """
+        Open a graph written by save()
+
+        Args:
+            path: Graph file
+            mmap: Map the file (shared between processes) instead of reading it
+        """
+        header, arrays = read_array_file(path, mmap)
+        if header.get('kind') != 'road_graph':
+            raise ValueError(f"{path} is not a road graph file")
+
+        graph = cls(
+            NodeIdArray(arrays['node_ids'], arrays['sorted_node_ids'], arrays['node_order']),
+            arrays['offsets'],
+            arrays['targets'],
+            arrays['weights'],
+            arrays.get('latitudes'),
+            arrays.get('longitudes'),
+            arrays.get('edge_lengths'),
+            header['weight_unit'],
+            header['signal_nodes']
+        )
+        graph._reverse = (arrays['reverse_offsets'], arrays['reverse_sources'], arrays['reverse_weights'])
+        graph._max_speed = header['max_speed']
+        return graph
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def resolve(self, node_or_signal_id: str) -> int:
+        """Node index of a node identifier or of a signal snapped onto the graph"""
+        node = self.signal_nodes.get(node_or_signal_id)
+        return node if node is not None else self.index[node_or_signal_id]
+
+    def node_signals(self) -> Dict[int, str]:
+        """node index -> signal_id for the nodes carrying a signal"""
+        return {node: signal_id for signal_id, node in self.signal_nodes.items()}
+
+    def nearest_node(self, latitude: float, longitude: float) -> Optional[str]:
+        """Node closest to a point, or None without node coordinates"""
+        if self.latitudes is None or not self.node_count:
+            return None
+        distances = haversine_km(self.latitudes, self.longitudes, latitude, longitude)
+        if np.all(np.isnan(distances)):
+            return None
+        return self.node_ids[int(np.nanargmin(distances))]
+
+    def path_length(self, path: List[str]) -> float:
+        """Length in km of a node path (lightest edge between consecutive nodes)"""
+        lengths = self.weights if self.edge_lengths is None else self.edge_lengths
+        total = 0.0
+        for from_node, to_node in zip(path, path[1:]):
+            u, v = self.index[from_node], self.index[to_node]
+            start, end = self.offsets[u], self.offsets[u + 1]
+            edges = np.flatnonzero(self.targets[start:end] == v)
+            if not len(edges):
+                raise ValueError(f"No edge from {from_node} to {to_node}")
+            total += float(lengths[start + edges[np.argmin(self.weights[start + edges])]])
+        return total
+
+    def neighbors(self, node_id: str) -> List[Tuple[str, float]]:
+        """Outgoing (neighbor, weight) pairs of a node"""
+        u = self.resolve(node_id)
+        start, end = self.offsets[u], self.offsets[u + 1]
+        return [(self.node_ids[v], w) for v, w in zip(self.targets[start:end].tolist(),
+                                                       self.weights[start:end].tolist())]
+
+    def edge_weight(self, from_node: str, to_node: str) -> Optional[float]:
+        """Weight of the lightest edge between two nodes, or None"""
+        weights = [w for neighbor, w in self.neighbors(from_node) if neighbor == to_node]
+        return min(weights) if weights else None
+
+    def coordinates(self, node_id: str) -> Optional[Tuple[float, float]]:
+        """(latitude, longitude) of a node, or None when unknown"""
+        if self.latitudes is None:
+            return None
+        u = self.resolve(node_id)
+        latitude, longitude = float(self.latitudes[u]), float(self.longitudes[u])
+        if np.isnan(latitude) or np.isnan(longitude):
+            return None
+        return latitude, longitude
+
+    @property
+    def max_speed(self) -> Optional[float]:
+        """
+        Largest straight-line distance covered per unit of edge weight
+
+        Dividing the haversine distance to the target by this speed never
+        overestimates the remaining weight, which keeps A* exact whatever
+        the weights are (km, minutes, or lengths shorter than the straight
+        line in a hand-made network). Infinite when an edge of weight 0 spans
+        a positive distance, as then no speed bounds the remaining weight.
+        None without node coordinates.
+        """
+        if self._max_speed is None and self.latitudes is not None and self.edge_count:
+            sources = np.repeat(np.arange(self.node_count), np.diff(self.offsets))
+            straight_line = haversine_km(self.latitudes[sources], self.longitudes[sources],
+                                         self.latitudes[self.targets], self.longitudes[self.targets])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                speeds = np.where(self.weights > 0, straight_line / self.weights, np.nan)
+            if np.any((self.weights <= 0) & (straight_line > 0)):
+                self._max_speed = float('inf')
+            elif np.any(speeds > 0):
+                self._max_speed = float(np.nanmax(speeds))
+        return self._max_speed
+
+    def shortest_path(self, source: str, target: str, algorithm: str = 'dijkstra',
+                      heuristic: Callable[[int], float] = None) -> Tuple[float, List[str]]:
+        """
+        Shortest path between two nodes
+
+        Args:
+            source: Start node or signal identifier
+            target: Destination node or signal identifier
+            algorithm: 'dijkstra', 'astar' or 'bidirectional'
+            heuristic: For A*, lower bound on the weight from a node index to the target
+
+        Returns:
+            (total weight, node identifiers from source to target), or
+            (inf, []) when the target can't be reached
+        """
+        result = self.search(source, target, algorithm, heuristic)
+        return result.distance, result.path
+
+    def search(self, source: str, target: str, algorithm: str = 'dijkstra',
+               heuristic: Callable[[int], float] = None) -> SearchResult:
+        """Run one of SEARCH_ALGORITHMS and report the nodes it settled"""
+        s, t = self.resolve(source), self.resolve(target)
+
+        if algorithm == 'dijkstra':
+            distance, path, expanded = self._dijkstra(s, t)
+        elif algorithm == 'astar':
+            distance, path, expanded = self._astar(s, t, heuristic or (lambda u: 0.0))
+        elif algorithm == 'bidirectional':
+            distance, path, expanded = self._bidirectional(s, t)
+        else:
+            raise ValueError(f"Unknown search algorithm '{algorithm}', expected one of {SEARCH_ALGORITHMS}")
+
+        return SearchResult(distance, [self.node_ids[u] for u in path], expanded)
+
+    def _dijkstra(self, s: int, t: int) -> Tuple[float, List[int], int]:
+        """Dijkstra's algorithm with a binary heap, stopping once t is settled"""
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+
+        distances = {s: 0.0}
+        previous: Dict[int, int] = {}
+        settled = set()
+        heap = [(0.0, s)]
+
+        while heap:
+            distance, u = heapq.heappop(heap)
+            if u in settled:
+                continue  # stale entry left behind by a later improvement
+            if u == t:
+                return distance, self._unwind(previous, t), len(settled) + 1
+            settled.add(u)
+
+            start, end = offsets[u], offsets[u + 1]
+            for v, weight in zip(targets[start:end].tolist(), weights[start:end].tolist()):
+                candidate = distance + weight
+                if candidate < distances.get(v, float('inf')):
+                    distances[v] = candidate
+                    previous[v] = u
+                    heapq.heappush(heap, (candidate, v))
+
+        return float('inf'), [], len(settled)
+
+    def _astar(self, s: int, t: int, heuristic: Callable[[int], float]) -> Tuple[float, List[int], int]:
+        """
+        A* search: the heap is ordered by distance so far plus the heuristic
+
+        A node is expanded again if it is reached more cheaply later, so the
+        result stays exact with heuristics that are admissible but not
+        consistent (e.g. nodes without coordinates estimating 0).
+        """
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+
+        distances = {s: 0.0}
+        estimates: Dict[int, float] = {}
+        previous: Dict[int, int] = {}
+        heap = [(heuristic(s), 0.0, s)]
+        expanded = 0
+
+        while heap:
+            _, distance, u = heapq.heappop(heap)
+            if distance > distances[u]:
+                continue
+            expanded += 1
+            if u == t:
+                return distance, self._unwind(previous, t), expanded
+
+            start, end = offsets[u], offsets[u + 1]
+            for v, weight in zip(targets[start:end].tolist(), weights[start:end].tolist()):
+                candidate = distance + weight
+                if candidate < distances.get(v, float('inf')):
+                    distances[v] = candidate
+                    previous[v] = u
+                    estimate = estimates.get(v)
+                    if estimate is None:
+                        estimate = estimates[v] = heuristic(v)
+                    heapq.heappush(heap, (candidate + estimate, candidate, v))
+
+        return float('inf'), [], expanded
+
+    def _bidirectional(self, s: int, t: int) -> Tuple[float, List[int], int]:
+        """
+        Bidirectional Dijkstra: a forward search from s and a backward search
+        over incoming edges from t, alternating by the smaller queue head
+
+        The searches stop once the two queue heads add up to at least the
+        best s-t distance seen through a node reached by both.
+        """
+        if s == t:
+            return 0.0, [s], 1
+
+        reverse_offsets, reverse_sources, reverse_weights = self._reverse_arrays()
+        sides = [
+            (self.offsets, self.targets, self.weights, {s: 0.0}, {}, set(), [(0.0, s)]),
+            (reverse_offsets, reverse_sources, reverse_weights, {t: 0.0}, {}, set(), [(0.0, t)])
+        ]
+        best, meeting = float('inf'), None
+        expanded = 0
+
+        while sides[0][6] and sides[1][6]:
+            if sides[0][6][0][0] + sides[1][6][0][0] >= best:
+                break
+
+            side = 0 if sides[0][6][0][0] <= sides[1][6][0][0] else 1
+            offsets, neighbors, weights, distances, previous, settled, heap = sides[side]
+            other_distances = sides[1 - side][3]
+
+            distance, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            expanded += 1
+
+            start, end = offsets[u], offsets[u + 1]
+            for v, weight in zip(neighbors[start:end].tolist(), weights[start:end].tolist()):
+                candidate = distance + weight
+                if candidate < distances.get(v, float('inf')):
+                    distances[v] = candidate
+                    previous[v] = u
+                    heapq.heappush(heap, (candidate, v))
+
+                if v in other_distances and candidate + other_distances[v] < best:
+                    best, meeting = candidate + other_distances[v], v
+
+        if meeting is None:
+            return float('inf'), [], expanded
+
+        forward_path = self._unwind(sides[0][4], meeting)
+        backward_path = self._unwind(sides[1][4], meeting)
+        return best, forward_path + backward_path[::-1][1:], expanded
+
+    def _reverse_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """CSR arrays of incoming edges: offsets, source node indices, weights"""
+        if self._reverse is None:
+            sources = np.repeat(np.arange(self.node_count, dtype=np.int32), np.diff(self.offsets))
+            order = np.argsort(self.targets, kind='stable')
+
+            offsets = np.zeros(self.node_count + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.targets, minlength=self.node_count), out=offsets[1:])
+            self._reverse = (offsets, sources[order], self.weights[order])
+
+        return self._reverse
+
+    @staticmethod
+    def _unwind(previous: Dict[int, int], t: int) -> List[int]:
+        path = [t]
+        while path[-1] in previous:
+            path.append(previous[path[-1]])
+        path.reverse()
+        return path
@@ -1,16 +1,23 @@
 
 import os
+import time
 import logging
 import math
 import heapq
 import requests
 from typing import Dict, List, Tuple, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 from dataclasses import dataclass
 from geopy.distance import geodesic
 import networkx as nx
 
+from routing.road_graph import RoadGraph, SearchResult, SEARCH_ALGORITHMS
+from routing.contraction_hierarchies import ContractionHierarchy
+
+# Graph searches plus queries on the Contraction Hierarchy ('ch')
+ROUTING_ALGORITHMS = SEARCH_ALGORITHMS + ('ch',)
+
 @dataclass
 class Location:
     latitude: float
@@ -78,6 +85,23 @@ class RouteOptimizer:
         # Road network (simplified graph representation)
         self.road_network = self._initialize_road_network()
         
+        # Compact array form of the road network used for route searches: an
+        # imported city graph (scripts/import_osm.py) or the signal network above
+        self.road_graph = self._load_road_graph(os.getenv('ROAD_GRAPH_PATH'))
+        
+        # Search used when a call doesn't choose one ('dijkstra', 'astar', 'bidirectional' or 'ch')
+        self.routing_algorithm = os.getenv('ROUTING_ALGORITHM', 'astar')
+        if self.routing_algorithm not in ROUTING_ALGORITHMS:
+            self.logger.warning(f"Unknown ROUTING_ALGORITHM '{self.routing_algorithm}', using dijkstra")
+            self.routing_algorithm = 'dijkstra'
+        
+        # Contraction Hierarchy of road_graph, preprocessed by scripts/import_osm.py --contract
+        # or built on first 'ch' query
+        self.ch_path = os.getenv('ROUTING_CH_PATH')
+        self.contraction_hierarchy = None
+        if self.routing_algorithm == 'ch':
+            self.get_contraction_hierarchy()
+        
         # Real-time traffic data integration
         self.traffic_api_enabled = os.getenv('TRAFFIC_API_ENABLED', 'false').lower() == 'true'
         self.traffic_update_interval = int(os.getenv('TRAFFIC_UPDATE_INTERVAL', 300))  # 5 minutes
@@ -210,6 +234,19 @@ class RouteOptimizer:
         
         return network
     
+    def _load_road_graph(self, graph_path: str = None) -> RoadGraph:
+        """Load an imported road graph, falling back to the built-in signal network"""
+        if graph_path:
+            try:
+                graph = RoadGraph.load(graph_path)
+                self.logger.info(f"Loaded road graph with {graph.node_count} nodes, {graph.edge_count} edges "
+                                 f"and {len(graph.signal_nodes)} signals from {graph_path}")
+                return graph
+            except Exception as e:
+                self.logger.error(f"Failed to load road graph {graph_path}, using built-in network: {e}")
+        
+        return RoadGraph.from_adjacency(self.road_network, self.traffic_signals)
+    
     def calculate_emergency_route(self, current_location: Dict = None, 
                                 vehicle_type: str = "ambulance") -> Dict:
         """
@@ -275,72 +312,114 @@ class RouteOptimizer:
             self.logger.error(f"Error calculating emergency route: {e}")
             return {'error': str(e)}
     
-    def _calculate_route_dijkstra(self, start: Location, end: Location) -> Optional[Route]:
+    def find_path(self, start_node: str, end_node: str, algorithm: str = None) -> SearchResult:
         """
-        Calculate shortest route using Dijkstra's algorithm
+        Shortest path between two road graph nodes
+        
+        Args:
+            start_node: Start node (signal) identifier
+            end_node: Destination node identifier
+            algorithm: One of ROUTING_ALGORITHMS (defaults to ROUTING_ALGORITHM)
+            
+        Returns:
+            SearchResult with the distance, node path and nodes expanded
+        """
+        algorithm = algorithm or self.routing_algorithm
+        
+        if algorithm == 'ch':
+            return self.get_contraction_hierarchy().search(start_node, end_node)
+        
+        heuristic = None
+        if algorithm == 'astar':
+            heuristic = self._astar_heuristic(end_node)
+        
+        return self.road_graph.search(start_node, end_node, algorithm, heuristic)
+    
+    def get_contraction_hierarchy(self) -> ContractionHierarchy:
+        """Contraction Hierarchy of the current road graph, loaded from ROUTING_CH_PATH or built"""
+        hierarchy = self.contraction_hierarchy
+        if hierarchy is not None and hierarchy.graph is self.road_graph:
+            return hierarchy
+        
+        if self.ch_path:
+            try:
+                hierarchy = ContractionHierarchy.load(self.ch_path, self.road_graph)
+                self.logger.info(f"Loaded contraction hierarchy from {self.ch_path}")
+            except Exception as e:
+                self.logger.error(f"Failed to load contraction hierarchy {self.ch_path}, rebuilding: {e}")
+                hierarchy = None
+        
+        if hierarchy is None:
+            start = time.perf_counter()
+            hierarchy = ContractionHierarchy.build(self.road_graph)
+            self.logger.info(f"Built contraction hierarchy for {self.road_graph.node_count} nodes in "
+                             f"{time.perf_counter() - start:.1f} s")
+        
+        self.contraction_hierarchy = hierarchy
+        return hierarchy
+    
+    def _astar_heuristic(self, end_node: str):
+        """Straight-line distance to the destination over the graph's top speed, per node index"""
+        graph = self.road_graph
+        target = graph.coordinates(end_node)
+        max_speed = graph.max_speed
+        # No admissible bound when zero-cost edges cover distance: search like Dijkstra
+        if target is None or not max_speed or math.isinf(max_speed):
+            return None
+        
+        target_location = Location(*target)
+        latitudes, longitudes = graph.latitudes, graph.longitudes
+        
+        def heuristic(node: int) -> float:
+            latitude, longitude = latitudes[node], longitudes[node]
+            if math.isnan(latitude) or math.isnan(longitude):
+                return 0.0
+            return self._calculate_distance(Location(latitude, longitude), target_location) / max_speed
+        
+        return heuristic
+    
+    def _calculate_route_dijkstra(self, start: Location, end: Location, algorithm: str = None) -> Optional[Route]:
+        """
+        Calculate shortest route using Dijkstra's algorithm (or A*, bidirectional search or
+        the Contraction Hierarchy)
         """
         try:
-            # Find nearest traffic signals to start and end points
-            start_signal = self._find_nearest_signal(start)
-            end_signal = self._find_nearest_signal(end)
+            # Find nearest road graph nodes to start and end points
+            start_node = self._find_nearest_node(start)
+            end_node = self._find_nearest_node(end)
             
-            if not start_signal or not end_signal:
+            if not start_node or not end_node:
                 return None
             
-            # Run Dijkstra's algorithm
-            distances = {signal: float('infinity') for signal in self.road_network}
-            distances[start_signal] = 0
-            previous = {}
-            unvisited = list(self.road_network.keys())
+            # Run the search on the compiled road graph
+            result = self.find_path(start_node, end_node, algorithm)
+            path = result.path
+            if not path:
+                self.logger.warning(f"No road connection from {start_node} to {end_node}")
+                return None
             
-            while unvisited:
-                current = min(unvisited, key=lambda x: distances[x])
-                unvisited.remove(current)
-                
-                if current == end_signal:
-                    break
-                
-                if distances[current] == float('infinity'):
-                    break
-                
-                # Check neighbors
-                if current in self.road_network:
-                    connections = self.road_network[current]['connections']
-                    connection_distances = self.road_network[current]['distances']
-                    
-                    for i, neighbor in enumerate(connections):
-                        if neighbor in unvisited:
-                            alt_distance = distances[current] + connection_distances[i]
-                            if alt_distance < distances[neighbor]:
-                                distances[neighbor] = alt_distance
-                                previous[neighbor] = current
-            
-            # Reconstruct path
-            path = []
-            current = end_signal
-            while current in previous:
-                path.append(current)
-                current = previous[current]
-            path.append(start_signal)
-            path.reverse()
-            
-            # Convert to waypoints
-            waypoints = [self.traffic_signals[signal] for signal in path]
+            # Convert to waypoints and the signals passed on the way
+            node_signals = self.road_graph.node_signals()
+            waypoints = [self._node_location(node, node_signals) for node in path]
+            path_signals = [node_signals[self.road_graph.index[node]] for node in path
+                            if self.road_graph.index[node] in node_signals]
             
             # Calculate total distance and duration
-            total_distance = distances[end_signal]
-            # Add distance from start to first signal and last signal to end
-            total_distance += self._calculate_distance(start, self.traffic_signals[start_signal])
-            total_distance += self._calculate_distance(self.traffic_signals[end_signal], end)
-            
-            # Estimate duration (assuming average speed of 40 km/h for emergency vehicles)
-            duration = (total_distance / 40) * 60  # minutes
+            road_distance = self.road_graph.path_length(path)
+            # Add distance from start to first node and last node to end
+            access_distance = (self._calculate_distance(start, waypoints[0]) +
+                               self._calculate_distance(waypoints[-1], end))
+            total_distance = road_distance + access_distance
+            
+            # Estimate duration (assuming average speed of 40 km/h for emergency vehicles
+            # where the graph has no travel times)
+            if self.road_graph.weight_unit == 'min':
+                duration = result.distance + (access_distance / 40) * 60  # minutes
+            else:
+                duration = (total_distance / 40) * 60  # minutes
             
             # Estimate arrival time
-            estimated_arrival = datetime.utcnow()
-            estimated_arrival = estimated_arrival.replace(
-                minute=estimated_arrival.minute + int(duration)
-            )
+            estimated_arrival = datetime.utcnow() + timedelta(minutes=duration)
             
             return Route(
                 start=start,
@@ -348,7 +427,7 @@ class RouteOptimizer:
                 distance=total_distance,
                 duration=duration,
                 waypoints=waypoints,
-                traffic_signals=path,
+                traffic_signals=path_signals,
                 estimated_arrival=estimated_arrival
             )
             
@@ -356,6 +435,23 @@ class RouteOptimizer:
             self.logger.error(f"Error in Dijkstra calculation: {e}")
             return None
     
+    def _find_nearest_node(self, location: Location) -> Optional[str]:
+        """Find the road graph node nearest to a location"""
+        node = self.road_graph.nearest_node(location.latitude, location.longitude)
+        if node is None:
+            # Graph without coordinates: every node is a signal
+            node = self._find_nearest_signal(location)
+        return node
+    
+    def _node_location(self, node_id: str, node_signals: Dict[int, str]) -> Location:
+        """Location of a road graph node, named after its signal if it has one"""
+        signal_id = node_signals.get(self.road_graph.index[node_id])
+        if signal_id in self.traffic_signals:
+            return self.traffic_signals[signal_id]
+        
+        latitude, longitude = self.road_graph.coordinates(node_id)
+        return Location(latitude, longitude, signal_id or "")
+    
     def _find_nearest_signal(self, location: Location) -> Optional[str]:
         """Find the nearest traffic signal to a given location"""
         min_distance = float('infinity')
@@ -0,0 +1,217 @@
+"""
+Latency metrics for the traffic management system
+Constant-memory rolling histograms that can stay enabled in production
+"""
+
+import os
+import time
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Dict, List
+
+def _bucket_bounds(smallest_ms: float = 0.01, largest_ms: float = 60000.0,
+                   buckets_per_doubling: int = 4) -> List[float]:
+    """Upper bounds of log-spaced latency buckets (about 19% wide each)"""
+    bounds = []
+    bound = smallest_ms
+    growth = 2 ** (1.0 / buckets_per_doubling)
+    while bound < largest_ms:
+        bounds.append(bound)
+        bound *= growth
+    bounds.append(largest_ms)
+    return bounds
+
+BUCKET_BOUNDS_MS = _bucket_bounds()
+
+class RollingHistogram:
+    """
+    Latency histogram over a sliding time window
+
+    The window is split into a fixed ring of slices; each slice keeps bucket
+    counts for the samples recorded during its time span and is reset when
+    the ring comes round to it again. Memory is fixed no matter how many
+    samples are recorded, and percentiles are accurate to the bucket width.
+    """
+
+    def __init__(self, window_seconds: float = 300.0, slices: int = 5):
+        self.slice_seconds = window_seconds / slices
+        self.slices = slices
+
+        bucket_count = len(BUCKET_BOUNDS_MS) + 1  # last bucket catches everything larger
+        self.epochs = [-1] * slices
+        self.counts = [[0] * bucket_count for _ in range(slices)]
+        self.sums = [0.0] * slices
+        self.maxima = [0.0] * slices
+
+        # Totals since start (or the last reset)
+        self.total_count = 0
+        self.total_sum = 0.0
+
+        self.lock = threading.Lock()
+
+    def record(self, value_ms: float):
+        """Add one latency sample in milliseconds"""
+        bucket = bisect.bisect_left(BUCKET_BOUNDS_MS, value_ms)
+        epoch = int(time.monotonic() // self.slice_seconds)
+        slot = epoch % self.slices
+
+        with self.lock:
+            if self.epochs[slot] != epoch:
+                # This slot last held a slice that has left the window
+                self.epochs[slot] = epoch
+                self.counts[slot] = [0] * len(self.counts[slot])
+                self.sums[slot] = 0.0
+                self.maxima[slot] = 0.0
+
+            self.counts[slot][bucket] += 1
+            self.sums[slot] += value_ms
+            if value_ms > self.maxima[slot]:
+                self.maxima[slot] = value_ms
+
+            self.total_count += 1
+            self.total_sum += value_ms
+
+    def reset(self):
+        with self.lock:
+            self.epochs = [-1] * self.slices
+            self.total_count = 0
+            self.total_sum = 0.0
+
+    def get_stats(self) -> Dict:
+        """Count, mean, p50/p95/p99 and max over the window, plus lifetime count and mean"""
+        oldest_epoch = int(time.monotonic() // self.slice_seconds) - self.slices + 1
+
+        with self.lock:
+            live = [slot for slot in range(self.slices) if self.epochs[slot] >= oldest_epoch]
+            counts = [sum(bucket) for bucket in zip(*(self.counts[slot] for slot in live))] if live else []
+            window_sum = sum(self.sums[slot] for slot in live)
+            window_max = max((self.maxima[slot] for slot in live), default=0.0)
+            total_count = self.total_count
+            total_sum = self.total_sum
+
+        window_count = sum(counts)
+        stats = {
+            'count': window_count,
+            'mean_ms': window_sum / window_count if window_count else 0.0,
+            'p50_ms': self._percentile(counts, window_count, 0.50),
+            'p95_ms': self._percentile(counts, window_count, 0.95),
+            'p99_ms': self._percentile(counts, window_count, 0.99),
+            'max_ms': window_max,
+            'total_count': total_count,
+            'total_mean_ms': total_sum / total_count if total_count else 0.0
+        }
+        return {key: round(value, 3) if isinstance(value, float) else value for key, value in stats.items()}
+
+    @staticmethod
+    def _percentile(counts: List[int], total: int, quantile: float) -> float:
+        """Geometric middle of the bucket holding the quantile"""
+        if not total:
+            return 0.0
+
+        rank = quantile * total
+        cumulative = 0
+        for bucket, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= rank and count:
+                if bucket == 0:
+                    return BUCKET_BOUNDS_MS[0]
+                if bucket >= len(BUCKET_BOUNDS_MS):
+                    return BUCKET_BOUNDS_MS[-1]
+                return (BUCKET_BOUNDS_MS[bucket - 1] * BUCKET_BOUNDS_MS[bucket]) ** 0.5
+
+        return BUCKET_BOUNDS_MS[-1]
+
+class StageMetrics:
+    """Rolling latency histograms for the named stages of a pipeline"""
+
+    def __init__(self, enabled: bool = None, window_seconds: float = None):
+        if enabled is None:
+            enabled = os.getenv('STAGE_METRICS_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+        self.window_seconds = window_seconds or float(os.getenv('STAGE_METRICS_WINDOW', 300))
+
+        self.histograms: Dict[str, RollingHistogram] = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage: str, value_ms: float):
+        """Add one latency sample for a stage"""
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(stage, RollingHistogram(self.window_seconds))
+        histogram.record(value_ms)
+
+    @contextmanager
+    def measure(self, stage: str):
+        """Time the enclosed block as one sample of a stage"""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000)
+
+    def reset(self):
+        """Forget all samples, e.g. after warm-up runs"""
+        with self.lock:
+            for histogram in self.histograms.values():
+                histogram.reset()
+
+    def get_stats(self) -> Dict:
+        """Stats of every stage that has recorded samples"""
+        with self.lock:
+            histograms = dict(self.histograms)
+        return {stage: histogram.get_stats() for stage, histogram in sorted(histograms.items())}
+
+    def to_prometheus(self, metric_name: str, labels: Dict[str, str] = None, header: bool = True) -> str:
+        """
+        Stage stats in the Prometheus text exposition format (as a summary)
+
+        Args:
+            metric_name: Base metric name, e.g. 'detection_stage_latency_ms'
+            labels: Extra labels added to every sample
+            header: Include the TYPE line (once per metric when concatenating processes)
+
+        Returns:
+            Exposition text
+        """
+        extra = ''.join(f',{key}="{value}"' for key, value in (labels or {}).items())
+        lines = [f"# TYPE {metric_name} summary"] if header else []
+
+        for stage, stats in self.get_stats().items():
+            for quantile in ('0.5', '0.95', '0.99'):
+                key = f"p{int(float(quantile) * 100)}_ms"
+                lines.append(f'{metric_name}{{stage="{stage}",quantile="{quantile}"{extra}}} {stats[key]}')
+            lines.append(f'{metric_name}_count{{stage="{stage}"{extra}}} {stats["total_count"]}')
+            lines.append(f'{metric_name}_sum{{stage="{stage}"{extra}}} '
+                         f'{round(stats["total_mean_ms"] * stats["total_count"], 3)}')
+
+        return '\n'.join(lines) + '\n'
+
+def timed_stage(stage: str):
+    """
+    Decorator that records a method's latency in its object's stage_metrics
+
+    Args:
+        stage: Stage name the samples are recorded under
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            metrics = self.stage_metrics
+            if not metrics.enabled:
+                return func(self, *args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                metrics.record(stage, (time.perf_counter() - start) * 1000)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,169 @@
+"""
+Startup helpers for the traffic management service
+Lazily built components, background warm-up and startup phase timing
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+class StartupTimer:
+    """Records how long each startup phase takes and logs it"""
+
+    def __init__(self, logger: logging.Logger = None):
+        self.logger = logger or logging.getLogger(__name__)
+        self.started_at = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def phase(self, name: str, func: Callable, *args, **kwargs):
+        """
+        Run one startup phase and record its duration
+
+        Args:
+            name: Phase name used in the logs and readiness report
+            func: Callable doing the work
+
+        Returns:
+            Whatever func returns
+        """
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            with self.lock:
+                self.phases[name] = duration_ms
+            self.logger.info(f"Startup phase '{name}' took {duration_ms:.0f} ms")
+
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the timer was created"""
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def get_phases(self) -> Dict[str, float]:
+        """Phase durations in milliseconds, in the order they finished"""
+        with self.lock:
+            return {name: round(duration, 1) for name, duration in self.phases.items()}
+
+class LazyComponent:
+    """
+    Proxy that builds a component on first use
+
+    Attribute access is forwarded to the real object, so call sites keep
+    using the component as before. The first access (or a warm-up thread
+    calling get()) runs the factory; concurrent callers wait for it instead
+    of building a second instance. A failed build is retried on next use.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], timer: StartupTimer = None):
+        # Bypass __setattr__ forwarding for the proxy's own state
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_timer', timer)
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_error', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def get(self):
+        """Return the component, building it if needed"""
+        instance = self._instance
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if self._instance is None:
+                try:
+                    if self._timer is not None:
+                        instance = self._timer.phase(f"init {self._name}", self._factory)
+                    else:
+                        instance = self._factory()
+                except Exception as e:
+                    object.__setattr__(self, '_error', str(e))
+                    raise
+                object.__setattr__(self, '_instance', instance)
+                object.__setattr__(self, '_error', None)
+            return self._instance
+
+    @property
+    def is_ready(self) -> bool:
+        return self._instance is not None
+
+    def get_state(self) -> Dict:
+        """Readiness of the component for the readiness endpoint"""
+        if self._instance is not None:
+            return {'status': 'ready'}
+        if self._error is not None:
+            return {'status': 'failed', 'error': self._error}
+        return {'status': 'initializing' if self._lock.locked() else 'pending'}
+
+    def __getattr__(self, attribute):
+        return getattr(self.get(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self.get(), attribute, value)
+
+class WarmupThread:
+    """
+    Builds lazy components in the background and runs warm-up steps
+
+    The web server starts serving liveness checks right away while models
+    load; the service reports ready once every component is built and every
+    warm-up step has run.
+    """
+
+    def __init__(self, components: List[LazyComponent], timer: StartupTimer,
+                 warmup_steps: List = None):
+        self.logger = logging.getLogger(__name__)
+        self.components = components
+        self.timer = timer
+
+        # (name, callable) pairs run after all components are built
+        self.warmup_steps = warmup_steps or []
+
+        self.thread: Optional[threading.Thread] = None
+        self.done = threading.Event()
+        self.errors: Dict[str, str] = {}
+        self.ready_after_ms: Optional[float] = None
+
+    def start(self):
+        """Start warming up in a daemon thread"""
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self.run, name="startup-warmup", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """Build every component, then run the warm-up steps"""
+        for component in self.components:
+            try:
+                component.get()
+            except Exception as e:
+                self.errors[component._name] = str(e)
+                self.logger.error(f"Failed to initialize {component._name}: {e}")
+
+        for name, step in self.warmup_steps:
+            try:
+                self.timer.phase(name, step)
+            except Exception as e:
+                self.errors[name] = str(e)
+                self.logger.error(f"Warm-up step '{name}' failed: {e}")
+
+        self.ready_after_ms = self.timer.elapsed_ms()
+        self.done.set()
+        self.logger.info(f"Service ready {self.ready_after_ms:.0f} ms after startup")
+
+    def is_ready(self) -> bool:
+        """True once warm-up finished and every component is built"""
+        return self.done.is_set() and all(component.is_ready for component in self.components)
+
+    def get_state(self) -> Dict:
+        """Component and warm-up state for the readiness endpoint"""
+        return {
+            'ready': self.is_ready(),
+            'warmup_finished': self.done.is_set(),
+            'components': {component._name: component.get_state() for component in self.components},
+            'errors': dict(self.errors),
+            'startup_phases_ms': self.timer.get_phases(),
+            'ready_after_ms': round(self.ready_after_ms, 1) if self.ready_after_ms is not None else None
+        }
@@ -1,19 +1,35 @@
 import pytest
 import numpy as np
+import cv2
 from unittest.mock import Mock, patch, MagicMock
 import json
 from datetime import datetime, timedelta
 import tempfile
+import time
 import os
 import sys
 
 # Add src to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from detection.vehicle_detector import EmergencyVehicleDetector
+from detection.vehicle_detector import EmergencyVehicleDetector, COLOR_RANGES, COLOR_BITS, LIGHT_BAR_RANGE, LIGHT_BAR_BIT
+from detection.stream_worker import VideoStreamWorker, StreamSource
+from detection.tracker import VehicleTracker
+from detection.inference_backends import resolve_backend, ExportedYoloBackend, OpenVinoBackend
+from detection.job_queue import DetectionJobQueue
+from detection.process_pool import DetectorProcessPool, PooledDetector
+from detection.result_cache import DetectionResultCache, FrameSignature, frame_dhash
+from detection.temporal_voting import EmergencyVoter
+from detection.sampling_scheduler import SamplingScheduler
+from detection.frame_decoder import FrameDecoder, jpeg_dimensions, raw_frame_header
 from routing.route_optimizer import RouteOptimizer, Location, Hospital
+from routing.road_graph import RoadGraph
+from routing.contraction_hierarchies import ContractionHierarchy
+from routing.osm_importer import OSMImporter, parse_maxspeed, oneway_direction
 from signals.signal_controller import SignalController, SignalState, SignalTiming
 from config.database import DatabaseManager
+from utils.metrics import RollingHistogram, StageMetrics
+from utils.startup import StartupTimer, LazyComponent, WarmupThread
 
 class TestEmergencyVehicleDetector:
     """Test emergency vehicle detection functionality"""
@@ -164,6 +180,1492 @@ class TestEmergencyVehicleDetector:
         assert detector.update_confidence_threshold(1.5) == False
         assert detector.confidence_threshold == 0.7  # Should remain unchanged
 
+    def test_detect_batch_single_model_call(self, detector):
+        """Test batched detection runs one model call and keeps frame order"""
+        frames = [np.random.randint(0, 255, (100, 100, 3), dtype=np.uint8) for _ in range(3)]
+        detector.model.return_value = [_mock_yolo_result([]) for _ in frames]
+        
+        results = detector.detect_batch(frames, ['clock_tower', 'paltan_bazaar', 'ballupur'])
+        
+        assert detector.model.call_count == 1
+        assert len(detector.model.call_args[0][0]) == 3
+        assert [r['signal_id'] for r in results] == ['clock_tower', 'paltan_bazaar', 'ballupur']
+        assert all(r['is_emergency'] == False for r in results)
+    
+    def test_detect_batch_invalid_frame(self, detector):
+        """Test an invalid frame gets an error without breaking the batch"""
+        frames = [np.zeros((100, 100, 3), dtype=np.uint8), 12345]
+        detector.model.return_value = [_mock_yolo_result([])]
+        
+        results = detector.detect_batch(frames)
+        
+        assert len(results) == 2
+        assert 'error' not in results[0]
+        assert results[1]['error'] == 'Invalid image input'
+    
+    def test_detect_batch_chunks_by_batch_size(self, detector):
+        """Test frames beyond the batch size are split across model calls"""
+        detector.batch_size = 2
+        frames = [np.zeros((100, 100, 3), dtype=np.uint8) for _ in range(5)]
+        detector.model.side_effect = lambda images: [_mock_yolo_result([]) for _ in images]
+        
+        results = detector.detect_batch(frames)
+        
+        assert detector.model.call_count == 3
+        assert len(results) == 5
+    
+    def test_detect_batch_mismatched_signal_ids(self, detector):
+        """Test mismatched frame and signal ID counts are rejected"""
+        frames = [np.zeros((100, 100, 3), dtype=np.uint8) for _ in range(2)]
+        
+        results = detector.detect_batch(frames, ['clock_tower'])
+        
+        assert len(results) == 2
+        assert all('error' in r for r in results)
+        assert not detector.model.called
+
+    def test_motion_gating_reuses_result_for_static_frames(self, detector):
+        """Test identical frames from one camera skip inference"""
+        detector.result_cache.enabled = False  # identical frames would hit the result cache
+        frame = np.random.randint(0, 255, (120, 160, 3), dtype=np.uint8)
+        detector.model.return_value = [_mock_yolo_result([])]
+        
+        first = detector.detect_emergency_vehicle(frame, signal_id='clock_tower')
+        second = detector.detect_emergency_vehicle(frame.copy(), signal_id='clock_tower')
+        
+        assert detector.model.call_count == 1
+        assert 'motion_skipped' not in first
+        assert second['motion_skipped'] == True
+        assert second['is_emergency'] == first['is_emergency']
+        
+        status = detector.get_system_status()
+        assert status['motion_gating']['frames_skipped'] == 1
+    
+    def test_motion_gating_analyses_changed_frames(self, detector):
+        """Test a frame with movement goes through inference"""
+        frame = np.zeros((120, 160, 3), dtype=np.uint8)
+        moved = frame.copy()
+        moved[40:80, 40:100] = 255  # A vehicle entering the view
+        detector.model.return_value = [_mock_yolo_result([])]
+        
+        detector.detect_emergency_vehicle(frame, signal_id='clock_tower')
+        detector.detect_emergency_vehicle(frame, signal_id='clock_tower')
+        result = detector.detect_emergency_vehicle(moved, signal_id='clock_tower')
+        
+        assert detector.model.call_count == 2
+        assert 'motion_skipped' not in result
+    
+    def test_motion_gating_forces_periodic_analysis(self, detector):
+        """Test a static view is still re-analysed after the skip limit"""
+        detector.result_cache.enabled = False  # identical frames would hit the result cache
+        frame = np.zeros((120, 160, 3), dtype=np.uint8)
+        detector.motion_gate.max_skipped_frames = 2
+        detector.model.return_value = [_mock_yolo_result([])]
+        
+        for _ in range(5):
+            detector.detect_emergency_vehicle(frame, signal_id='clock_tower')
+        
+        # analysed, skipped, skipped, analysed, skipped
+        assert detector.model.call_count == 2
+    
+    def test_motion_gating_requires_signal_id(self, detector):
+        """Test frames without a signal ID are always analysed"""
+        detector.result_cache.enabled = False  # identical frames would hit the result cache
+        frame = np.zeros((120, 160, 3), dtype=np.uint8)
+        detector.model.return_value = [_mock_yolo_result([])]
+        
+        detector.detect_emergency_vehicle(frame)
+        detector.detect_emergency_vehicle(frame)
+        
+        assert detector.model.call_count == 2
+
+    def test_hsv_lookup_matches_in_range(self, detector):
+        """Test lookup table buckets match per-color cv2.inRange masks"""
+        import cv2
+        test_image = np.random.randint(0, 255, (120, 160, 3), dtype=np.uint8)
+        hsv = cv2.cvtColor(test_image, cv2.COLOR_BGR2HSV)
+        
+        pixel_codes = detector._classify_hsv_pixels(test_image)
+        
+        for color_name, ranges in COLOR_RANGES.items():
+            expected = np.zeros(hsv.shape[:2], dtype=np.uint8)
+            for i in range(0, len(ranges), 2):
+                expected |= cv2.inRange(hsv, np.array(ranges[i]), np.array(ranges[i + 1]))
+            
+            actual = (pixel_codes & COLOR_BITS[color_name]) != 0
+            assert np.array_equal(actual, expected > 0), color_name
+        
+        expected_bright = cv2.inRange(hsv, LIGHT_BAR_RANGE[0], LIGHT_BAR_RANGE[1]) > 0
+        assert np.array_equal((pixel_codes & LIGHT_BAR_BIT) != 0, expected_bright)
+    
+    def test_shared_pixel_codes_match_standalone_analysis(self, detector):
+        """Test reusing one classification gives the same color and light bar results"""
+        test_image = np.zeros((90, 200, 3), dtype=np.uint8)
+        test_image[5:20, 40:160] = [0, 0, 255]  # Red light bar
+        test_image[30:90, :] = [255, 255, 255]  # White body
+        
+        pixel_codes = detector._classify_hsv_pixels(test_image)
+        
+        assert detector._analyze_colors(test_image, pixel_codes) == detector._analyze_colors(test_image)
+        assert detector._detect_light_bar(test_image, pixel_codes) == detector._detect_light_bar(test_image)
+        assert detector._detect_light_bar(test_image)[1] == True
+
+    def test_tracked_vehicle_analysed_once(self, detector):
+        """Test a vehicle seen over several frames is analysed and reported once"""
+        detector.result_cache.enabled = False  # identical frames would hit the result cache
+        detector.motion_gate.enabled = False
+        detector._analyze_emergency_features = Mock(return_value={
+            'is_emergency': True,
+            'vehicle_type': 'ambulance',
+            'confidence': 0.9,
+            'features': ['light_bar']
+        })
+        frame = np.zeros((200, 200, 3), dtype=np.uint8)
+        
+        results = []
+        for offset in range(3):
+            detector.model.return_value = [
+                _mock_yolo_result([(0, 0.9, [20 + offset, 20, 120 + offset, 100])])
+            ]
+            results.append(detector.detect_emergency_vehicle(frame, signal_id='clock_tower'))
+        
+        assert detector._analyze_emergency_features.call_count == 1
+        assert [r['new_event'] for r in results] == [True, False, False]
+        assert len({r['track_id'] for r in results}) == 1
+        assert detector.get_system_status()['tracking']['analyses_reused'] == 2
+    
+    def test_borderline_track_reanalysed(self, detector):
+        """Test tracks with scores near the threshold are re-analysed"""
+        detector.result_cache.enabled = False  # identical frames would hit the result cache
+        detector.motion_gate.enabled = False
+        detector._analyze_emergency_features = Mock(return_value={
+            'is_emergency': True,
+            'vehicle_type': 'police',
+            'confidence': 0.55,
+            'features': []
+        })
+        frame = np.zeros((200, 200, 3), dtype=np.uint8)
+        detector.model.return_value = [_mock_yolo_result([(0, 0.9, [20, 20, 120, 100])])]
+        
+        for _ in range(3):
+            detector.detect_emergency_vehicle(frame, signal_id='clock_tower')
+        
+        assert detector._analyze_emergency_features.call_count == 3
+    
+    def test_cascade_escalates_uncertain_frames(self, detector):
+        """Test frames with uncertain scores are re-run on the next cascade model"""
+        detector.cascade_enabled = True
+        detector.motion_gate.enabled = False
+        detector.model.return_value = [_mock_yolo_result([(0, 0.9, [20, 20, 120, 100])])]
+        
+        small_model = Mock()
+        small_model.names = detector.model.names
+        small_model.return_value = [_mock_yolo_result([(2, 0.95, [10, 10, 150, 120])])]
+        medium_model = Mock()
+        detector.cascade_models = {0: small_model, 1: medium_model}
+        
+        scores = iter([0.5, 0.9])
+        detector._analyze_emergency_features = Mock(side_effect=lambda crop, scale=1.0: {
+            'is_emergency': True,
+            'vehicle_type': 'ambulance',
+            'confidence': next(scores),
+            'features': []
+        })
+        frame = np.zeros((200, 200, 3), dtype=np.uint8)
+        
+        result = detector.detect_emergency_vehicle(frame, signal_id='clock_tower')
+        
+        assert result['cascade_stage'] == 1
+        assert result['bbox'] == [10, 10, 150, 120]
+        assert result['confidence'] == 0.9
+        medium_model.assert_not_called()
+        
+        cascade_status = detector.get_system_status()['cascade']
+        assert cascade_status['frames_escalated'] == 1
+        assert cascade_status['hit_rate'] == 1.0
+    
+    def test_cascade_skips_confident_frames(self, detector):
+        """Test confident frames stay on the primary model"""
+        detector.cascade_enabled = True
+        detector.cascade_models = {0: Mock(), 1: Mock()}
+        detector.model.return_value = [_mock_yolo_result([(0, 0.9, [20, 20, 120, 100])])]
+        detector._analyze_emergency_features = Mock(return_value={
+            'is_emergency': False,
+            'vehicle_type': None,
+            'confidence': 0.1,
+            'features': []
+        })
+        frame = np.zeros((200, 200, 3), dtype=np.uint8)
+        
+        result = detector.detect_emergency_vehicle(frame)
+        
+        assert result['cascade_stage'] == 0
+        assert detector._analyze_emergency_features.call_count == 1
+        detector.cascade_models[0].assert_not_called()
+        assert detector.get_system_status()['cascade']['hit_rate'] == 0.0
+    
+    def test_cascade_model_load_failure(self, detector):
+        """Test a cascade model that fails to load is skipped"""
+        detector.cascade_model_paths = ['models/missing.onnx']
+        detector.cascade_stage_runs = [0]
+        
+        assert detector._get_cascade_model(0) is None
+        assert detector._run_cascade(np.zeros((50, 50, 3), dtype=np.uint8), [])[2] == 0
+    
+    def test_roi_crops_model_input_and_maps_boxes(self, detector):
+        """Test YOLO only sees the ROI and boxes come back in frame coordinates"""
+        detector.motion_gate.enabled = False
+        detector.tracker.enabled = False
+        assert detector.set_signal_roi('clock_tower', [[100, 50], [300, 50], [300, 250], [100, 250]])
+        detector._analyze_emergency_features = Mock(return_value={
+            'is_emergency': True,
+            'vehicle_type': 'ambulance',
+            'confidence': 0.9,
+            'features': []
+        })
+        # First box lies inside the ROI crop, the second one's centre is outside the polygon
+        detector.model.return_value = [_mock_yolo_result([
+            (0, 0.9, [10, 20, 110, 120]),
+            (0, 0.9, [150, 150, 200, 200])
+        ])]
+        frame = np.full((400, 400, 3), 255, dtype=np.uint8)
+        
+        result = detector.detect_emergency_vehicle(frame, signal_id='clock_tower')
+        
+        model_input = detector.model.call_args[0][0]
+        assert model_input.shape == (201, 201, 3)
+        assert result['bbox'] == [110, 70, 210, 170]
+        assert len(result['all_detections']) == 2
+        assert 'clock_tower' in detector.get_system_status()['roi_signals']
+    
+    def test_roi_discards_boxes_outside_polygon(self, detector):
+        """Test masked pixels are blanked and boxes centred outside a triangle ROI are dropped"""
+        detector.tracker.enabled = False
+        assert detector.set_signal_roi('paltan_bazaar', [[0, 0], [200, 0], [0, 200]])
+        frame = np.full((300, 300, 3), 255, dtype=np.uint8)
+        
+        model_input = detector._crop_to_roi('paltan_bazaar', frame)
+        assert model_input[10, 10].tolist() == [255, 255, 255]
+        assert model_input[190, 190].tolist() == [0, 0, 0]
+        
+        vehicles = detector._map_roi_boxes('paltan_bazaar', [
+            ([10, 10, 60, 60], 0.9),
+            ([150, 150, 200, 200], 0.9)
+        ])
+        assert vehicles == [([10, 10, 60, 60], 0.9)]
+    
+    def test_set_signal_roi_validation(self, detector):
+        """Test invalid polygons are rejected and None clears the ROI"""
+        assert detector.set_signal_roi('clock_tower', [[0, 0], [10, 10]]) == False
+        assert detector.set_signal_roi('clock_tower', [[0, 0], [10, 0], [20, 0]]) == False
+        assert detector.set_signal_roi('clock_tower', [[0, 0], [10, 0], [10, 10]]) == True
+        assert detector.get_signal_roi('clock_tower') == [[0, 0], [10, 0], [10, 10]]
+        assert detector.set_signal_roi('clock_tower', None) == True
+        assert detector.get_signal_roi('clock_tower') is None
+        
+        frame = np.zeros((50, 50, 3), dtype=np.uint8)
+        assert detector._crop_to_roi('clock_tower', frame) is frame
+    
+    def test_reduced_jpeg_decode_maps_boxes_to_upload(self, detector):
+        """Test large JPEG uploads are decoded at reduced size and boxes scaled back"""
+        import io
+        detector.motion_gate.enabled = False
+        detector.tracker.enabled = False
+        assert detector.set_signal_roi('clock_tower', [[400, 200], [1200, 200], [1200, 1000], [400, 1000]])
+        detector._analyze_emergency_features = Mock(return_value={
+            'is_emergency': True,
+            'vehicle_type': 'ambulance',
+            'confidence': 0.9,
+            'features': []
+        })
+        detector.model.return_value = [_mock_yolo_result([(0, 0.9, [10, 20, 110, 120])])]
+        frame = np.full((1440, 2560, 3), 128, dtype=np.uint8)
+        encoded = cv2.imencode('.jpg', frame)[1].tobytes()
+        
+        result = detector.detect_emergency_vehicle(io.BytesIO(encoded), signal_id='clock_tower')
+        
+        # 2560 wide decodes at 1/4 (640 = model input) and the ROI is scaled with it
+        assert result['decode_scale'] == 0.25
+        assert detector.model.call_args[0][0].shape == (201, 201, 3)
+        assert result['bbox'] == [440, 280, 840, 680]
+        assert detector.get_system_status()['decoding']['decoded']['reduced'] == 1
+    
+    def test_downscaled_frame_maps_boxes_to_camera_frame(self, detector):
+        """Test boxes in a frame the caller already downscaled are reported in camera coordinates"""
+        detector.motion_gate.enabled = False
+        detector.tracker.enabled = False
+        detector._analyze_emergency_features = Mock(return_value={
+            'is_emergency': True,
+            'vehicle_type': 'ambulance',
+            'confidence': 0.9,
+            'features': []
+        })
+        detector.model.return_value = [_mock_yolo_result([(0, 0.9, [10, 20, 110, 120])])]
+        frame = np.full((540, 960, 3), 128, dtype=np.uint8)
+        
+        result = detector.detect_emergency_vehicle(frame, signal_id='clock_tower', frame_scale=0.25)
+        
+        assert result['decode_scale'] == 0.25
+        assert result['bbox'] == [40, 80, 440, 480]
+    
+    def test_prepare_image_keeps_full_resolution(self, detector):
+        """Test the detached full-size decode used before handing frames to other processes"""
+        import io
+        frame = np.zeros((1440, 2560, 3), dtype=np.uint8)
+        encoded = cv2.imencode('.jpg', frame)[1].tobytes()
+        
+        image = detector._prepare_image(io.BytesIO(encoded))
+        
+        assert image.shape == (1440, 2560, 3)
+        assert detector._prepare_image(12345) is None
+    
+    def test_result_cache_answers_resubmitted_snapshot(self, detector):
+        """Test a re-submitted snapshot is answered from the cache without inference"""
+        import io
+        detector.motion_gate.enabled = False
+        detector.model.return_value = [_mock_yolo_result([])]
+        frame = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+        encoded = cv2.imencode('.jpg', frame)[1].tobytes()
+        
+        first = detector.detect_emergency_vehicle(io.BytesIO(encoded), signal_id='clock_tower')
+        second = detector.detect_emergency_vehicle(io.BytesIO(encoded), signal_id='clock_tower')
+        other_signal = detector.detect_emergency_vehicle(io.BytesIO(encoded), signal_id='paltan_bazaar')
+        
+        assert detector.model.call_count == 2
+        assert 'cache_hit' not in first
+        assert second['cache_hit'] == True
+        assert 'cache_hit' not in other_signal
+        
+        stats = detector.get_system_status()['result_cache']
+        assert stats['hits'] == 1
+        assert stats['misses'] == 2
+        
+        # A new confidence threshold invalidates every cached result
+        detector.update_confidence_threshold(0.6)
+        detector.detect_emergency_vehicle(io.BytesIO(encoded), signal_id='clock_tower')
+        assert detector.model.call_count == 3
+    
+    def test_stage_timings_reported_in_status(self, detector):
+        """Test each pipeline stage feeds its rolling histogram"""
+        detector.motion_gate.enabled = False
+        detector.model.return_value = [_mock_yolo_result([(0, 0.9, [10, 10, 110, 110])])]
+        frame = np.full((200, 200, 3), 255, dtype=np.uint8)
+        
+        detector.detect_emergency_vehicle(frame, signal_id='clock_tower')
+        
+        timings = detector.get_system_status()['stage_timings']
+        for stage in ('total', 'decode', 'yolo', 'postprocess', 'features', 'colors', 'patterns',
+                      'light_bar', 'classification'):
+            assert timings[stage]['count'] == 1
+        assert timings['total']['max_ms'] >= timings['yolo']['max_ms']
+        assert 'detection_stage_latency_ms{stage="yolo",quantile="0.95"' in detector.export_stage_metrics()
+    
+    def test_warm_up_runs_dummy_inferences(self, detector):
+        """Test warm-up primes the model at the model input size"""
+        assert detector.get_system_status()['warmed_up'] == False
+        
+        detector.warm_up(iterations=3)
+        
+        assert detector.model.call_count == 3
+        assert detector.model.call_args[0][0].shape == (640, 640, 3)
+        assert detector.get_system_status()['warmed_up'] == True
+
+def _mock_yolo_result(boxes):
+    """Build a mocked YOLO result holding (class_id, confidence, xyxy) boxes"""
+    mock_boxes = []
+    for class_id, confidence, xyxy in boxes:
+        mock_box = Mock()
+        mock_box.cls = [class_id]
+        mock_box.conf = [confidence]
+        mock_xyxy = Mock()
+        mock_xyxy.cpu.return_value.numpy.return_value = np.array(xyxy, dtype=np.float32)
+        mock_box.xyxy = [mock_xyxy]
+        mock_boxes.append(mock_box)
+    
+    mock_result = Mock()
+    mock_result.boxes = mock_boxes
+    return mock_result
+
+class TestVideoStreamWorker:
+    """Test continuous camera stream ingestion"""
+    
+    @pytest.fixture
+    def video_file(self):
+        """Write a short local video to stand in for a camera"""
+        import cv2
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, 'junction.avi')
+        
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+        for i in range(10):
+            writer.write(np.full((48, 64, 3), i * 20, dtype=np.uint8))
+        writer.release()
+        
+        yield path
+        
+        os.unlink(path)
+        os.rmdir(tmp_dir)
+    
+    @pytest.fixture
+    def worker(self):
+        """Create stream worker with mocked detector and controller"""
+        detector = Mock()
+        detector.detect_emergency_vehicle.return_value = {
+            'is_emergency': True,
+            'vehicle_type': 'ambulance',
+            'confidence': 0.9
+        }
+        controller = Mock()
+        controller.emergency_override.return_value = {'success': True}
+        
+        worker = VideoStreamWorker(detector, controller, sources=[])
+        worker.frame_interval = 1
+        return worker
+    
+    def test_parse_sources(self, worker):
+        """Test STREAM_SOURCES parsing"""
+        sources = worker._parse_sources('clock_tower=rtsp://cam1/stream, ballupur=videos/b.mp4,broken')
+        
+        assert [s.signal_id for s in sources] == ['clock_tower', 'ballupur']
+        assert sources[0].source == 'rtsp://cam1/stream'
+    
+    def test_run_stream_from_video_file(self, worker, video_file):
+        """Test a local video file drives detection and signal override"""
+        on_detection = Mock()
+        worker.on_detection = on_detection
+        
+        stats = worker.run_stream(StreamSource('clock_tower', video_file))
+        
+        assert stats['status'] == 'finished'
+        assert stats['frames_read'] == 10
+        assert stats['frames_analyzed'] == 10
+        assert worker.signal_controller.emergency_override.call_count == 10
+        assert worker.signal_controller.emergency_override.call_args[0][0] == 'clock_tower'
+        assert on_detection.call_count == 10
+    
+    def test_voting_debounces_stream_overrides(self, worker, video_file):
+        """Test a vehicle seen in every frame overrides the signal once"""
+        with patch.dict(os.environ, {'VOTING_ENABLED': 'true', 'VOTING_MIN_POSITIVE': '3'}):
+            worker.voter = EmergencyVoter()
+        
+        stats = worker.run_stream(StreamSource('clock_tower', video_file))
+        
+        assert stats['frames_analyzed'] == 10
+        assert stats['emergencies_detected'] == 1
+        assert worker.signal_controller.emergency_override.call_count == 1
+    
+    def test_stream_detection_reports_voted_vehicle_type(self, worker, video_file):
+        """Test the detection hook gets the window's majority type, not the last frame's"""
+        with patch.dict(os.environ, {'VOTING_ENABLED': 'true', 'VOTING_MIN_POSITIVE': '3'}):
+            worker.voter = EmergencyVoter()
+        worker.detector.detect_emergency_vehicle.side_effect = [
+            {'is_emergency': True, 'vehicle_type': vehicle_type, 'confidence': 0.9}
+            for vehicle_type in ['ambulance', 'ambulance', 'police'] + ['police'] * 7
+        ]
+        on_detection = Mock()
+        worker.on_detection = on_detection
+        
+        worker.run_stream(StreamSource('clock_tower', video_file))
+        
+        assert on_detection.call_count == 1
+        assert on_detection.call_args[0][1]['vehicle_type'] == 'police'
+        assert on_detection.call_args[0][3] == 'ambulance'
+    
+    def test_sampling_scheduler_slows_overloaded_stream(self, worker, video_file):
+        """Test a slow detector lowers the stream's sampling rate"""
+        worker.scheduler = SamplingScheduler(base_interval=1)
+        worker.scheduler.latency_ms = 1000.0  # 0.8 frames/s budget
+        worker.scheduler.latency_smoothing = 0.0
+        
+        stats = worker.run_stream(StreamSource('clock_tower', video_file))
+        sampling = worker.get_status()['sampling']['cameras']['clock_tower']
+        
+        assert stats['frames_read'] == 10
+        assert stats['frames_analyzed'] == 1
+        assert sampling['source_fps'] == 10.0
+        assert sampling['frame_interval'] == 13
+    
+    def test_frame_interval_skips_frames(self, worker, video_file):
+        """Test only every Nth frame is analysed"""
+        worker.frame_interval = 5
+        
+        stats = worker.run_stream(StreamSource('clock_tower', video_file))
+        
+        assert stats['frames_read'] == 10
+        assert worker.detector.detect_emergency_vehicle.call_count == 2
+    
+    def test_unreadable_file_source(self, worker):
+        """Test an unreadable video file is reported instead of raising"""
+        with tempfile.NamedTemporaryFile(suffix='.avi', delete=False) as tmp_file:
+            tmp_file.write(b'not a video')
+        
+        stats = worker.run_stream(StreamSource('clock_tower', tmp_file.name))
+        os.unlink(tmp_file.name)
+        
+        assert stats['status'] == 'error'
+        assert stats['frames_read'] == 0
+        assert not worker.detector.detect_emergency_vehicle.called
+    
+    def test_threaded_stream_status(self, worker, video_file):
+        """Test start/stop and status reporting with a threaded stream"""
+        worker.add_source('clock_tower', video_file)
+        worker.start()
+        worker.threads['clock_tower'].join(timeout=5)
+        
+        status = worker.get_status()
+        worker.stop()
+        
+        assert status['streams']['clock_tower']['status'] == 'finished'
+        assert status['streams']['clock_tower']['frames_read'] == 10
+
+class TestVehicleTracker:
+    """Test multi-object vehicle tracking"""
+    
+    @pytest.fixture
+    def tracker(self):
+        return VehicleTracker()
+    
+    def test_overlapping_boxes_keep_track_id(self, tracker):
+        """Test IoU association keeps the same track across frames"""
+        first = tracker.update('clock_tower', [[10, 10, 110, 90], [300, 50, 380, 120]])
+        second = tracker.update('clock_tower', [[305, 52, 385, 122], [14, 12, 114, 92]])
+        
+        assert second[0].track_id == first[1].track_id
+        assert second[1].track_id == first[0].track_id
+        assert tracker.tracks_created == 2
+    
+    def test_centroid_fallback_for_fast_vehicle(self, tracker):
+        """Test a box that moved past IoU overlap still matches by centroid"""
+        first = tracker.update('clock_tower', [[0, 0, 100, 100]])
+        second = tracker.update('clock_tower', [[40, 0, 140, 100]])
+        third = tracker.update('clock_tower', [[400, 0, 500, 100]])
+        
+        assert second[0].track_id == first[0].track_id
+        assert third[0].track_id != first[0].track_id
+    
+    def test_tracks_expire_and_are_per_signal(self, tracker):
+        """Test unseen tracks are dropped and signals don't share tracks"""
+        tracker.max_missed_frames = 1
+        first = tracker.update('clock_tower', [[0, 0, 100, 100]])
+        other = tracker.update('ballupur', [[0, 0, 100, 100]])
+        
+        assert other[0].track_id != first[0].track_id
+        
+        tracker.update('clock_tower', [])
+        tracker.update('clock_tower', [])
+        
+        assert tracker.tracks['clock_tower'] == []
+        assert len(tracker.tracks['ballupur']) == 1
+    
+    def test_claim_event_once(self, tracker):
+        """Test an emergency event is emitted once per track"""
+        track = tracker.update('clock_tower', [[0, 0, 100, 100]])[0]
+        
+        assert tracker.claim_event(track) == True
+        assert tracker.claim_event(track) == False
+    
+    def test_analysis_state_is_read_under_the_lock(self, tracker):
+        """Test cached analyses wait for a concurrent update but analyze() runs unlocked"""
+        import threading
+        track = tracker.update('clock_tower', [[0, 0, 100, 100]])[0]
+        results = []
+        
+        with tracker.lock:
+            worker = threading.Thread(target=lambda: results.append(tracker.needs_analysis(track)))
+            worker.start()
+            worker.join(timeout=0.2)
+            assert worker.is_alive()
+        worker.join(timeout=5)
+        assert results == [True]
+        
+        analysis = tracker.get_analysis(track, lambda: {'confidence': 0.9, 'locked': tracker.lock.locked()})
+        assert analysis['locked'] == False
+        assert tracker.get_analysis(track, lambda: {'confidence': 0.1}) is analysis
+        assert tracker.get_stats()['analyses_reused'] == 1
+
+class _FakeExportedBackend(ExportedYoloBackend):
+    """Exported backend returning a fixed raw YOLOv8 head output"""
+    
+    def __init__(self, raw_output):
+        super().__init__('fake.onnx')
+        self.names = {0: 'car', 1: 'truck'}
+        self.dynamic_batch = True
+        self.raw_output = raw_output
+    
+    def _infer(self, batch):
+        return np.repeat(self.raw_output[None], len(batch), axis=0)
+
+class TestInferenceBackends:
+    """Test exported-model inference backends"""
+    
+    @pytest.fixture
+    def raw_output(self):
+        """Raw head output (4 + 2 classes, 3 anchors) in 640x640 letterboxed space"""
+        output = np.zeros((6, 3), dtype=np.float32)
+        # Two overlapping car candidates and one truck (cx, cy, w, h, car, truck)
+        output[:, 0] = [320, 320, 200, 80, 0.9, 0.0]
+        output[:, 1] = [322, 321, 200, 80, 0.8, 0.0]
+        output[:, 2] = [100, 300, 40, 40, 0.0, 0.7]
+        return output
+    
+    def test_resolve_backend(self):
+        """Test backend selection from model path and override"""
+        assert resolve_backend('models/yolov8n.pt') == 'ultralytics'
+        assert resolve_backend('models/yolov8n.onnx') == 'onnxruntime'
+        assert resolve_backend('models/yolov8n_openvino_model/') == 'openvino'
+        assert resolve_backend('models/yolov8n.onnx', 'ultralytics') == 'ultralytics'
+        
+        with pytest.raises(ValueError):
+            resolve_backend('models/yolov8n.pt', 'tensorrt')
+    
+    def test_postprocess_nms_and_letterbox(self, raw_output):
+        """Test duplicate boxes are suppressed and mapped back to the frame"""
+        backend = _FakeExportedBackend(raw_output)
+        frame = np.zeros((320, 640, 3), dtype=np.uint8)  # Letterboxed with 160px bars
+        
+        results = backend([frame, frame])
+        
+        assert len(results) == 2
+        boxes = results[0].boxes
+        assert len(boxes) == 2
+        assert sorted(boxes.cls.tolist()) == [0.0, 1.0]
+        car = boxes.xyxy[boxes.cls == 0][0]
+        np.testing.assert_allclose(car, [220, 120, 420, 200], atol=1)
+    
+    def test_openvino_multi_word_class_names(self):
+        """Test names like 'traffic light' keep every later class index on its own name"""
+        backend = OpenVinoBackend.__new__(OpenVinoBackend)
+        model = Mock()
+        model.get_rt_info.return_value.astype.return_value = 'person bicycle traffic_light fire_hydrant car'
+        
+        with tempfile.TemporaryDirectory() as model_dir:
+            names = backend._read_names(model, model_dir)
+            assert names == {0: 'person', 1: 'bicycle', 2: 'traffic light', 3: 'fire hydrant', 4: 'car'}
+            
+            with open(os.path.join(model_dir, 'metadata.yaml'), 'w') as f:
+                f.write("task: detect\nnames:\n  0: person\n  1: traffic light\n  2: car\nimgsz:\n- 640\n")
+            assert backend._read_names(model, model_dir) == {0: 'person', 1: 'traffic light', 2: 'car'}
+    
+    def test_detector_accepts_backend_results(self, raw_output):
+        """Test the detector consumes numpy-based backend results"""
+        with patch('detection.vehicle_detector.YOLO'):
+            detector = EmergencyVehicleDetector()
+        detector.model = _FakeExportedBackend(raw_output)
+        detector.confidence_threshold = 0.5
+        
+        vehicles = detector._extract_vehicle_boxes(detector.model(np.zeros((640, 640, 3), dtype=np.uint8)))
+        
+        assert len(vehicles) == 2
+        assert vehicles[0][0] == [220, 280, 420, 360]
+
+class TestDetectionJobQueue:
+    """Test the asynchronous detection job queue"""
+    
+    @pytest.fixture
+    def queue(self):
+        """Create a queue whose jobs echo their signal ID"""
+        return DetectionJobQueue(
+            lambda signal_id, frame: {'signal_id': signal_id, 'frame': frame},
+            num_workers=1, max_size=4
+        )
+    
+    def test_submit_and_run_job(self, queue):
+        """Test a submitted job is queued and its result stored"""
+        job = queue.submit('clock_tower', b'frame-1')
+        assert job['status'] == 'queued'
+        
+        queue.run_job(queue._next_job(block=False))
+        
+        finished = queue.get_job(job['job_id'])
+        assert finished['status'] == 'completed'
+        assert finished['result'] == {'signal_id': 'clock_tower', 'frame': b'frame-1'}
+        assert 'queue_wait_ms' in finished
+    
+    def test_drop_oldest_frame_per_camera(self, queue):
+        """Test a camera's newer frames replace its older queued frames"""
+        first = queue.submit('clock_tower', b'1')
+        queue.submit('clock_tower', b'2')
+        queue.submit('clock_tower', b'3')
+        other = queue.submit('paltan_bazaar', b'4')
+        
+        assert queue.get_job(first['job_id'])['status'] == 'dropped'
+        assert [job.frame for job in queue.pending.values()] == [b'2', b'3', b'4']
+        assert queue.get_job(other['job_id'])['status'] == 'queued'
+        assert queue.get_stats()['dropped'] == 1
+    
+    def test_full_queue_drops_from_busiest_camera(self, queue):
+        """Test a full queue drops the oldest frame of the camera with most frames waiting"""
+        queue.max_per_camera = 4
+        for frame in (b'a1', b'b1', b'a2', b'a3'):
+            queue.submit('clock_tower' if frame.startswith(b'a') else 'paltan_bazaar', frame)
+        
+        queue.submit('rajpur_road', b'c1')
+        
+        assert [job.frame for job in queue.pending.values()] == [b'b1', b'a2', b'a3', b'c1']
+    
+    def test_reject_policy(self):
+        """Test the reject policy refuses frames when the queue is full"""
+        queue = DetectionJobQueue(lambda signal_id, frame: {}, num_workers=1, max_size=1,
+                                  drop_policy='reject')
+        queue.submit('clock_tower', b'1')
+        
+        rejected = queue.submit('paltan_bazaar', b'2')
+        
+        assert rejected['status'] == 'rejected'
+        assert queue.get_stats()['rejected'] == 1
+        
+        with pytest.raises(ValueError):
+            DetectionJobQueue(lambda signal_id, frame: {}, drop_policy='newest')
+    
+    def test_failed_job_and_callback(self):
+        """Test failures are recorded and reported to the callback URL"""
+        def failing_process(signal_id, frame):
+            raise RuntimeError('model crashed')
+        with patch.dict(os.environ, {'JOB_CALLBACK_ALLOWED_HOSTS': 'dispatch.local'}):
+            queue = DetectionJobQueue(failing_process, num_workers=1)
+        job = queue.submit('clock_tower', b'1', callback_url='http://dispatch.local/jobs')
+        
+        with patch('detection.job_queue.requests.post') as mock_post:
+            queue.run_job(queue._next_job(block=False))
+        
+        finished = queue.get_job(job['job_id'])
+        assert finished['status'] == 'failed'
+        assert finished['error'] == 'model crashed'
+        mock_post.assert_called_once()
+        assert mock_post.call_args[1]['json']['status'] == 'failed'
+    
+    def test_callback_urls_cannot_reach_internal_hosts(self, queue):
+        """Test callbacks to loopback/private addresses or unlisted hosts are refused"""
+        for url in ('http://127.0.0.1:6379/', 'http://10.0.0.5/hook', 'http://[::1]/hook',
+                    'http://169.254.169.254/latest/meta-data', 'file:///etc/passwd'):
+            assert queue.check_callback_url(url) is not None
+            assert queue.submit('clock_tower', b'1', callback_url=url)['status'] == 'rejected'
+        assert queue.check_callback_url('https://93.184.216.34/hook') is None
+        
+        queue.callback_allowed_hosts = {'dispatch.local'}
+        assert queue.check_callback_url('http://dispatch.local/jobs') is None
+        assert queue.check_callback_url('https://93.184.216.34/hook') is not None
+        
+        # A job whose host is no longer allowed when it finishes gets no callback
+        job = queue.submit('clock_tower', b'1', callback_url='http://dispatch.local/jobs')
+        queue.callback_allowed_hosts = set()
+        with patch('detection.job_queue.requests.post') as mock_post:
+            queue.run_job(queue._next_job(block=False))
+        assert queue.get_job(job['job_id'])['status'] == 'completed'
+        mock_post.assert_not_called()
+    
+    def test_worker_threads_drain_queue(self, queue):
+        """Test started workers process submitted jobs"""
+        queue.start()
+        try:
+            job_ids = [queue.submit(signal_id, b'frame')['job_id']
+                       for signal_id in ('clock_tower', 'paltan_bazaar')]
+            
+            for _ in range(100):
+                if all(queue.get_job(job_id)['status'] == 'completed' for job_id in job_ids):
+                    break
+                time.sleep(0.01)
+            
+            assert all(queue.get_job(job_id)['status'] == 'completed' for job_id in job_ids)
+        finally:
+            queue.stop()
+        
+        assert queue.get_stats()['active'] == False
+    
+    def test_finished_jobs_expire(self, queue):
+        """Test finished jobs are forgotten after the result TTL"""
+        job = queue.submit('clock_tower', b'1')
+        queue.run_job(queue._next_job(block=False))
+        queue.result_ttl = 0
+        queue.jobs[job['job_id']].finished_at -= 1
+        
+        queue.submit('clock_tower', b'2')
+        
+        assert queue.get_job(job['job_id']) is None
+
+class _EchoDetector:
+    """Stand-in detector for pool workers that reports what it received"""
+    
+    def __init__(self):
+        self.rois = {}
+        self.frame_decoder = FrameDecoder()
+    
+    def detect_emergency_vehicle(self, image, signal_id=None, frame_scale=1.0):
+        encoded = not isinstance(image, np.ndarray)
+        image, scale = self.frame_decoder.decode(image)
+        if image is None:
+            return {'is_emergency': False, 'error': 'Invalid image input'}
+        return {
+            'is_emergency': False,
+            'signal_id': signal_id,
+            'encoded': encoded,
+            'shape': list(image.shape),
+            'scale': scale * frame_scale,
+            'checksum': int(image.sum()),
+            'pid': os.getpid(),
+            'roi': self.rois.get(signal_id)
+        }
+    
+    def set_signal_roi(self, signal_id, polygon):
+        self.rois[signal_id] = polygon
+        return True
+    
+    def sleep(self, seconds):
+        time.sleep(seconds)
+    
+    def get_system_status(self):
+        return {
+            'model_loaded': True,
+            'warmed_up': True,
+            'roi_signals': sorted(self.rois),
+            'motion_gating': {'enabled': True, 'frames_analyzed': 3, 'frames_skipped': 1,
+                              'skip_rate': 0.25, 'tracked_signals': 1},
+            'decoding': self.frame_decoder.get_stats(),
+            'status': 'operational'
+        }
+
+class TestDetectorProcessPool:
+    """Test the multi-process detector pool"""
+    
+    @pytest.fixture
+    def pool(self):
+        """Start a two-process pool of echo detectors"""
+        pool = DetectorProcessPool(num_workers=2, detector_factory=_EchoDetector, start_method='fork')
+        pool.slot_bytes = 64 * 64 * 3
+        pool.liveness_interval = 0.1
+        pool.start()
+        yield pool
+        pool.stop()
+    
+    def test_frames_pass_through_shared_memory(self, pool):
+        """Test workers see the exact frame written to shared memory"""
+        frame = np.random.randint(0, 255, (48, 64, 3), dtype=np.uint8)
+        
+        result = pool.detect(frame, 'clock_tower', timeout=10)
+        
+        assert result['shape'] == [48, 64, 3]
+        assert result['checksum'] == int(frame.sum())
+        assert result['pid'] != os.getpid()
+        assert pool.get_stats()['frames_processed'] == 1
+    
+    def test_signal_affinity_and_spread(self, pool):
+        """Test a signal always goes to one worker while frames spread over workers"""
+        frames = [np.full((8, 8, 3), i, dtype=np.uint8) for i in range(8)]
+        
+        same_signal = pool.detect_many(frames, ['clock_tower'] * 8, timeout=10)
+        no_signal = pool.detect_many(frames, timeout=10)
+        
+        assert len({r['pid'] for r in same_signal}) == 1
+        assert len({r['pid'] for r in no_signal}) == 2
+        assert [r['checksum'] for r in no_signal] == [int(f.sum()) for f in frames]
+        assert pool.get_stats()['frames_in_flight'] == 0
+    
+    def test_oversized_frame_rejected(self, pool):
+        """Test frames larger than a shared memory slot are refused"""
+        result = pool.detect(np.zeros((100, 100, 3), dtype=np.uint8), 'clock_tower')
+        
+        assert result['is_emergency'] == False
+        assert 'exceeds' in result['error']
+        assert pool.get_stats()['frames_rejected'] == 1
+    
+    def test_broadcast_reaches_every_worker(self, pool):
+        """Test detector calls are applied in every worker process"""
+        assert pool.broadcast('set_signal_roi', 'paltan_bazaar', [[0, 0], [5, 0], [5, 5]], timeout=10) == [True, True]
+        
+        frame = np.zeros((8, 8, 3), dtype=np.uint8)
+        assert pool.detect(frame, 'paltan_bazaar', timeout=10)['roi'] == [[0, 0], [5, 0], [5, 5]]
+    
+    def test_exited_worker_fails_pending_frames(self, pool):
+        """Test frames queued on a worker that dies fail promptly and its signals move on"""
+        worker_index = pool._worker_for('clock_tower')
+        pool.task_queues[worker_index].put(('call', -1, 'sleep', (30,)))
+        future = pool.submit(np.zeros((8, 8, 3), dtype=np.uint8), 'clock_tower')
+        
+        pool.processes[worker_index].terminate()
+        
+        with pytest.raises(RuntimeError, match='exited'):
+            future.result(timeout=10)
+        assert pool.get_stats()['exited_workers'] == [worker_index]
+        assert pool.get_stats()['frames_in_flight'] == 0
+        
+        result = pool.detect(np.zeros((8, 8, 3), dtype=np.uint8), 'clock_tower', timeout=10)
+        assert result['pid'] == pool.processes[1 - worker_index].pid
+        assert pool.broadcast('set_signal_roi', 'clock_tower', None, timeout=10) == [True]
+    
+    def test_pooled_detector_forwards_uploads_without_a_model(self, pool):
+        """Test the web process facade hands encoded uploads to the workers and adds up worker counters"""
+        detector = PooledDetector(pool)
+        encoded = cv2.imencode('.png', np.full((40, 60, 3), 7, dtype=np.uint8))[1].tobytes()
+        
+        result = detector.detect_emergency_vehicle(encoded, signal_id='clock_tower')
+        assert result['encoded'] == True
+        assert result['shape'] == [40, 60, 3]
+        assert result['checksum'] == 7 * 40 * 60 * 3
+        assert detector.detect_emergency_vehicle(b'not an image')['error'] == 'Invalid image input'
+        assert [r['signal_id'] for r in detector.detect_batch([encoded, encoded], ['ballupur', 'paltan_bazaar'])] == \
+            ['ballupur', 'paltan_bazaar']
+        
+        assert detector.set_signal_roi('clock_tower', [[0, 0], [5, 0], [5, 5]]) == True
+        status = detector.get_system_status()
+        assert status['workers'] == 2
+        assert status['roi_signals'] == ['clock_tower']
+        assert status['motion_gating']['frames_analyzed'] == 6
+        assert status['motion_gating']['skip_rate'] == 0.25
+        assert status['decoding']['decoded']['full'] == 3
+        assert status['decoding']['decoded']['failed'] == 1
+        assert status['status'] == 'operational'
+    
+    def test_pooled_detector_downscales_frames_larger_than_a_slot(self, pool):
+        """Test frames above the slot size are shrunk to fit instead of rejected"""
+        detector = PooledDetector(pool)
+        detector.frame_decoder.raw_frames_enabled = True
+        frame = np.full((128, 256, 3), 9, dtype=np.uint8)
+        raw = raw_frame_header(256, 128) + frame.tobytes()
+        
+        for image_input in (frame, raw):
+            result = detector.detect_emergency_vehicle(image_input, signal_id='clock_tower')
+            
+            assert result['encoded'] == False
+            assert result['shape'] == [45, 90, 3]
+            assert result['scale'] == 90 / 256
+            assert pool.get_stats()['frames_rejected'] == 0
+
+def _sample_vehicle_crop(kind, width, height, noise_seed=None):
+    """Draw a synthetic vehicle crop: 'ambulance', 'police', 'car' or 'round_signs'"""
+    if kind == 'ambulance':
+        crop = np.full((height, width, 3), 245, dtype=np.uint8)
+        cv2.rectangle(crop, (0, int(height * 0.45)), (width, int(height * 0.55)), (0, 0, 220), -1)
+        cv2.rectangle(crop, (width // 3, 4), (2 * width // 3, int(height * 0.08)), (60, 60, 255), -1)
+        for i in range(3):
+            x = int(width * (0.1 + 0.3 * i))
+            cv2.rectangle(crop, (x, int(height * 0.62)), (x + int(width * 0.18), int(height * 0.85)),
+                          (40, 40, 40), -1)
+    elif kind == 'police':
+        crop = np.full((height, width, 3), 250, dtype=np.uint8)
+        cv2.rectangle(crop, (0, height // 2), (width, height), (200, 60, 0), -1)
+        cv2.rectangle(crop, (width // 4, 3), (3 * width // 4, int(height * 0.1)), (255, 80, 80), -1)
+    elif kind == 'round_signs':
+        crop = np.full((height, width, 3), 245, dtype=np.uint8)
+        for i in range(4):
+            center = (int(width * (0.15 + 0.23 * i)), height // 2)
+            cv2.circle(crop, center, int(width * 0.08), (40, 40, 40), -1)
+    else:
+        crop = np.full((height, width, 3), (90, 70, 60), dtype=np.uint8)
+        cv2.rectangle(crop, (20, 20), (width - 20, 70), (30, 30, 30), -1)
+    
+    if noise_seed is not None:
+        noise = np.random.default_rng(noise_seed).normal(0, 6, crop.shape)
+        crop = np.clip(crop + noise, 0, 255).astype(np.uint8)
+    return crop
+
+class TestFeatureExtractors:
+    """Test cases comparing the projection feature extractor with the contour one"""
+    
+    @pytest.fixture
+    def detectors(self):
+        """A contour and a projection detector with mocked YOLO models"""
+        detectors = {}
+        for extractor in ('contour', 'projection'):
+            with patch('detection.vehicle_detector.YOLO') as mock_yolo, \
+                 patch.dict(os.environ, {'FEATURE_EXTRACTOR': extractor}):
+                mock_yolo.return_value = Mock(names={0: 'car'})
+                detectors[extractor] = EmergencyVehicleDetector()
+        return detectors
+    
+    @pytest.mark.parametrize('kind,width,height,noise_seed', [
+        ('ambulance', 360, 240, None),
+        ('ambulance', 900, 600, None),
+        ('ambulance', 720, 480, 0),
+        ('police', 300, 180, None),
+        ('police', 700, 420, None),
+        ('car', 280, 170, None),
+        ('car', 600, 360, 1),
+        ('round_signs', 640, 240, None)
+    ])
+    def test_features_match_contour_extractor(self, detectors, kind, width, height, noise_seed):
+        """Test both extractors reach the same decision and features on sample crops"""
+        crop = _sample_vehicle_crop(kind, width, height, noise_seed)
+        
+        contour = detectors['contour']._analyze_emergency_features(crop)
+        projection = detectors['projection']._analyze_emergency_features(crop)
+        
+        assert projection['is_emergency'] == contour['is_emergency']
+        assert projection['vehicle_type'] == contour['vehicle_type']
+        assert projection['features'] == contour['features']
+        assert projection['pattern_score'] == contour['pattern_score']
+        assert projection['light_score'] == contour['light_score']
+        assert projection['confidence'] == pytest.approx(contour['confidence'], abs=0.05)
+    
+    def test_emergency_result_is_json_serializable(self, detectors):
+        """Test an emergency detection result can be returned by the API as JSON"""
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        frame[100:340, 100:460] = _sample_vehicle_crop('ambulance', 360, 240)
+        
+        for detector in detectors.values():
+            detector.motion_gate.enabled = False
+            detector.model.return_value = [_mock_yolo_result([(0, 0.9, [100, 100, 460, 340])])]
+            
+            result = detector.detect_emergency_vehicle(frame, signal_id='clock_tower')
+            
+            assert result['is_emergency'] == True
+            assert json.loads(json.dumps(result))['confidence'] == pytest.approx(result['confidence'])
+    
+    def test_small_vehicle_features_survive_reduced_decode(self, detectors):
+        """Test a small emergency vehicle in a large JPEG is found at the default reduced decode"""
+        frame = np.full((1440, 2560, 3), 110, dtype=np.uint8)
+        frame[600:730, 1000:1200] = _sample_vehicle_crop('ambulance', 200, 130)
+        encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes()
+        for detector in detectors.values():
+            detector.motion_gate.enabled = False
+            # YOLO sees the 1/4 decode, where the vehicle is only 50x32 pixels
+            detector.model.side_effect = lambda image: [_mock_yolo_result([(0, 0.9, [250, 150, 300, 182])])]
+            result = detector.detect_emergency_vehicle(encoded, signal_id='clock_tower')
+            assert result['decode_scale'] == 0.25
+            assert result['is_emergency'] == True
+            assert 'light_bar' in result['features_detected']
+            assert result['bbox'] == [1000, 600, 1200, 728]
+            assert detector.frame_decoder.stats['full'] == 1
+    
+    def test_batched_features_match_per_crop_analysis(self, detectors):
+        """Test the stacked, vectorised analysis reaches the per-crop decisions"""
+        specs = [
+            ('ambulance', 360, 240, None),
+            ('ambulance', 900, 600, None),
+            ('ambulance', 720, 480, 0),
+            ('police', 300, 180, None),
+            ('police', 90, 60, 2),
+            ('car', 280, 170, None),
+            ('car', 600, 360, 1),
+            ('round_signs', 640, 240, None)
+        ]
+        crops = [_sample_vehicle_crop(*spec) for spec in specs] + [np.zeros((0, 0, 3), dtype=np.uint8)]
+        detector = detectors['contour']
+        
+        batched = detector._analyze_emergency_features_batch(crops)
+        
+        assert len(batched) == len(crops)
+        assert batched[-1]['is_emergency'] == False
+        for crop, batch_analysis in zip(crops[:-1], batched):
+            analysis = detector._analyze_emergency_features(crop)
+            assert batch_analysis['is_emergency'] == analysis['is_emergency']
+            assert batch_analysis['vehicle_type'] == analysis['vehicle_type']
+            assert batch_analysis['features'] == analysis['features']
+            assert batch_analysis['confidence'] == pytest.approx(analysis['confidence'], abs=0.06)
+    
+    def test_busy_frame_uses_batched_path(self, detectors):
+        """Test frames with enough vehicles are analysed in one batch"""
+        detector = detectors['contour']
+        detector.batched_features_enabled = True
+        detector.batched_features_min_crops = 3
+        detector.tracker.enabled = False
+        
+        frame = np.full((400, 1200, 3), 80, dtype=np.uint8)
+        frame[50:290, 0:360] = _sample_vehicle_crop('ambulance', 360, 240)
+        frame[50:220, 400:680] = _sample_vehicle_crop('car', 280, 170)
+        frame[50:230, 800:1100] = _sample_vehicle_crop('police', 300, 180)
+        detector.model.return_value = [_mock_yolo_result([
+            (0, 0.9, [0, 50, 360, 290]),
+            (0, 0.9, [400, 50, 680, 220]),
+            (0, 0.9, [800, 50, 1100, 230])
+        ])]
+        
+        with patch.object(detector, '_analyze_emergency_features',
+                          wraps=detector._analyze_emergency_features) as per_crop:
+            result = detector.detect_emergency_vehicle(frame)
+            per_crop.assert_not_called()
+        
+        assert result['is_emergency'] == True
+        assert result['vehicle_type'] == 'ambulance'
+        assert result['bbox'] == [0, 50, 360, 290]
+        assert detector.get_stage_metrics()['features_batch']['count'] == 1
+        
+        # Below the minimum the per-crop path is used
+        detector.batched_features_min_crops = 4
+        detector.result_cache.enabled = False
+        with patch.object(detector, '_analyze_emergency_features',
+                          wraps=detector._analyze_emergency_features) as per_crop:
+            detector.detect_emergency_vehicle(frame)
+            assert per_crop.call_count == 3
+    
+    def test_projection_works_on_downscaled_crop(self, detectors):
+        """Test large crops are shrunk to the feature crop size with thresholds scaled"""
+        extractor = detectors['projection'].feature_extractor
+        crop = _sample_vehicle_crop('ambulance', 900, 600)
+        
+        resized, scale = extractor.resize(crop)
+        assert resized.shape[:2] == (85, 128)
+        assert scale == pytest.approx(128 / 900)
+        assert extractor.resize(resized)[1] == 1.0
+        
+        assert extractor.analyze_patterns(resized, scale) == (0.3, ['rectangular_patterns'])
+        assert extractor.analyze_patterns(*extractor.resize(_sample_vehicle_crop('round_signs', 640, 240))) == (0.0, [])
+        
+        status = detectors['projection'].get_system_status()
+        assert status['feature_extractor'] == 'projection'
+
+def _signature(dhash):
+    """Cache signature with a blank thumbnail, for tests that only exercise the keys"""
+    return FrameSignature(dhash, np.zeros((64, 64), dtype=np.uint8))
+
+class TestDetectionResultCache:
+    """Test cases for the perceptual-hash detection result cache"""
+    
+    def test_dhash_ignores_reencoding_but_not_motion(self):
+        """Test JPEG re-encoding keeps the hash while a moved object changes it"""
+        frame = np.full((360, 640, 3), 90, dtype=np.uint8)
+        cv2.rectangle(frame, (100, 100), (220, 200), (255, 255, 255), -1)
+        reencoded = cv2.imdecode(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 70])[1], cv2.IMREAD_COLOR)
+        moved = np.full((360, 640, 3), 90, dtype=np.uint8)
+        cv2.rectangle(moved, (300, 100), (420, 200), (255, 255, 255), -1)
+        
+        assert frame_dhash(frame) == frame_dhash(reencoded)
+        assert frame_dhash(frame) != frame_dhash(moved)
+        assert frame_dhash(frame, hash_size=8) < 2 ** 64
+    
+    def test_small_vehicle_moving_misses_the_cache(self):
+        """Test a small object moving in a large view is not answered from the cache"""
+        cache = DetectionResultCache()
+        road = np.repeat(np.linspace(20, 235, 1280, dtype=np.uint8)[None, :, None], 720, axis=0).repeat(3, axis=2)
+        frame = road.copy()
+        cv2.rectangle(frame, (600, 400), (615, 411), (200, 200, 200), -1)
+        reencoded = cv2.imdecode(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 70])[1], cv2.IMREAD_COLOR)
+        moved = road.copy()
+        cv2.rectangle(moved, (640, 400), (655, 411), (200, 200, 200), -1)
+        
+        cache.put('clock_tower', cache.frame_hash(frame), {'is_emergency': False})
+        
+        # The coarse dHash alone cannot tell the two frames apart
+        assert frame_dhash(frame) == frame_dhash(moved)
+        assert cache.get('clock_tower', cache.frame_hash(moved)) is None
+        assert cache.get('clock_tower', cache.frame_hash(reencoded))['cache_hit'] == True
+    
+    def test_lru_eviction_and_ttl(self):
+        """Test the least recently used entry is evicted and stale entries expire"""
+        with patch.dict(os.environ, {'RESULT_CACHE_SIZE': '2', 'RESULT_CACHE_TTL': '60'}):
+            cache = DetectionResultCache()
+        
+        cache.put('clock_tower', _signature(1), {'is_emergency': False})
+        cache.put('clock_tower', _signature(2), {'is_emergency': True, 'new_event': True})
+        assert cache.get('clock_tower', _signature(1)) is not None  # 2 is now least recently used
+        cache.put('clock_tower', _signature(3), {'is_emergency': False})
+        
+        assert cache.get('clock_tower', _signature(2)) is None
+        assert cache.get('clock_tower', _signature(3)) is not None
+        assert cache.get_stats()['evictions'] == 1
+        
+        # Errors are never cached
+        cache.put('clock_tower', _signature(4), {'is_emergency': False, 'error': 'boom'})
+        assert cache.get('clock_tower', _signature(4)) is None
+        
+        with patch('detection.result_cache.time.time', return_value=time.time() + 61):
+            assert cache.get('clock_tower', _signature(1)) is None
+        assert cache.get_stats()['expirations'] == 1
+    
+    def test_cached_result_is_not_a_new_event(self):
+        """Test cache hits never re-trigger overrides and invalidation is per signal"""
+        cache = DetectionResultCache()
+        cache.put('clock_tower', _signature(7), {'is_emergency': True, 'new_event': True})
+        cache.put('paltan_bazaar', _signature(7), {'is_emergency': True, 'new_event': True})
+        
+        cached = cache.get('clock_tower', _signature(7))
+        assert cached['new_event'] == False
+        assert cached['cache_hit'] == True
+        
+        cache.invalidate('clock_tower')
+        assert cache.get('clock_tower', _signature(7)) is None
+        assert cache.get('paltan_bazaar', _signature(7)) is not None
+
+class TestEmergencyVoter:
+    """Test N-of-M frame voting and override debouncing"""
+    
+    @pytest.fixture
+    def voter(self):
+        with patch.dict(os.environ, {'VOTING_ENABLED': 'true', 'VOTING_WINDOW_FRAMES': '5',
+                                     'VOTING_MIN_POSITIVE': '3', 'VOTING_WINDOW_SECONDS': '10',
+                                     'VOTING_DEBOUNCE_SECONDS': '60'}):
+            return EmergencyVoter()
+    
+    @staticmethod
+    def _frame(is_emergency, vehicle_type='ambulance', confidence=0.8):
+        return {'is_emergency': is_emergency, 'vehicle_type': vehicle_type if is_emergency else None,
+                'confidence': confidence}
+    
+    def test_fires_on_third_positive_frame(self, voter):
+        """Test an override needs 3 of the last 5 frames and a flapping frame doesn't fire"""
+        votes = [voter.observe('clock_tower', self._frame(positive), now=t)
+                 for t, positive in enumerate([True, False, True, False])]
+        assert not any(vote['fire'] for vote in votes)
+        assert votes[-1]['positives'] == 2
+        
+        vote = voter.observe('clock_tower', self._frame(True, 'fire_truck'), now=4)
+        assert vote['fire'] == True
+        assert vote['positives'] == 3
+        assert vote['vehicle_type'] == 'ambulance'  # majority over the window
+    
+    def test_debounce_while_override_active(self, voter):
+        """Test confirmations are suppressed until the override would have ended"""
+        fired = [voter.observe('clock_tower', self._frame(True), now=t)['fire'] for t in range(10)]
+        assert fired.count(True) == 1
+        assert voter.get_stats()['confirmations_debounced'] == 7
+        
+        # Other signals vote independently
+        assert [voter.observe('ballupur', self._frame(True), now=t)['fire'] for t in range(3)] == [False, False, True]
+        
+        # Once the debounce runs out a still-present vehicle re-triggers
+        for t in range(60, 63):
+            vote = voter.observe('clock_tower', self._frame(True), now=t)
+        assert vote['fire'] == True
+    
+    def test_negative_and_stale_frames(self, voter):
+        """Test a negative frame never fires and frames older than the window drop out"""
+        voter.observe('clock_tower', self._frame(True), now=0)
+        voter.observe('clock_tower', self._frame(True), now=1)
+        voter.observe('clock_tower', {**self._frame(False), 'error': 'Invalid image input'}, now=2)
+        vote = voter.observe('clock_tower', self._frame(True), now=20)
+        
+        assert vote['fire'] == False
+        assert vote['frames'] == 1
+        
+        voter.observe('clock_tower', self._frame(True), now=21)
+        voter.observe('clock_tower', self._frame(True), now=22)
+        assert voter.observe('clock_tower', self._frame(False), now=23)['fire'] == False
+    
+    def test_repeated_results_are_not_votes(self, voter):
+        """Test cached and motion-skipped repeats of one analysed frame don't confirm an override"""
+        first = voter.observe('clock_tower', {**self._frame(True), 'new_event': True}, now=0)
+        repeats = [
+            voter.observe('clock_tower', {**self._frame(True), 'new_event': False, flag: True}, now=t)
+            for t, flag in enumerate(['cache_hit', 'motion_skipped', 'cache_hit'], start=1)
+        ]
+        
+        assert not first['fire'] and not any(vote['fire'] for vote in repeats)
+        assert repeats[-1]['positives'] == 1
+        assert voter.get_stats()['frames_observed'] == 1
+        
+        voter.observe('clock_tower', self._frame(True), now=4)
+        assert voter.observe('clock_tower', self._frame(True), now=5)['fire'] == True
+    
+    def test_stationary_vehicle_confirms_from_repeated_results(self, voter):
+        """Test a vehicle standing in a static view fires once, even though most frames are gated"""
+        votes = [voter.observe('clock_tower', {**self._frame(True), 'new_event': True}, now=0)]
+        for step in range(1, 21):
+            votes.append(voter.observe('clock_tower', {**self._frame(True), 'new_event': False,
+                                                       'motion_skipped': True}, now=step * 0.5))
+        
+        fired_at = [step * 0.5 for step, vote in enumerate(votes) if vote['fire']]
+        assert fired_at == [7.0]  # votes at 0, 3.5 and 7 s with the default 3.33 s spacing
+        assert voter.get_stats()['frames_observed'] == 3
+    
+    def test_manual_override_and_disabled_voting(self, voter):
+        """Test a manual override debounces detections and disabling restores per-frame events"""
+        voter.note_override('clock_tower', 30, now=0)
+        assert not any(voter.observe('clock_tower', self._frame(True), now=t)['fire'] for t in range(5))
+        
+        voter.enabled = False
+        assert voter.observe('ballupur', self._frame(True))['fire'] == True
+        assert voter.observe('ballupur', {**self._frame(True), 'new_event': False})['fire'] == False
+
+class TestSamplingScheduler:
+    """Test load-adaptive per-camera sampling rates"""
+    
+    @pytest.fixture
+    def scheduler(self):
+        with patch.dict(os.environ, {'SAMPLING_SCHEDULER_ENABLED': 'true', 'SAMPLING_MIN_FPS': '0.5',
+                                     'SAMPLING_TARGET_UTILIZATION': '0.8', 'SAMPLING_ACTIVITY_BOOST': '4'}):
+            scheduler = SamplingScheduler(base_interval=5)
+        for signal_id in ('clock_tower', 'ballupur', 'haridwar_road', 'mussoorie_road'):
+            scheduler.register(signal_id, 25.0)
+        return scheduler
+    
+    def test_base_interval_while_detector_keeps_up(self, scheduler):
+        """Test cameras keep the configured interval until the detector is too slow"""
+        assert scheduler.get_interval('clock_tower', now=0) == 5
+        
+        # 10 ms per frame -> 80 frames/s budget, more than the 4 x 5 frames/s wanted
+        scheduler.record('clock_tower', 10.0, {'is_emergency': False, 'confidence': 0.0}, now=0)
+        rates = scheduler.get_rates()
+        
+        assert all(camera['frame_interval'] == 5 for camera in rates['cameras'].values())
+        assert rates['budget_fps'] == 80.0
+    
+    def test_overload_shares_budget_by_priority_and_activity(self, scheduler):
+        """Test a slow detector samples active and priority cameras more than quiet ones"""
+        scheduler.set_priority('ballupur', 2.0)
+        scheduler.record('clock_tower', 200.0, {'is_emergency': False, 'confidence': 0.45}, now=100)
+        
+        intervals = {signal_id: scheduler.get_interval(signal_id, now=100) for signal_id in scheduler.cameras}
+        
+        # 4 frames/s budget: 0.5 each, the remaining 2 split 4:2:1:1
+        assert intervals == {'clock_tower': 17, 'ballupur': 25, 'haridwar_road': 34, 'mussoorie_road': 34}
+        assert sum(25.0 / interval for interval in intervals.values()) <= 4.0
+        
+        # Activity wears off after the activity window
+        assert scheduler.get_interval('clock_tower', now=200) == 28
+        assert scheduler.get_interval('ballupur', now=200) == 20
+    
+    def test_disabled_scheduler_uses_base_interval(self, scheduler):
+        """Test disabling the scheduler restores the fixed interval"""
+        scheduler.enabled = False
+        scheduler.record('clock_tower', 1000.0, {'is_emergency': True, 'confidence': 0.9})
+        
+        assert scheduler.get_interval('clock_tower') == 5
+        assert scheduler.get_rates()['cameras']['clock_tower']['frame_interval'] == 5
+
+class TestFrameDecoder:
+    """Test cases for buffered, reduced-resolution and raw frame decoding"""
+    
+    def test_jpeg_dimensions_and_reduction_factor(self):
+        """Test dimensions come from the JPEG header and the model input is never undershot"""
+        encoded = cv2.imencode('.jpg', np.zeros((720, 1280, 3), dtype=np.uint8))[1].tobytes()
+        assert jpeg_dimensions(encoded) == (1280, 720)
+        assert jpeg_dimensions(b'not a jpeg') is None
+        
+        decoder = FrameDecoder()
+        assert decoder._reduction_factor((1280, 720)) == 2
+        assert decoder._reduction_factor((5120, 2880)) == 8
+        assert decoder._reduction_factor((640, 480)) == 1
+        assert decoder._reduction_factor(None) == 1
+    
+    def test_read_buffer_is_reused_and_grown(self):
+        """Test uploads are read into one per-thread buffer that grows on demand"""
+        import io
+        with patch.dict(os.environ, {'DECODE_BUFFER_BYTES': '16'}):
+            decoder = FrameDecoder()
+        
+        data = decoder._read_into_buffer(io.BytesIO(b'x' * 40))
+        assert bytes(data) == b'x' * 40
+        buffer = decoder.local.buffer
+        assert len(buffer) == 64
+        
+        data = decoder._read_into_buffer(io.BytesIO(b'y' * 10))
+        assert bytes(data) == b'y' * 10
+        assert decoder.local.buffer is buffer
+    
+    def test_raw_frames(self):
+        """Test raw BGR and I420 frames decode behind a header only when enabled"""
+        frame = np.random.randint(0, 255, (48, 64, 3), dtype=np.uint8)
+        raw_bgr = raw_frame_header(64, 48, 'bgr') + frame.tobytes()
+        
+        image, scale = FrameDecoder().decode(raw_bgr)
+        assert image is None
+        
+        with patch.dict(os.environ, {'RAW_FRAMES_ENABLED': 'true'}):
+            decoder = FrameDecoder()
+        
+        image, scale = decoder.decode(raw_bgr)
+        assert scale == 1.0
+        assert np.array_equal(image, frame)
+        
+        i420 = cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420)
+        image, _ = decoder.decode(raw_frame_header(64, 48, 'i420') + i420.tobytes())
+        assert image.shape == (48, 64, 3)
+        
+        # Truncated frames are rejected
+        image, _ = decoder.decode(raw_bgr[:-1])
+        assert image is None
+        assert decoder.get_stats()['decoded']['raw'] == 2
+        assert decoder.get_stats()['decoded']['failed'] == 1
+
+class TestStageMetrics:
+    """Test cases for the rolling stage latency histograms"""
+    
+    def test_percentiles_within_bucket_width(self):
+        """Test percentiles from bucket counts stay within one bucket of the exact value"""
+        histogram = RollingHistogram(window_seconds=60)
+        samples = np.random.default_rng(0).lognormal(mean=3, sigma=1, size=5000)
+        for value in samples:
+            histogram.record(float(value))
+        
+        stats = histogram.get_stats()
+        assert stats['count'] == 5000
+        for quantile in (50, 95, 99):
+            exact = np.percentile(samples, quantile)
+            assert abs(stats[f'p{quantile}_ms'] / exact - 1) < 0.2
+        assert stats['max_ms'] == pytest.approx(samples.max(), abs=0.001)
+    
+    def test_old_samples_leave_the_window(self):
+        """Test the window slides while lifetime totals keep counting"""
+        histogram = RollingHistogram(window_seconds=50, slices=5)
+        with patch('utils.metrics.time.monotonic', return_value=1000.0):
+            histogram.record(5.0)
+            histogram.record(7.0)
+        with patch('utils.metrics.time.monotonic', return_value=1030.0):
+            histogram.record(100.0)
+            assert histogram.get_stats()['count'] == 3
+        with patch('utils.metrics.time.monotonic', return_value=1060.0):
+            stats = histogram.get_stats()
+        
+        assert stats['count'] == 1
+        assert stats['max_ms'] == 100.0
+        assert stats['total_count'] == 3
+    
+    def test_disabled_metrics_record_nothing(self):
+        """Test disabled stage metrics skip timing entirely"""
+        metrics = StageMetrics(enabled=False)
+        with metrics.measure('yolo'):
+            pass
+        assert metrics.get_stats() == {}
+        
+        metrics = StageMetrics(enabled=True)
+        with metrics.measure('yolo'):
+            pass
+        metrics.record('decode', 2.0)
+        assert set(metrics.get_stats()) == {'decode', 'yolo'}
+        
+        metrics.reset()
+        assert metrics.get_stats()['decode']['count'] == 0
+
+class TestStartup:
+    """Test cases for lazy components and background warm-up"""
+    
+    def test_lazy_component_builds_once_on_first_use(self):
+        """Test the factory runs on first attribute access and calls are forwarded"""
+        factory = Mock(return_value=Mock(get_status=Mock(return_value='ok')))
+        component = LazyComponent('signal_controller', factory, StartupTimer())
+        
+        assert component.get_state() == {'status': 'pending'}
+        factory.assert_not_called()
+        
+        assert component.get_status() == 'ok'
+        assert component.get_status() == 'ok'
+        assert factory.call_count == 1
+        assert component.is_ready
+        assert 'init signal_controller' in component._timer.get_phases()
+    
+    def test_lazy_component_retries_failed_build(self):
+        """Test a failing factory is reported and retried on next use"""
+        factory = Mock(side_effect=[RuntimeError('database down'), Mock()])
+        component = LazyComponent('database', factory)
+        
+        with pytest.raises(RuntimeError):
+            component.get()
+        assert component.get_state() == {'status': 'failed', 'error': 'database down'}
+        
+        component.get()
+        assert component.get_state() == {'status': 'ready'}
+    
+    def test_warmup_thread_reports_readiness(self):
+        """Test readiness waits for components and warm-up steps, and failures keep it not ready"""
+        timer = StartupTimer()
+        detector_component = LazyComponent('detector', Mock, timer)
+        database_component = LazyComponent('database', Mock(side_effect=RuntimeError('database down')), timer)
+        warm_up = Mock()
+        
+        warmup = WarmupThread([detector_component], timer, warmup_steps=[('detector warm-up', warm_up)])
+        assert not warmup.is_ready()
+        warmup.start()
+        assert warmup.done.wait(5)
+        
+        state = warmup.get_state()
+        assert state['ready'] == True
+        warm_up.assert_called_once()
+        assert set(state['startup_phases_ms']) == {'init detector', 'detector warm-up'}
+        
+        failing = WarmupThread([database_component], timer)
+        failing.run()
+        assert failing.is_ready() == False
+        assert failing.get_state()['errors'] == {'database': 'database down'}
+
 class TestRouteOptimizer:
     """Test route optimization functionality"""
     
@@ -245,6 +1747,181 @@ class TestRouteOptimizer:
             assert route.duration > 0
             assert len(route.waypoints) > 0
     
+    def test_dijkstra_route_path_and_arrival(self, optimizer):
+        """Test the route follows the road graph and arrival is now plus the duration"""
+        start = Location(30.3166, 78.0322, "Start")  # next to Clock Tower
+        end = Location(30.3455, 78.0512, "End")  # next to Rispana Bridge
+        
+        route = optimizer._calculate_route_dijkstra(start, end)
+        expected_arrival = datetime.utcnow() + timedelta(minutes=route.duration)
+        
+        assert route.traffic_signals == ['clock_tower', 'paltan_bazaar', 'rispana_bridge']
+        assert route.distance == pytest.approx(3.3, abs=0.05)
+        assert abs((route.estimated_arrival - expected_arrival).total_seconds()) < 5
+    
+    def test_road_graph_csr_layout(self, optimizer):
+        """Test the compiled graph holds the same edges as the road network dict"""
+        graph = optimizer.road_graph
+        
+        assert graph.node_count == len(optimizer.road_network)
+        assert graph.edge_count == sum(len(node['connections']) for node in optimizer.road_network.values())
+        assert graph.offsets[0] == 0 and graph.offsets[-1] == graph.edge_count
+        assert np.all(np.diff(graph.offsets) >= 0)
+        assert graph.neighbors('saharanpur_road') == [('rajpur_road', 1.9), ('ballupur', 1.2)]
+        assert graph.coordinates('clock_tower') == (30.3165, 78.0322)
+    
+    def test_road_graph_dijkstra_matches_networkx(self):
+        """Test heap Dijkstra distances against networkx on a random graph"""
+        import networkx as nx
+        rng = np.random.default_rng(7)
+        edges = [(f"n{u}", f"n{v}", float(rng.uniform(0.1, 3.0)))
+                 for u, v in rng.integers(0, 200, size=(800, 2)) if u != v]
+        graph = RoadGraph.from_edges([f"n{i}" for i in range(201)], edges)
+        
+        reference = nx.DiGraph()
+        for u, v, weight in edges:
+            if not reference.has_edge(u, v) or reference[u][v]['weight'] > weight:
+                reference.add_edge(u, v, weight=weight)
+        
+        for source, target in rng.integers(0, 200, size=(20, 2)):
+            distance, path = graph.shortest_path(f"n{source}", f"n{target}")
+            expected = nx.shortest_path_length(reference, f"n{source}", f"n{target}", weight='weight')
+            
+            assert distance == pytest.approx(expected)
+            assert sum(graph.edge_weight(u, v) for u, v in zip(path, path[1:])) == pytest.approx(distance)
+        
+        # n200 has no edges
+        assert graph.shortest_path('n0', 'n200') == (float('inf'), [])
+    
+    def test_search_algorithms_agree(self, optimizer):
+        """Test A*, bidirectional search and CH queries find Dijkstra's distances on the signal network"""
+        signals = optimizer.road_graph.node_ids
+        
+        for source in signals:
+            for target in signals:
+                expected = optimizer.find_path(source, target, 'dijkstra').distance
+                for algorithm in ('astar', 'bidirectional', 'ch'):
+                    result = optimizer.find_path(source, target, algorithm)
+                    assert result.distance == pytest.approx(expected)
+                    assert result.path[0] == source and result.path[-1] == target
+        
+        with pytest.raises(ValueError):
+            optimizer.find_path('clock_tower', 'ballupur', 'bfs')
+    
+    def test_astar_expands_fewer_nodes_on_grid(self, optimizer):
+        """Test the haversine heuristic focuses the search on a city-like grid"""
+        rng = np.random.default_rng(3)
+        size = 30
+        coordinates = {f"{r}_{c}": (30.30 + r * 0.0015, 78.00 + c * 0.0015)
+                       for r in range(size) for c in range(size)}
+        edges = []
+        for r in range(size):
+            for c in range(size):
+                for nr, nc in ((r + 1, c), (r, c + 1)):
+                    if nr < size and nc < size:
+                        length = float(rng.uniform(0.15, 0.25))
+                        edges += [(f"{r}_{c}", f"{nr}_{nc}", length), (f"{nr}_{nc}", f"{r}_{c}", length)]
+        optimizer.road_graph = RoadGraph.from_edges(coordinates.keys(), edges, coordinates)
+        
+        dijkstra = optimizer.find_path('2_2', '27_25', 'dijkstra')
+        astar = optimizer.find_path('2_2', '27_25', 'astar')
+        bidirectional = optimizer.find_path('2_2', '27_25', 'bidirectional')
+        
+        assert astar.distance == pytest.approx(dijkstra.distance)
+        assert bidirectional.distance == pytest.approx(dijkstra.distance)
+        assert astar.expanded < dijkstra.expanded
+        assert bidirectional.expanded < dijkstra.expanded
+    
+    def test_astar_stays_exact_with_zero_weight_edges(self, optimizer):
+        """Test zero-cost edges that cover distance can't make the A* heuristic overestimate"""
+        rng = np.random.default_rng(5)
+        coordinates = {f"n{i}": (30.30 + rng.uniform(0, 0.05), 78.00 + rng.uniform(0, 0.05)) for i in range(40)}
+        edges = []
+        for _ in range(160):
+            u, v = rng.choice(40, size=2, replace=False)
+            straight_line = optimizer._calculate_distance(Location(*coordinates[f"n{u}"]),
+                                                          Location(*coordinates[f"n{v}"]))
+            # Road lengths are at least the straight line, except for zero-cost links
+            weight = 0.0 if rng.random() < 0.1 else straight_line * float(rng.uniform(1.0, 1.5))
+            edges.append((f"n{u}", f"n{v}", weight))
+        optimizer.road_graph = RoadGraph.from_edges(coordinates.keys(), edges, coordinates)
+        
+        assert optimizer.road_graph.max_speed == float('inf')
+        for source, target in rng.choice(40, size=(30, 2)):
+            expected = optimizer.find_path(f"n{source}", f"n{target}", 'dijkstra').distance
+            assert optimizer.find_path(f"n{source}", f"n{target}", 'astar').distance == pytest.approx(expected)
+    
+    def test_graph_file_is_memory_mapped(self, optimizer):
+        """Test a saved graph maps read-only and routes like the original"""
+        with tempfile.TemporaryDirectory() as directory:
+            graph_path = os.path.join(directory, 'road_graph.bin')
+            optimizer.road_graph.save(graph_path)
+            graph = RoadGraph.load(graph_path)
+            
+            assert not graph.offsets.flags.writeable
+            assert list(graph.node_ids) == optimizer.road_graph.node_ids
+            assert graph.index['paltan_bazaar'] == optimizer.road_graph.index['paltan_bazaar']
+            assert 'paltan' not in graph.index and 'paltan_bazaar_x' not in graph.index
+            assert graph.signal_nodes == optimizer.road_graph.signal_nodes
+            assert graph.max_speed == optimizer.road_graph.max_speed
+            
+            for algorithm in ('dijkstra', 'astar', 'bidirectional'):
+                assert graph.search('clock_tower', 'ballupur', algorithm) == \
+                    optimizer.road_graph.search('clock_tower', 'ballupur', algorithm)
+            
+            with open(graph_path, 'wb') as f:
+                f.write(b'not a graph')
+            with pytest.raises(ValueError):
+                RoadGraph.load(graph_path)
+    
+    def test_contraction_hierarchy_matches_dijkstra(self):
+        """Test CH queries find Dijkstra's distances and unpack shortcuts into real road paths"""
+        rng = np.random.default_rng(7)
+        node_ids = [str(i) for i in range(60)]
+        # Small integer weights give many equally short paths
+        graph = RoadGraph.from_arrays(node_ids, rng.integers(0, 60, 200), rng.integers(0, 60, 200),
+                                      rng.integers(1, 6, 200).astype(float))
+        hierarchy = ContractionHierarchy.build(graph, witness_settle_limit=5)
+        
+        assert hierarchy.shortcut_count > 0
+        for source, target in rng.integers(0, 60, size=(200, 2)).astype(str).tolist():
+            expected = graph.search(source, target)
+            result = hierarchy.search(source, target)
+            
+            assert result.distance == pytest.approx(expected.distance)
+            if result.path:
+                assert result.path[0] == source and result.path[-1] == target
+                assert sum(graph.edge_weight(u, v) for u, v in zip(result.path, result.path[1:])) == \
+                    pytest.approx(result.distance)
+    
+    def test_ch_route_keeps_waypoints_and_signals(self, optimizer):
+        """Test a CH route matches the Dijkstra route and a saved hierarchy is reused"""
+        start = Location(30.3166, 78.0322, "Start")
+        end = Location(30.3455, 78.0512, "End")
+        
+        dijkstra = optimizer._calculate_route_dijkstra(start, end, 'dijkstra')
+        ch = optimizer._calculate_route_dijkstra(start, end, 'ch')
+        
+        assert ch.traffic_signals == dijkstra.traffic_signals
+        assert [(wp.latitude, wp.longitude) for wp in ch.waypoints] == \
+            [(wp.latitude, wp.longitude) for wp in dijkstra.waypoints]
+        assert ch.distance == pytest.approx(dijkstra.distance)
+        
+        with tempfile.TemporaryDirectory() as directory:
+            ch_path = os.path.join(directory, 'road_graph.ch')
+            optimizer.get_contraction_hierarchy().save(ch_path)
+            
+            with patch.dict(os.environ, {'ROUTING_ALGORITHM': 'ch', 'ROUTING_CH_PATH': ch_path}):
+                loaded = RouteOptimizer()
+            
+            assert not loaded.contraction_hierarchy.rank.flags.writeable
+            assert loaded.find_path('clock_tower', 'ballupur').distance == \
+                pytest.approx(optimizer.find_path('clock_tower', 'ballupur', 'dijkstra').distance)
+            
+            # A hierarchy only fits the graph it was built for
+            with pytest.raises(ValueError):
+                ContractionHierarchy.load(ch_path, RoadGraph.from_edges(['a', 'b'], [('a', 'b', 1.0)]))
+    
     def test_traffic_density_route(self, optimizer):
         """Test traffic density calculation for route"""
         route_signals = ['clock_tower', 'paltan_bazaar', 'gandhi_road']
@@ -282,6 +1959,92 @@ class TestRouteOptimizer:
             assert 'corridor_plan' in corridor
             assert 'total_corridor_time' in corridor
 
+OSM_EXTRACT = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="30.3160" lon="78.0300"/>
+  <node id="2" lat="30.3160" lon="78.0320"/>
+  <node id="3" lat="30.3160" lon="78.0340"><tag k="highway" v="traffic_signals"/></node>
+  <node id="4" lat="30.3160" lon="78.0360"/>
+  <node id="5" lat="30.3180" lon="78.0340"/>
+  <node id="6" lat="30.3200" lon="78.0340"/>
+  <node id="7" lat="30.3140" lon="78.0340"/>
+  <way id="10"><nd ref="1"/><nd ref="2"/><nd ref="3"/><nd ref="4"/>
+    <tag k="highway" v="primary"/><tag k="maxspeed" v="60"/></way>
+  <way id="11"><nd ref="3"/><nd ref="5"/><nd ref="6"/><nd ref="99"/>
+    <tag k="highway" v="residential"/><tag k="oneway" v="yes"/></way>
+  <way id="12"><nd ref="7"/><nd ref="3"/><tag k="highway" v="footway"/></way>
+</osm>
+"""
+
+class TestOSMImporter:
+    """Test building the routing graph from an OpenStreetMap extract"""
+    
+    @pytest.fixture
+    def extract_path(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.osm', delete=False) as f:
+            f.write(OSM_EXTRACT)
+        yield f.name
+        os.unlink(f.name)
+    
+    def test_tag_parsing(self):
+        """Test maxspeed units and one-way rules"""
+        assert parse_maxspeed('50') == 50
+        assert parse_maxspeed('30 mph') == pytest.approx(48.28, abs=0.01)
+        assert parse_maxspeed('IN:urban') is None
+        assert oneway_direction({'oneway': 'yes'}) == 1
+        assert oneway_direction({'oneway': '-1'}) == -1
+        assert oneway_direction({'junction': 'roundabout'}) == 1
+        assert oneway_direction({'highway': 'motorway', 'oneway': 'no'}) == 0
+        assert oneway_direction({'highway': 'residential'}) == 0
+    
+    def test_build_graph(self, extract_path):
+        """Test shape points are merged, footways dropped and one-way streets kept one-way"""
+        graph = OSMImporter(speed_factor=1.0).import_file(extract_path)
+        
+        # 2 and 5 are shape points, 7 only touches a footway, 99 is outside the extract
+        assert sorted(graph.node_ids) == ['1', '3', '4', '6']
+        assert graph.weight_unit == 'min'
+        assert [node for node, _ in graph.neighbors('3')] == ['1', '4', '6']
+        assert graph.neighbors('6') == []
+        
+        # 1 -> 3 is ~384 m of primary road at 60 km/h
+        assert graph.path_length(['1', '3']) == pytest.approx(0.384, abs=0.001)
+        assert graph.edge_weight('1', '3') == pytest.approx(0.384 / 60 * 60, abs=0.001)
+        assert graph.edge_weight('3', '6') == pytest.approx(0.445 / 25 * 60, abs=0.001)
+    
+    def test_signal_snapping(self, extract_path):
+        """Test tagged signal nodes win within the snap radius and far signals are skipped"""
+        signals = {'junction': (30.3163, 78.0352), 'far_away': (30.40, 78.10)}
+        
+        near = OSMImporter(signal_snap_radius=150).import_file(extract_path, signals)
+        strict = OSMImporter(signal_snap_radius=50).import_file(extract_path, signals)
+        
+        assert near.node_ids[near.signal_nodes['junction']] == '3'
+        assert strict.node_ids[strict.signal_nodes['junction']] == '4'
+        assert 'far_away' not in near.signal_nodes
+    
+    def test_route_on_imported_graph(self, extract_path):
+        """Test a saved graph loads through ROAD_GRAPH_PATH and routes with travel times"""
+        graph = OSMImporter().import_file(extract_path, {'junction': (30.3160, 78.0341)})
+        graph_path = extract_path + '.bin'
+        graph.save(graph_path)
+        
+        with patch.dict(os.environ, {'ROAD_GRAPH_PATH': graph_path}):
+            optimizer = RouteOptimizer()
+        os.unlink(graph_path)
+        
+        assert optimizer.road_graph.node_count == 4
+        assert optimizer.road_graph.signal_nodes == graph.signal_nodes
+        
+        route = optimizer._calculate_route_dijkstra(Location(30.3160, 78.0301), Location(30.3199, 78.0340))
+        
+        assert [(wp.latitude, wp.longitude) for wp in route.waypoints] == \
+            [(30.316, 78.03), (30.316, 78.034), (30.32, 78.034)]
+        assert route.traffic_signals == ['junction']
+        # Roads plus ~20 m from the start and end points onto the graph
+        assert route.distance == pytest.approx(0.384 + 0.445 + 0.021, abs=0.005)
+        assert route.duration == pytest.approx(0.384 + 0.445 / 25 * 60 + 0.021 / 40 * 60, abs=0.01)
+
 class TestSignalController:
     """Test traffic signal control functionality"""
     